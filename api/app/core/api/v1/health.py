@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
 from app.core.api.model import ServerResponse
+from app.core.db import cache
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -11,3 +12,8 @@ router = APIRouter()
 @router.get("/", response_model=ServerResponse)
 async def service_health():
     return ServerResponse(message="OK")
+
+
+@router.get("/cache", response_model=cache.CacheStats)
+async def cache_health():
+    return cache.stats()
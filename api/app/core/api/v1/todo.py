@@ -2,7 +2,7 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends
 
-from app.core.security.auth import get_user_from_token
+from app.core.security.auth import TokenUser, get_token_user
 from app.core.todo import service as todo_service
 from app.core.todo.model import (
     Todo,
@@ -12,7 +12,6 @@ from app.core.todo.model import (
     TodoListUpdate,
     TodoUpdate,
 )
-from app.core.user.model import UserPublic
 
 router = APIRouter()
 
@@ -20,7 +19,7 @@ router = APIRouter()
 @router.post("/list", response_model=TodoList)
 async def create_todo_list(
     todo_list_create: TodoListCreate,
-    current_user: UserPublic = Depends(get_user_from_token),
+    current_user: TokenUser = Depends(get_token_user),
 ):
     todo_list = await todo_service.create_todo_list(
         username=current_user.username, todo_list_create=todo_list_create
@@ -31,7 +30,7 @@ async def create_todo_list(
 
 @router.get("/list", response_model=list[TodoList])
 async def fetch_todo_lists(
-    current_user: UserPublic = Depends(get_user_from_token),
+    current_user: TokenUser = Depends(get_token_user),
 ):
     todo_lists = await todo_service.fetch_todo_lists(current_user.username)
 
@@ -42,7 +41,7 @@ async def fetch_todo_lists(
 async def update_todo_list(
     todo_list_id: UUID,
     todo_list_update: TodoListUpdate,
-    current_user: UserPublic = Depends(get_user_from_token),
+    current_user: TokenUser = Depends(get_token_user),
 ):
     todo_list = await todo_service.update_todo_list(
         username=current_user.username,
@@ -56,7 +55,7 @@ async def update_todo_list(
 @router.delete("/list/{todo_list_id}", response_model=TodoList)
 async def delete_todo_list(
     todo_list_id: UUID,
-    current_user: UserPublic = Depends(get_user_from_token),
+    current_user: TokenUser = Depends(get_token_user),
 ):
     todo_list = await todo_service.delete_todo_list(
         username=current_user.username, todo_list_id=todo_list_id
@@ -68,7 +67,7 @@ async def delete_todo_list(
 @router.post("/task", response_model=Todo)
 async def create_todo(
     todo_create: TodoCreate,
-    current_user: UserPublic = Depends(get_user_from_token),
+    current_user: TokenUser = Depends(get_token_user),
 ):
     todo = await todo_service.create_todo(
         username=current_user.username, todo_create=todo_create
@@ -81,7 +80,7 @@ async def create_todo(
 async def fetch_todos(
     todo_list_id: UUID = None,
     incomplete_only: bool = False,
-    current_user: UserPublic = Depends(get_user_from_token),
+    current_user: TokenUser = Depends(get_token_user),
 ):
     todos = await todo_service.fetch_todos(
         username=current_user.username,
@@ -96,7 +95,7 @@ async def fetch_todos(
 async def update_todo(
     todo_id: UUID,
     todo_update: TodoUpdate,
-    current_user: UserPublic = Depends(get_user_from_token),
+    current_user: TokenUser = Depends(get_token_user),
 ):
     todo = await todo_service.update_todo(
         username=current_user.username, todo_id=todo_id, todo_update=todo_update
@@ -108,7 +107,7 @@ async def update_todo(
 @router.delete("/task/{todo_id}", response_model=Todo)
 async def delete_todo(
     todo_id: UUID,
-    current_user: UserPublic = Depends(get_user_from_token),
+    current_user: TokenUser = Depends(get_token_user),
 ):
     todo = await todo_service.delete_todo(
         username=current_user.username, todo_id=todo_id
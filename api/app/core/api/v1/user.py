@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
 
-from app.core.security.auth import get_user_from_token
+from app.core.security.auth import TokenUser, get_token_user
 from app.core.user import service as user_service
 from app.core.user.model import USER_ROLE, UserCreate, UserPublic, UserUpdate
 
@@ -16,7 +16,7 @@ async def register_new_user(user_create: UserCreate):
 
 @router.get("/", response_model=UserPublic)
 async def read_current_user(
-    current_user: UserPublic = Depends(get_user_from_token),
+    current_user: TokenUser = Depends(get_token_user),
 ):
     user = await user_service.fetch(current_user.username)
 
@@ -26,7 +26,7 @@ async def read_current_user(
 @router.put("/", response_model=UserPublic)
 async def update_current_user(
     user_update: UserUpdate,
-    current_user: UserPublic = Depends(get_user_from_token),
+    current_user: TokenUser = Depends(get_token_user),
 ):
     updated_user = await user_service.update(
         username=current_user.username, user_update=user_update
@@ -8,7 +8,58 @@ class Config(BaseModel):
     api_docs_enabled: bool
     db_url: str
     cache_url: str
+    cache_urls: str = ""
+    cache_backend: str = "redis"
+    cache_memory_max_entries: int = 100000
+    cache_memory_max_bytes: int = 0
     cache_ttl_user: int
+    cache_soft_ttl_user: int = 0
+    cache_ttl_user_missing: int = 30
+    cache_ttl_todo_lists: int = 300
+    cache_ttl_refresh: int = 1
+    cache_warm_enabled: bool = False
+    cache_warm_users: int = 1000
+    cache_warm_batch_size: int = 100
+    cache_warm_rate: float = 1000.0
+    cache_max_connections: int = 50
+    cache_pool_timeout: float = 2.0
+    cache_socket_timeout: float = 2.0
+    cache_socket_connect_timeout: float = 2.0
+    cache_health_check_interval: int = 30
+    cache_local_enabled: bool = False
+    cache_local_max_entries: int = 10000
+    cache_local_max_bytes: int = 0
+    cache_local_ttl: float = 5.0
+    cache_serializer: str = "json"
+    cache_compression: str = "none"
+    cache_compression_threshold: int = 1024
+    cache_fill_lock_enabled: bool = False
+    cache_fill_lock_ttl: float = 5.0
+    cache_fill_lock_poll_interval: float = 0.05
+    cache_ttl_jitter: float = 0.1
+    cache_early_refresh_beta: float = 1.0
+    cache_namespace_ttl: float = 5.0
+    cache_read_timeout: float = 0.25
+    cache_write_timeout: float = 0.5
+    cache_breaker_failure_threshold: int = 5
+    cache_breaker_reset_timeout: float = 10.0
+    cache_fail_open_reads: bool = True
+    cache_revocation_fail_open: bool = False
+    revocation_filter_enabled: bool = False
+    revocation_filter_fp_rate: float = 0.001
+    revocation_filter_max_bytes: int = 1048576
+    revocation_filter_sync_interval: float = 1.0
+    revocation_filter_max_staleness: float = 5.0
+    token_cache_max_entries: int = 10000
+    access_token_compact: bool = False
+    token_generation_enabled: bool = True
+    token_generation_ttl: float = 1.0
+    revocation_legacy_check: bool = True
+    crypt_bcrypt_rounds: int = 12
+    crypt_pool_size: int = 4
+    crypt_queue_depth: int = 64
+    crypt_queue_timeout: float = 5.0
+    user_login_flush_interval: float = 1.0
     access_token_expire_min: float
     refresh_token_expire_min: float
     jwt_algorithm: str
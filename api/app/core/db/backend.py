@@ -0,0 +1,293 @@
+import time
+from collections import deque
+from typing import Iterable, Optional, Protocol
+from uuid import uuid4
+
+from redis import asyncio as aioredis
+
+from .lru import MISSING, LruCache
+
+REDIS = "redis"
+MEMORY = "memory"
+LOG_FIELD = b"value"
+LOG_START = "0"
+
+
+class CacheLock(Protocol):
+    async def acquire(self) -> bool: ...
+
+    async def release(self): ...
+
+
+class CacheBackend(Protocol):
+    """
+    Storage used by app.core.db.cache. Values are opaque bytes, notify lists
+    invalidation messages to publish for other workers' local tiers as part
+    of the same write, which backends without other workers ignore.
+    """
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]: ...
+
+    async def set_many(
+        self, values: dict[str, bytes], ttl: int, notify: Iterable[str] = ()
+    ) -> list[bool]: ...
+
+    async def add_many(
+        self, values: dict[str, tuple[bytes, int]], notify: Iterable[str] = ()
+    ) -> list[bool]: ...
+
+    async def delete_many(self, keys: list[str], notify: Iterable[str] = ()) -> int: ...
+
+    async def is_member(self, key: str, member: bytes) -> bool: ...
+
+    async def add_members(
+        self, members: list[tuple[str, bytes, int]], notify: Iterable[str] = ()
+    ) -> list[bool]: ...
+
+    def lock(self, name: str, timeout: float) -> CacheLock: ...
+
+    async def get_counter(self, key: str) -> int: ...
+
+    async def incr(self, key: str, notify: Iterable[str] = ()) -> int: ...
+
+    async def append_log(self, key: str, value: bytes, max_age: float) -> str: ...
+
+    async def read_log(
+        self, key: str, after: str, count: int
+    ) -> list[tuple[str, bytes]]: ...
+
+
+class RedisBackend:
+    def __init__(self, client: aioredis.Redis, channel: str):
+        self.client = client
+        self.channel = channel
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        return await self.client.mget(keys)
+
+    async def set_many(
+        self, values: dict[str, bytes], ttl: int, notify: Iterable[str] = ()
+    ) -> list[bool]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.set(key, value, ex=ttl)
+            self._publish(pipe, notify)
+
+            results = await pipe.execute()
+
+        return results[: len(values)]
+
+    async def add_many(
+        self, values: dict[str, tuple[bytes, int]], notify: Iterable[str] = ()
+    ) -> list[bool]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, (value, ttl) in values.items():
+                pipe.set(key, value, ex=ttl, nx=True)
+            self._publish(pipe, notify)
+
+            results = await pipe.execute()
+
+        return [bool(result) for result in results[: len(values)]]
+
+    async def delete_many(self, keys: list[str], notify: Iterable[str] = ()) -> int:
+        notify = list(notify)
+
+        if not notify:
+            return await self.client.delete(*keys)
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(*keys)
+            self._publish(pipe, notify)
+
+            results = await pipe.execute()
+
+        return results[0]
+
+    async def is_member(self, key: str, member: bytes) -> bool:
+        return bool(await self.client.sismember(key, member))
+
+    async def add_members(
+        self, members: list[tuple[str, bytes, int]], notify: Iterable[str] = ()
+    ) -> list[bool]:
+        """
+        Adds (key, member, expire_at) members to their sets, returning whether
+        each was added. Each set expires as a whole at its unix time expire_at.
+        """
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, member, _ in members:
+                pipe.sadd(key, member)
+            for key, expire_at in {
+                key: expire_at for key, _, expire_at in members
+            }.items():
+                pipe.expireat(key, expire_at)
+            self._publish(pipe, notify)
+
+            results = await pipe.execute()
+
+        return [bool(result) for result in results[: len(members)]]
+
+    def lock(self, name: str, timeout: float) -> CacheLock:
+        return self.client.lock(name, timeout=timeout, blocking=False)
+
+    async def get_counter(self, key: str) -> int:
+        return int(await self.client.get(key) or 0)
+
+    async def incr(self, key: str, notify: Iterable[str] = ()) -> int:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.incr(key)
+            self._publish(pipe, notify)
+
+            results = await pipe.execute()
+
+        return results[0]
+
+    async def append_log(self, key: str, value: bytes, max_age: float) -> str:
+        """
+        Appends to a stream, trimming entries older than max_age seconds.
+        """
+        min_id = int((time.time() - max_age) * 1000)
+        entry_id = await self.client.xadd(
+            key, {LOG_FIELD: value}, minid=min_id, approximate=True
+        )
+
+        return entry_id.decode()
+
+    async def read_log(
+        self, key: str, after: str, count: int
+    ) -> list[tuple[str, bytes]]:
+        entries = await self.client.xrange(key, min=f"({after}", count=count)
+
+        return [(entry_id.decode(), fields[LOG_FIELD]) for entry_id, fields in entries]
+
+    def _publish(self, pipe: aioredis.client.Pipeline, messages: Iterable[str]):
+        for message in messages:
+            pipe.publish(self.channel, message)
+
+
+class MemoryBackend:
+    """
+    In-process backend for single worker deployments, tests and benchmarks.
+    Bounded by max_entries and max_bytes (when non-zero), evicting least
+    recently used entries first, counters and sets are kept apart so they are
+    never evicted, sets are dropped once they expire. Every operation
+    completes without awaiting, so operations are atomic with respect to
+    other tasks. notify is ignored, there are no other workers to invalidate.
+    """
+
+    # pylint: disable=unused-argument
+
+    def __init__(self, max_entries: int, max_bytes: int = 0):
+        self.entries = LruCache(max_entries=max_entries, max_bytes=max_bytes)
+        self.locks: dict[str, tuple[str, float]] = {}
+        self.counters: dict[str, int] = {}
+        self.sets: dict[str, tuple[set[bytes], float]] = {}
+        self.logs: dict[str, deque[tuple[int, float, bytes]]] = {}
+        self.log_ids = 0
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        values = [self.entries.get(key) for key in keys]
+
+        return [None if value is MISSING else value for value in values]
+
+    async def set_many(
+        self, values: dict[str, bytes], ttl: int, notify: Iterable[str] = ()
+    ) -> list[bool]:
+        for key, value in values.items():
+            self.entries.set(key, value, ttl=ttl, size=len(value))
+
+        return [True] * len(values)
+
+    async def add_many(
+        self, values: dict[str, tuple[bytes, int]], notify: Iterable[str] = ()
+    ) -> list[bool]:
+        added = []
+
+        for key, (value, ttl) in values.items():
+            absent = self.entries.get(key) is MISSING
+            if absent:
+                self.entries.set(key, value, ttl=ttl, size=len(value))
+            added.append(absent)
+
+        return added
+
+    async def delete_many(self, keys: list[str], notify: Iterable[str] = ()) -> int:
+        return sum(self.entries.delete(key) for key in keys)
+
+    async def is_member(self, key: str, member: bytes) -> bool:
+        members, expire_at = self.sets.get(key, ((), 0.0))
+
+        return expire_at > time.time() and member in members
+
+    async def add_members(
+        self, members: list[tuple[str, bytes, int]], notify: Iterable[str] = ()
+    ) -> list[bool]:
+        now = time.time()
+        for key in [
+            key for key, (_, expire_at) in self.sets.items() if expire_at <= now
+        ]:
+            del self.sets[key]
+
+        added = []
+
+        for key, member, expire_at in members:
+            existing, _ = self.sets.setdefault(key, (set(), expire_at))
+            added.append(member not in existing)
+            existing.add(member)
+            self.sets[key] = (existing, expire_at)
+
+        return added
+
+    def lock(self, name: str, timeout: float) -> CacheLock:
+        return MemoryLock(locks=self.locks, name=name, timeout=timeout)
+
+    async def get_counter(self, key: str) -> int:
+        return self.counters.get(key, 0)
+
+    async def incr(self, key: str, notify: Iterable[str] = ()) -> int:
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+        return self.counters[key]
+
+    async def append_log(self, key: str, value: bytes, max_age: float) -> str:
+        now = time.time()
+        log = self.logs.setdefault(key, deque())
+        while log and log[0][1] <= now - max_age:
+            log.popleft()
+
+        self.log_ids += 1
+        log.append((self.log_ids, now, value))
+
+        return str(self.log_ids)
+
+    async def read_log(
+        self, key: str, after: str, count: int
+    ) -> list[tuple[str, bytes]]:
+        after_id = int(after)
+        entries = [entry for entry in self.logs.get(key, ()) if entry[0] > after_id]
+
+        return [(str(entry_id), value) for entry_id, _, value in entries[:count]]
+
+
+class MemoryLock:
+    def __init__(self, locks: dict[str, tuple[str, float]], name: str, timeout: float):
+        self.locks = locks
+        self.name = name
+        self.timeout = timeout
+        self.token = uuid4().hex
+
+    async def acquire(self) -> bool:
+        now = time.monotonic()
+        held = self.locks.get(self.name)
+
+        if held is not None and held[1] > now:
+            return False
+
+        self.locks[self.name] = (self.token, now + self.timeout)
+
+        return True
+
+    async def release(self):
+        held = self.locks.get(self.name)
+
+        if held is not None and held[0] == self.token:
+            del self.locks[self.name]
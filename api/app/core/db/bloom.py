@@ -0,0 +1,114 @@
+import hashlib
+import math
+import time
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives and a false positive rate of about
+    fp_rate while it holds at most capacity items. Sized from a memory budget
+    of max_bytes, once more items are added than it can hold at fp_rate it is
+    saturated and reports every item as present.
+    """
+
+    def __init__(self, max_bytes: int, fp_rate: float):
+        self.bit_count = max(8, max_bytes * 8)
+        self.hash_count = max(1, round(-math.log2(fp_rate)))
+        self.capacity = int(-self.bit_count * math.log(2) ** 2 / math.log(fp_rate))
+        self.count = 0
+        self._bits = bytearray(math.ceil(self.bit_count / 8))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, item: str) -> bool:
+        if self.saturated:
+            return True
+
+        return all(
+            self._bits[bit >> 3] & (1 << (bit & 7)) for bit in self._positions(item)
+        )
+
+    @property
+    def saturated(self) -> bool:
+        return self.count > self.capacity
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._bits)
+
+    def add(self, item: str):
+        for bit in self._positions(item):
+            self._bits[bit >> 3] |= 1 << (bit & 7)
+
+        self.count += 1
+
+    def _positions(self, item: str) -> list[int]:
+        """
+        hash_count bit positions by double hashing one 128 bit digest.
+        """
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+
+        return [
+            (first + index * second) % self.bit_count
+            for index in range(self.hash_count)
+        ]
+
+
+class SlicedBloomFilter:
+    """
+    Bloom filters sliced by expiry time. Items are added with the time they
+    expire at, each slice holds the items expiring within one slice_seconds
+    window and is dropped once the window has passed, so expired items stop
+    taking up capacity. max_bytes is split evenly over slice_count slices,
+    enough to cover the longest expiry ahead of now.
+    """
+
+    def __init__(
+        self, slice_seconds: float, slice_count: int, max_bytes: int, fp_rate: float
+    ):
+        self.slice_seconds = slice_seconds
+        self.slice_count = slice_count
+        self.slice_bytes = max_bytes // slice_count
+        self.fp_rate = fp_rate
+        self._slices: dict[int, BloomFilter] = {}
+
+    def __len__(self) -> int:
+        return sum(len(bloom) for bloom in self._slices.values())
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(bloom.size_bytes for bloom in self._slices.values())
+
+    def might_contain(self, key: str, expires_at: float) -> bool:
+        self._drop_expired()
+
+        bloom = self._slices.get(self._slice(expires_at))
+
+        return bloom is not None and key in bloom
+
+    def add(self, key: str, expires_at: float):
+        if expires_at <= time.time():
+            return
+
+        self._drop_expired()
+
+        index = self._slice(expires_at)
+        bloom = self._slices.get(index)
+
+        if bloom is None:
+            bloom = BloomFilter(max_bytes=self.slice_bytes, fp_rate=self.fp_rate)
+            self._slices[index] = bloom
+
+        bloom.add(key)
+
+    def _slice(self, expires_at: float) -> int:
+        return int(expires_at // self.slice_seconds)
+
+    def _drop_expired(self):
+        current = self._slice(time.time())
+
+        for index in [index for index in self._slices if index < current]:
+            del self._slices[index]
@@ -0,0 +1,78 @@
+import time
+
+from pydantic import BaseModel
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class BreakerStats(BaseModel):
+    state: str
+    failures: int
+    opened: int
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing dependency. After failure_threshold consecutive
+    failures the breaker opens and rejects calls for reset_timeout seconds,
+    then lets a single trial call through: success closes it again, failure
+    reopens it for another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+
+        return OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+
+        if state == CLOSED:
+            return True
+
+        if state == HALF_OPEN and not self._trial:
+            self._trial = True
+            return True
+
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+
+        if self._trial or self.failures >= self.failure_threshold:
+            if self._opened_at is None:
+                self.opened += 1
+            self._opened_at = time.monotonic()
+            self._trial = False
+
+    def release(self):
+        """
+        Ends a call that neither succeeded nor failed, e.g. was cancelled, so
+        a half-open breaker lets the next trial call through.
+        """
+        self._trial = False
+
+    def stats(self) -> BreakerStats:
+        return BreakerStats(
+            state=self.state, failures=self.failures, opened=self.opened
+        )
@@ -1,52 +1,1159 @@
-from typing import Optional, Type
+# pylint: disable=too-many-lines
+import asyncio
+import hashlib
+import math
+import random
+import time
+from collections import Counter
+from contextlib import suppress
+from typing import (
+    Awaitable,
+    Callable,
+    Coroutine,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Type,
+    TypeVar,
+)
+from uuid import uuid4
 
-import orjson
+from pydantic import BaseModel
 from redis import asyncio as aioredis
+from redis.exceptions import LockError, RedisError
 
 from app.core.config import get_config
+from app.core.exception import CacheUnavailableException
 from app.core.logging import get_logger
 from app.core.util import PydanticModel
 
+from .backend import (
+    LOG_START,
+    MEMORY,
+    CacheBackend,
+    CacheLock,
+    MemoryBackend,
+    RedisBackend,
+)
+from .breaker import BreakerStats, CircuitBreaker
+from .codec import TOMBSTONE, Codec, unwrap, wrap
+from .lru import MISSING, LruCache
+from .singleflight import SingleFlight
+
 logger = get_logger(__name__)
 
 config = get_config()
 
+INVALIDATION_CHANNEL = "CACHE_INVALIDATE"
+INVALIDATION_RETRY_SECONDS = 1.0
+FILL_LOCK_PREFIX = "FILL_LOCK"
+NAMESPACE_PREFIX = "CACHE_NAMESPACE"
+REFRESH = "REFRESH"
+
+T = TypeVar("T")
+
+_clients: dict[int, aioredis.Redis] = {}
+_memory: Optional[MemoryBackend] = None  # pylint: disable=invalid-name
+_client_loop: Optional[asyncio.AbstractEventLoop] = None  # pylint: disable=invalid-name
+_breakers: dict[int, CircuitBreaker] = {}
+
+_node_id = uuid4().hex  # pylint: disable=invalid-name
+_local: Optional[LruCache] = None  # pylint: disable=invalid-name
+_subscribed: set[int] = set()
+_listeners: list[asyncio.Task] = []
+_remote_stats = Counter()
+
+_codecs: dict[str, Codec] = {}
+_namespaces: dict[str, tuple[int, float]] = {}
+_fills = SingleFlight()
+_background: set[asyncio.Task] = set()
+
+
+class _Entry(NamedTuple):
+    entity: Optional[PydanticModel]
+    refresh_at: Optional[float] = None
+    delta: float = 0.0
+    cached: bool = True
+
+
+_MISS = _Entry(entity=None, cached=False)
+_NOT_FOUND = _Entry(entity=None)
+
+
+class CacheTierStats(BaseModel):
+    hits: int
+    misses: int
+    entries: int | None = None
+    size_bytes: int | None = None
+
+
+class CacheStats(BaseModel):
+    local: CacheTierStats | None = None
+    remote: CacheTierStats
+    breakers: list[BreakerStats]
+
+
+def _create_pool(url: str) -> aioredis.ConnectionPool:
+    return aioredis.BlockingConnectionPool.from_url(
+        url,
+        max_connections=config.cache_max_connections,
+        timeout=config.cache_pool_timeout,
+        socket_timeout=config.cache_socket_timeout,
+        socket_connect_timeout=config.cache_socket_connect_timeout,
+        health_check_interval=config.cache_health_check_interval,
+    )
+
+
+async def init_cache() -> bool:
+    global _local  # pylint: disable=global-statement
+
+    if config.cache_backend == MEMORY:
+        _backend()
+        return True
+
+    nodes = range(len(_node_urls()))
+    for node in nodes:
+        _connection(node)
+
+    if config.cache_local_enabled and not _listeners:
+        _local = LruCache(
+            max_entries=config.cache_local_max_entries,
+            max_bytes=config.cache_local_max_bytes,
+            ttl=config.cache_local_ttl,
+        )
+        for node in nodes:
+            _listeners.append(asyncio.create_task(_listen_for_invalidations(node)))
+
+    return True
+
+
+async def close_cache() -> bool:
+    global _local, _memory  # pylint: disable=global-statement
+
+    for task in list(_background):
+        task.cancel()
+    await asyncio.gather(*_background, return_exceptions=True)
+
+    if _listeners:
+        for listener in _listeners:
+            listener.cancel()
+        await asyncio.gather(*_listeners, return_exceptions=True)
+        _listeners.clear()
+        _local = None
+
+    for client in _clients.values():
+        await client.aclose(close_connection_pool=True)
+    _clients.clear()
+    _memory = None
+
+    return True
+
+
+def _backend(node: int = 0) -> CacheBackend:
+    """
+    Backend for a cache node, chosen by cache_backend. The memory backend is
+    a single node private to the worker.
+    """
+    global _memory  # pylint: disable=global-statement
+
+    if config.cache_backend != MEMORY:
+        return RedisBackend(_connection(node), channel=INVALIDATION_CHANNEL)
+
+    if _memory is None:
+        _memory = MemoryBackend(
+            max_entries=config.cache_memory_max_entries,
+            max_bytes=config.cache_memory_max_bytes,
+        )
+
+    return _memory
+
+
+def _node_count() -> int:
+    if config.cache_backend == MEMORY:
+        return 1
+
+    return len(_node_urls())
+
+
+def _node_urls() -> list[str]:
+    """
+    Cache nodes from cache_urls (comma separated), or the single cache_url.
+    """
+    urls = config.cache_urls or config.cache_url
+
+    return [url.strip() for url in urls.split(",") if url.strip()]
+
+
+def _node_index(cache_key: str) -> int:
+    """
+    Picks the node for cache_key by rendezvous hashing: the node scoring the
+    highest hash of its url and the key wins, so adding or removing a node
+    only moves the keys that node wins or held.
+    """
+    if _node_count() == 1:
+        return 0
+
+    urls = _node_urls()
+
+    return max(range(len(urls)), key=lambda node: _node_score(urls[node], cache_key))
+
+
+def _node_score(url: str, cache_key: str) -> int:
+    digest = hashlib.blake2b(f"{url}|{cache_key}".encode(), digest_size=8).digest()
+
+    return int.from_bytes(digest, "big")
+
+
+def _group_by_node(cache_keys: Iterable[str]) -> dict[int, list[str]]:
+    groups: dict[int, list[str]] = {}
+
+    for cache_key in cache_keys:
+        groups.setdefault(_node_index(cache_key), []).append(cache_key)
+
+    return groups
+
+
+def _connection(node: int = 0) -> aioredis.Redis:
+    """
+    Shared client per cache node for the worker, lazily created if init_cache
+    hasn't run yet. Pooled connections are bound to the event loop that opened
+    them, so new clients are created when called from a different loop.
+    """
+    global _client_loop  # pylint: disable=global-statement
+
+    loop = _running_loop()
+    if _client_loop is not loop:
+        _clients.clear()
+        _client_loop = loop
+
+    client = _clients.get(node)
+    if client is None:
+        client = aioredis.Redis(connection_pool=_create_pool(_node_urls()[node]))
+        _clients[node] = client
+
+    return client
+
+
+def _breaker(node: int) -> CircuitBreaker:
+    breaker = _breakers.get(node)
+
+    if breaker is None:
+        breaker = CircuitBreaker(
+            failure_threshold=config.cache_breaker_failure_threshold,
+            reset_timeout=config.cache_breaker_reset_timeout,
+        )
+        _breakers[node] = breaker
+
+    return breaker
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _local_tier() -> Optional[LruCache]:
+    """
+    The in-process tier is only trusted while subscribed to invalidations on
+    every node, otherwise writes from other workers could go unnoticed.
+    """
+    if len(_subscribed) == _node_count():
+        return _local
+
+    return None
 
-def _connection():
-    return aioredis.from_url(config.cache_url, decode_responses=True)
 
+async def _listen_for_invalidations(node: int):
+    """
+    Invalidations are published on the node holding the key, so each node
+    has its own listener.
+    """
+    while True:
+        pubsub = _connection(node).pubsub()
+
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            _subscribed.add(node)
+
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    _handle_invalidation(message["data"])
+        except RedisError as exc:
+            logger.error(f"Cache invalidation subscription lost: {exc}")
+        finally:
+            _subscribed.discard(node)
+            if _local is not None:
+                _local.clear()
+            await pubsub.aclose()
+
+        await asyncio.sleep(INVALIDATION_RETRY_SECONDS)
+
+
+def spawn(coro: Coroutine) -> asyncio.Task:
+    """
+    Runs coro in the background, keeping a reference until it completes.
+    Failures are logged and close_cache cancels anything still running.
+    """
+    task = asyncio.ensure_future(coro)
+    _background.add(task)
+    task.add_done_callback(_background_done)
+
+    return task
+
+
+def _background_done(task: asyncio.Task):
+    _background.discard(task)
+
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background cache task failed: {task.exception()}")
+
+
+def _handle_invalidation(data: bytes):
+    node_id, _, cache_key = data.decode().partition("|")
+
+    if node_id == _node_id:
+        return
+
+    namespace_prefix, _, prefix = cache_key.partition("-")
+    if namespace_prefix == NAMESPACE_PREFIX:
+        _namespaces.pop(prefix, None)
+    else:
+        _local.delete(cache_key)
+
+
+def _invalidation_message(cache_key: str) -> str:
+    return f"{_node_id}|{cache_key}"
+
+
+def configured_codec(trusted: bool = False) -> Codec:
+    return Codec(
+        serializer=config.cache_serializer,
+        compression=config.cache_compression,
+        compression_threshold=config.cache_compression_threshold,
+        trusted=trusted,
+    )
+
+
+_default_codec = configured_codec()
+
+
+def register_codec(prefix: str, codec: Codec):
+    """
+    Overrides the configured default codec for values stored under prefix.
+    """
+    _codecs[prefix] = codec
+
+
+def _codec(prefix: str) -> Codec:
+    return _codecs.get(prefix, _default_codec)
+
+
+def _build_cache_key(prefix: str, key: str, version: int = 0) -> str:
+    if version:
+        return f"{prefix}@{version}-{key}"
 
-def _build_cache_key(prefix: str, key: str) -> str:
     return f"{prefix}-{key}"
 
 
+async def _build_cache_keys(prefix: str, keys: Iterable[str]) -> list[str]:
+    version = await namespace_version(prefix)
+
+    return [_build_cache_key(prefix=prefix, key=key, version=version) for key in keys]
+
+
+async def namespace_version(prefix: str) -> int:
+    """
+    Live version of the prefix's namespace, part of every key stored under
+    it. The version is read from the cache and kept in memory for
+    cache_namespace_ttl seconds, or until another worker's bump is announced
+    when the local tier is enabled.
+    """
+    remembered = _namespaces.get(prefix)
+    if remembered is not None and remembered[1] > time.monotonic():
+        return remembered[0]
+
+    return await _fills.do((NAMESPACE_PREFIX, prefix), lambda: _load_namespace(prefix))
+
+
+async def _load_namespace(prefix: str) -> int:
+    cache_key = _build_cache_key(prefix=NAMESPACE_PREFIX, key=prefix)
+    node = _node_index(cache_key)
+    backend = _backend(node)
+
+    version = await _guarded(
+        lambda: backend.get_counter(cache_key),
+        timeout=config.cache_read_timeout,
+        node=node,
+    )
+
+    return _remember_namespace(prefix, version)
+
+
+async def bump_namespace(prefix: str) -> int:
+    """
+    Invalidates every entry stored under prefix at once by moving it to a new
+    namespace version, returning the new version. Old entries become
+    unreachable and expire through their ttl.
+    """
+    cache_key = _build_cache_key(prefix=NAMESPACE_PREFIX, key=prefix)
+    node = _node_index(cache_key)
+    backend = _backend(node)
+    local = _local_tier()
+
+    version = await _guarded(
+        lambda: backend.incr(
+            cache_key, notify=_invalidation_messages(local, [cache_key])
+        ),
+        timeout=config.cache_write_timeout,
+        node=node,
+    )
+    logger.info(f"Cache namespace '{prefix}' bumped to version {version}")
+
+    return _remember_namespace(prefix, version)
+
+
+def _remember_namespace(prefix: str, version: int) -> int:
+    """
+    The cache's version is used as-is, even if lower than the remembered one,
+    e.g. after the cache lost its counters, so every worker keeps using the
+    same keys as the others.
+    """
+    _namespaces[prefix] = (version, time.monotonic() + config.cache_namespace_ttl)
+
+    return version
+
+
+def stats() -> CacheStats:
+    local = None
+    if _local is not None:
+        local = CacheTierStats(
+            hits=_local.hits,
+            misses=_local.misses,
+            entries=len(_local),
+            size_bytes=_local.size_bytes,
+        )
+
+    remote = CacheTierStats(hits=_remote_stats["hits"], misses=_remote_stats["misses"])
+
+    breakers = [_breaker(node).stats() for node in range(_node_count())]
+
+    return CacheStats(local=local, remote=remote, breakers=breakers)
+
+
+async def _guarded(
+    operation: Callable[[], Awaitable[T]], timeout: float, node: int = 0
+) -> T:
+    """
+    Runs a redis operation through the node's circuit breaker with a timeout,
+    raising CacheUnavailableException if the breaker is open, the operation
+    times out or redis fails.
+    """
+    breaker = _breaker(node)
+
+    if not breaker.allow():
+        raise CacheUnavailableException("Cache unavailable, circuit breaker is open")
+
+    try:
+        result = await asyncio.wait_for(operation(), timeout=timeout)
+    except (RedisError, asyncio.TimeoutError) as exc:
+        breaker.record_failure()
+        logger.error(f"Cache operation failed: {exc!r}")
+        raise CacheUnavailableException("Cache unavailable") from exc
+    except BaseException:
+        breaker.release()
+        raise
+
+    breaker.record_success()
+
+    return result
+
+
 async def fetch(
     prefix: str, key: str, doc_model: Type[PydanticModel]
 ) -> Optional[PydanticModel]:
-    entity = None
+    entities = await fetch_many(prefix=prefix, keys=[key], doc_model=doc_model)
+
+    return entities[0]
+
+
+async def fetch_many(
+    prefix: str, keys: list[str], doc_model: Type[PydanticModel]
+) -> list[Optional[PydanticModel]]:
+    """
+    Fetches keys in a single MGET round trip, returning entities in input order
+    with None for misses.
+    """
+    entries = await _fetch_entries(
+        prefix=prefix, keys=keys, doc_model=doc_model, local=_local_tier()
+    )
+
+    return [entry.entity for entry in entries]
+
+
+async def _fetch_remote(
+    prefix: str, key: str, doc_model: Type[PydanticModel]
+) -> _Entry:
+    entries = await _fetch_entries(
+        prefix=prefix, keys=[key], doc_model=doc_model, local=None
+    )
+
+    return entries[0]
+
+
+async def _fetch_entries(
+    prefix: str,
+    keys: list[str],
+    doc_model: Type[PydanticModel],
+    local: Optional[LruCache],
+) -> list[_Entry]:
+    cache_keys = await _build_cache_keys(prefix=prefix, keys=keys)
+    entries = [_MISS] * len(cache_keys)
+    pending = list(range(len(cache_keys)))
+    generation = None
 
+    if local is not None:
+        pending = []
+        for index, cache_key in enumerate(cache_keys):
+            entry = local.get(cache_key)
+            if entry is MISSING:
+                pending.append(index)
+            else:
+                entries[index] = entry
+
+        generation = local.generation
+
+    if not pending:
+        return entries
+
+    codec = _codec(prefix)
+    cached_values = await _mget([cache_keys[index] for index in pending])
+
+    for index in pending:
+        cached_value = cached_values[cache_keys[index]]
+        entry = _MISS
+
+        if cached_value == TOMBSTONE:
+            _remote_stats["hits"] += 1
+            entry = _NOT_FOUND
+        elif cached_value:
+            _remote_stats["hits"] += 1
+            envelope = unwrap(cached_value)
+            entry = _Entry(
+                entity=codec.decode(envelope.raw, doc_model),
+                refresh_at=envelope.refresh_at,
+                delta=envelope.delta,
+            )
+        else:
+            _remote_stats["misses"] += 1
+
+        entries[index] = entry
+
+        if local is not None and local.generation == generation:
+            local.set(cache_keys[index], entry, size=len(cached_value or b""))
+
+    return entries
+
+
+async def _mget(cache_keys: list[str]) -> dict[str, Optional[bytes]]:
+    """
+    One read per node holding any of cache_keys, run concurrently.
+    """
+
+    async def mget_node(node: int, node_keys: list[str]) -> dict:
+        backend = _backend(node)
+        values = await _guarded(
+            lambda: backend.get_many(node_keys),
+            timeout=config.cache_read_timeout,
+            node=node,
+        )
+
+        return dict(zip(node_keys, values))
+
+    results = await _per_node(mget_node, _group_by_node(cache_keys))
+
+    return {key: value for result in results for key, value in result.items()}
+
+
+async def _per_node(
+    operation: Callable[[int, list[str]], Awaitable[T]], groups: dict[int, list[str]]
+) -> list[T]:
+    if len(groups) == 1:
+        ((node, node_keys),) = groups.items()
+        return [await operation(node, node_keys)]
+
+    return await asyncio.gather(
+        *[operation(node, node_keys) for node, node_keys in groups.items()]
+    )
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+async def fetch_or_fill(
+    prefix: str,
+    key: str,
+    doc_model: Type[PydanticModel],
+    fill: Callable[[], Awaitable[Optional[PydanticModel]]],
+    ttl: int,
+    soft_ttl: Optional[int] = None,
+    missing_ttl: Optional[int] = None,
+) -> Optional[PydanticModel]:
+    """
+    Cache-aside read. On a miss only one caller per process runs fill and
+    stores its result while concurrent callers await it. With
+    cache_fill_lock_enabled a short redis lock extends this across workers,
+    callers that lose the lock poll the cache until the holder is done.
+
+    With a soft_ttl, entries past it are still returned but trigger a
+    background refresh, until ttl removes them outright. Refreshes start
+    probabilistically ahead of the soft_ttl, weighted by how long the last
+    fill took, so hot keys are refreshed before any caller sees them stale.
+
+    With a missing_ttl, a fill that finds nothing is cached as a tombstone for
+    missing_ttl so repeated lookups of unknown keys don't reach the source,
+    writers creating the key must delete it.
+
+    If the cache is unavailable fill is used directly when
+    cache_fail_open_reads is set, otherwise CacheUnavailableException is
+    raised.
+    """
+    try:
+        entries = await _fetch_entries(
+            prefix=prefix, keys=[key], doc_model=doc_model, local=_local_tier()
+        )
+        entry = entries[0]
+
+        if not entry.cached:
+            return await _fills.do(
+                (prefix, key),
+                lambda: _fill(
+                    prefix=prefix,
+                    key=key,
+                    doc_model=doc_model,
+                    fill=fill,
+                    ttl=ttl,
+                    soft_ttl=soft_ttl,
+                    missing_ttl=missing_ttl,
+                ),
+            )
+    except CacheUnavailableException:
+        if not config.cache_fail_open_reads:
+            raise
+
+        logger.warning(f"Cache unavailable, reading '{prefix}-{key}' from source")
+
+        return await _fills.do((prefix, key), fill)
+
+    if _should_refresh(entry):
+        spawn(
+            _fills.do(
+                (REFRESH, prefix, key),
+                lambda: _refresh(
+                    prefix=prefix,
+                    key=key,
+                    fill=fill,
+                    ttl=ttl,
+                    soft_ttl=soft_ttl,
+                    missing_ttl=missing_ttl,
+                ),
+            )
+        )
+
+    return entry.entity
+
+
+def _should_refresh(entry: _Entry) -> bool:
+    if entry.refresh_at is None:
+        return False
+
+    early = (
+        -entry.delta * config.cache_early_refresh_beta * math.log(1.0 - random.random())
+    )
+
+    return time.time() + early >= entry.refresh_at
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+async def _fill(
+    prefix: str,
+    key: str,
+    doc_model: Type[PydanticModel],
+    fill: Callable[[], Awaitable[Optional[PydanticModel]]],
+    ttl: int,
+    soft_ttl: Optional[int],
+    missing_ttl: Optional[int],
+) -> Optional[PydanticModel]:
+    if not config.cache_fill_lock_enabled:
+        return await _fill_and_put(
+            prefix=prefix,
+            key=key,
+            fill=fill,
+            ttl=ttl,
+            soft_ttl=soft_ttl,
+            missing_ttl=missing_ttl,
+        )
+
+    lock, node = _fill_lock(prefix=prefix, key=key)
+
+    while not await _acquire(lock, node):
+        await asyncio.sleep(config.cache_fill_lock_poll_interval)
+
+        entry = await _fetch_remote(prefix=prefix, key=key, doc_model=doc_model)
+        if entry.cached:
+            return entry.entity
+
+    try:
+        entry = await _fetch_remote(prefix=prefix, key=key, doc_model=doc_model)
+        entity = entry.entity
+        if not entry.cached:
+            entity = await _fill_and_put(
+                prefix=prefix,
+                key=key,
+                fill=fill,
+                ttl=ttl,
+                soft_ttl=soft_ttl,
+                missing_ttl=missing_ttl,
+            )
+    finally:
+        await _release(lock, node)
+
+    return entity
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+async def _refresh(
+    prefix: str,
+    key: str,
+    fill: Callable[[], Awaitable[Optional[PydanticModel]]],
+    ttl: int,
+    soft_ttl: Optional[int],
+    missing_ttl: Optional[int],
+):
+    """
+    Refreshes a stale entry, skipped when another worker holds the fill lock
+    since it is already refreshing it.
+    """
+    lock = None
+    if config.cache_fill_lock_enabled:
+        lock, node = _fill_lock(prefix=prefix, key=key)
+        if not await _acquire(lock, node):
+            return
+
+    try:
+        entity = await _fill_and_put(
+            prefix=prefix,
+            key=key,
+            fill=fill,
+            ttl=ttl,
+            soft_ttl=soft_ttl,
+            missing_ttl=missing_ttl,
+        )
+        if entity is None and not missing_ttl:
+            await delete(prefix=prefix, key=key)
+    finally:
+        if lock is not None:
+            await _release(lock, node)
+
+
+def _fill_lock(prefix: str, key: str) -> tuple[CacheLock, int]:
+    """
+    Fill lock for key, held on the same node as the key.
+    """
     cache_key = _build_cache_key(prefix=prefix, key=key)
-    redis = _connection()
-    cached_json = await redis.get(cache_key)
+    node = _node_index(cache_key)
+    lock = _backend(node).lock(
+        _build_cache_key(prefix=FILL_LOCK_PREFIX, key=cache_key),
+        timeout=config.cache_fill_lock_ttl,
+    )
+
+    return lock, node
+
 
-    if cached_json:
-        cached_dict = orjson.loads(cached_json)
-        entity = doc_model(**cached_dict)
+async def _acquire(lock: CacheLock, node: int) -> bool:
+    return await _guarded(lock.acquire, timeout=config.cache_write_timeout, node=node)
+
+
+async def _release(lock: CacheLock, node: int):
+    """
+    Releases a fill lock, it expires on its own if the release fails.
+    """
+    with suppress(LockError, CacheUnavailableException):
+        await _guarded(lock.release, timeout=config.cache_write_timeout, node=node)
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+async def _fill_and_put(
+    prefix: str,
+    key: str,
+    fill: Callable[[], Awaitable[Optional[PydanticModel]]],
+    ttl: int,
+    soft_ttl: Optional[int],
+    missing_ttl: Optional[int],
+) -> Optional[PydanticModel]:
+    start = time.perf_counter()
+    entity = await fill()
+    delta = time.perf_counter() - start
+
+    with suppress(CacheUnavailableException):
+        if entity is not None:
+            await put(
+                prefix=prefix,
+                key=key,
+                doc=entity,
+                ttl=ttl,
+                soft_ttl=soft_ttl,
+                delta=delta,
+            )
+        elif missing_ttl:
+            await put_missing(prefix=prefix, key=key, ttl=missing_ttl)
 
     return entity
 
 
-async def put(prefix: str, key: str, doc: PydanticModel, ttl: int) -> Optional[bool]:
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+async def put(
+    prefix: str,
+    key: str,
+    doc: PydanticModel,
+    ttl: int,
+    soft_ttl: Optional[int] = None,
+    delta: float = 0.0,
+) -> Optional[bool]:
+    results = await put_many(
+        prefix=prefix, docs={key: doc}, ttl=ttl, soft_ttl=soft_ttl, delta=delta
+    )
+
+    return results[0]
+
+
+async def put_many(
+    prefix: str,
+    docs: dict[str, PydanticModel],
+    ttl: int,
+    soft_ttl: Optional[int] = None,
+    delta: float = 0.0,
+) -> list[Optional[bool]]:
+    """
+    Stores docs with a shared ttl using one pipelined round trip, returning
+    the SET result for each doc in input order.
+
+    A soft_ttl marks entries for stale-while-revalidate (see fetch_or_fill),
+    each entry's soft_ttl is shortened by up to cache_ttl_jitter so entries
+    written together don't go stale together.
+    """
+    codec = _codec(prefix)
+    cache_keys = await _build_cache_keys(prefix=prefix, keys=docs)
+    entries = {}
+
+    for cache_key, doc in zip(cache_keys, docs.values()):
+        encoded = codec.encode(doc)
+        entry = _Entry(entity=doc)
+
+        if soft_ttl:
+            jitter = 1.0 - config.cache_ttl_jitter * random.random()
+            entry = _Entry(
+                entity=doc, refresh_at=time.time() + soft_ttl * jitter, delta=delta
+            )
+            encoded = wrap(encoded, refresh_at=entry.refresh_at, delta=delta)
+
+        entries[cache_key] = (entry, encoded)
+
+    return await _store(entries=entries, ttl=ttl)
+
+
+async def put_missing(prefix: str, key: str, ttl: int) -> Optional[bool]:
+    """
+    Caches that key doesn't exist, fetches return None for it until ttl
+    expires or the key is put or deleted.
+    """
+    (cache_key,) = await _build_cache_keys(prefix=prefix, keys=[key])
+    results = await _store(entries={cache_key: (_NOT_FOUND, TOMBSTONE)}, ttl=ttl)
+
+    return results[0]
+
+
+async def _store(
+    entries: dict[str, tuple[_Entry, bytes]], ttl: int
+) -> list[Optional[bool]]:
+    local = _local_tier()
+    generation = None
+    if local is not None:
+        for cache_key in entries:
+            local.delete(cache_key)
+
+        generation = local.generation
+
+    async def set_node(node: int, node_keys: list[str]) -> dict:
+        backend = _backend(node)
+        values = {cache_key: entries[cache_key][1] for cache_key in node_keys}
+        results = await _guarded(
+            lambda: backend.set_many(
+                values, ttl=ttl, notify=_invalidation_messages(local, node_keys)
+            ),
+            timeout=config.cache_write_timeout,
+            node=node,
+        )
+
+        return dict(zip(node_keys, results))
+
+    results = await _per_node(set_node, _group_by_node(entries))
+    stored = {key: result for result in results for key, result in result.items()}
+
+    if local is not None and local.generation == generation:
+        local_ttl = min(config.cache_local_ttl, ttl)
+        for cache_key, (entry, encoded) in entries.items():
+            local.set(cache_key, entry, ttl=local_ttl, size=len(encoded))
+
+    return [stored[cache_key] for cache_key in entries]
+
+
+async def add_many(
+    prefix: str, docs: dict[str, tuple[PydanticModel, int]]
+) -> list[bool]:
+    """
+    Stores each doc with its own ttl only if its key isn't cached yet, in one
+    round trip per node, returning whether each doc was stored in input
+    order. The check and write are atomic, so of concurrent adds of the same
+    key exactly one stores it.
+    """
+    codec = _codec(prefix)
+    cache_keys = await _build_cache_keys(prefix=prefix, keys=docs)
+    values = {
+        cache_key: (codec.encode(doc), ttl)
+        for cache_key, (doc, ttl) in zip(cache_keys, docs.values())
+    }
+
+    local = _local_tier()
+    if local is not None:
+        for cache_key in cache_keys:
+            local.delete(cache_key)
+
+    async def add_node(node: int, node_keys: list[str]) -> dict:
+        backend = _backend(node)
+        results = await _guarded(
+            lambda: backend.add_many(
+                {cache_key: values[cache_key] for cache_key in node_keys},
+                notify=_invalidation_messages(local, node_keys),
+            ),
+            timeout=config.cache_write_timeout,
+            node=node,
+        )
+
+        return dict(zip(node_keys, results))
+
+    results = await _per_node(add_node, _group_by_node(cache_keys))
+    added = {key: result for result in results for key, result in result.items()}
+
+    return [added[cache_key] for cache_key in cache_keys]
+
+
+async def is_member(prefix: str, key: str, member: bytes) -> bool:
+    """
+    Whether member is in the set stored under key, in one round trip. Sets
+    aren't part of prefix namespaces.
+    """
     cache_key = _build_cache_key(prefix=prefix, key=key)
-    redis = _connection()
+    local_key = _member_key(cache_key, member)
+    generation = None
+
+    local = _local_tier()
+    if local is not None:
+        found = local.get(local_key)
+        if found is not MISSING:
+            return found
+
+        generation = local.generation
+
+    node = _node_index(cache_key)
+    backend = _backend(node)
+    found = await _guarded(
+        lambda: backend.is_member(cache_key, member),
+        timeout=config.cache_read_timeout,
+        node=node,
+    )
+
+    if local is not None and local.generation == generation:
+        local.set(local_key, found)
+
+    return found
+
+
+async def add_members(prefix: str, members: list[tuple[str, bytes, int]]) -> list[bool]:
+    """
+    Adds (key, member, expire_at) members to the sets stored under their keys
+    in one round trip per node, returning whether each was added, i.e. wasn't
+    a member yet. Sets have no per member ttl, each expires as a whole at the
+    unix time expire_at.
+    """
+    cache_keys = [_build_cache_key(prefix=prefix, key=key) for key, _, _ in members]
+    entries = [
+        (cache_key, member, expire_at)
+        for cache_key, (_, member, expire_at) in zip(cache_keys, members)
+    ]
+    local_keys = [_member_key(cache_key, member) for cache_key, member, _ in entries]
+
+    local = _local_tier()
+    if local is not None:
+        for local_key in local_keys:
+            local.delete(local_key)
+
+    groups: dict[int, list[int]] = {}
+    for index, cache_key in enumerate(cache_keys):
+        groups.setdefault(_node_index(cache_key), []).append(index)
+
+    async def add_node(node: int, indexes: list[int]) -> dict:
+        backend = _backend(node)
+        results = await _guarded(
+            lambda: backend.add_members(
+                [entries[index] for index in indexes],
+                notify=_invalidation_messages(
+                    local, [local_keys[index] for index in indexes]
+                ),
+            ),
+            timeout=config.cache_write_timeout,
+            node=node,
+        )
+
+        return dict(zip(indexes, results))
+
+    results = await _per_node(add_node, groups)
+    added = {index: result for result in results for index, result in result.items()}
 
-    return await redis.set(cache_key, doc.json(), ex=ttl)
+    return [added[index] for index in range(len(entries))]
+
+
+def _member_key(cache_key: str, member: bytes) -> str:
+    return f"{cache_key}|{member.hex()}"
 
 
 async def delete(prefix: str, key: str) -> bool:
+    deleted = await delete_many(prefix=prefix, keys=[key])
+
+    return deleted == 1
+
+
+async def delete_many(prefix: str, keys: list[str]) -> int:
+    """
+    Deletes keys in one round trip per node, returning the number of keys
+    removed.
+    """
+    if not keys:
+        return 0
+
+    cache_keys = await _build_cache_keys(prefix=prefix, keys=keys)
+
+    local = _local_tier()
+    if local is not None:
+        for cache_key in cache_keys:
+            local.delete(cache_key)
+
+    async def delete_node(node: int, node_keys: list[str]) -> int:
+        backend = _backend(node)
+
+        return await _guarded(
+            lambda: backend.delete_many(
+                node_keys, notify=_invalidation_messages(local, node_keys)
+            ),
+            timeout=config.cache_write_timeout,
+            node=node,
+        )
+
+    deleted = await _per_node(delete_node, _group_by_node(cache_keys))
+
+    return sum(deleted)
+
+
+async def fetch_counter(prefix: str, key: str) -> int:
+    """
+    Current value of a counter, 0 if it was never incremented. Counters aren't
+    part of prefix namespaces and have no ttl.
+    """
     cache_key = _build_cache_key(prefix=prefix, key=key)
-    redis = _connection()
+    generation = None
+
+    local = _local_tier()
+    if local is not None:
+        value = local.get(cache_key)
+        if value is not MISSING:
+            return value
+
+        generation = local.generation
+
+    node = _node_index(cache_key)
+    backend = _backend(node)
+    value = await _guarded(
+        lambda: backend.get_counter(cache_key),
+        timeout=config.cache_read_timeout,
+        node=node,
+    )
+
+    if local is not None and local.generation == generation:
+        local.set(cache_key, value)
+
+    return value
+
+
+async def incr_counter(prefix: str, key: str) -> int:
+    """
+    Increments a counter in one write, returning its new value.
+    """
+    cache_key = _build_cache_key(prefix=prefix, key=key)
+
+    local = _local_tier()
+    if local is not None:
+        local.delete(cache_key)
+
+    node = _node_index(cache_key)
+    backend = _backend(node)
+
+    return await _guarded(
+        lambda: backend.incr(
+            cache_key, notify=_invalidation_messages(local, [cache_key])
+        ),
+        timeout=config.cache_write_timeout,
+        node=node,
+    )
+
+
+async def append_log(name: str, value: bytes, max_age: float) -> str:
+    """
+    Appends value to the named log, returning its entry id. Entries older than
+    max_age seconds are trimmed as new ones are appended.
+    """
+    node = _node_index(name)
+    backend = _backend(node)
+
+    return await _guarded(
+        lambda: backend.append_log(name, value, max_age=max_age),
+        timeout=config.cache_write_timeout,
+        node=node,
+    )
+
+
+async def read_log(
+    name: str, after: str = LOG_START, count: int = 1000
+) -> list[tuple[str, bytes]]:
+    """
+    Reads up to count entries of the named log appended after the entry id
+    after, oldest first.
+    """
+    node = _node_index(name)
+    backend = _backend(node)
+
+    return await _guarded(
+        lambda: backend.read_log(name, after=after, count=count),
+        timeout=config.cache_read_timeout,
+        node=node,
+    )
+
 
-    result = await redis.delete(cache_key)
+def _invalidation_messages(
+    local: Optional[LruCache], cache_keys: Iterable[str]
+) -> list[str]:
+    """
+    Other workers' local tiers only need telling when local tiers are in use.
+    """
+    if local is None:
+        return []
 
-    return result == 1
+    return [_invalidation_message(cache_key) for cache_key in cache_keys]
@@ -0,0 +1,191 @@
+import asyncio
+import functools
+import inspect
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Optional,
+    Type,
+    TypeVar,
+    get_args,
+    get_origin,
+)
+
+from pydantic import create_model
+
+from app.core.config import get_config
+from app.core.exception import CacheUnavailableException
+from app.core.logging import get_logger
+from app.core.util import PydanticModel
+
+from . import cache
+from .codec import Codec
+
+config = get_config()
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+AsyncFunc = Callable[..., Awaitable[T]]
+
+_deferred: dict[str, set[str]] = {}
+_replay: Optional[asyncio.Task] = None  # pylint: disable=invalid-name
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def cached(
+    prefix: str,
+    key: str,
+    doc_model: Any,
+    ttl: int,
+    soft_ttl: Optional[int] = None,
+    missing_ttl: Optional[int] = None,
+    codec: Optional[Codec] = None,
+) -> Callable[[AsyncFunc], AsyncFunc]:
+    """
+    Caches the result of an async repo function with cache.fetch_or_fill.
+
+    key is a format string filled from the function's arguments by name, e.g.
+    "{username}". doc_model is the function's result model, or list[Model] for
+    functions returning lists. ttl, soft_ttl and missing_ttl are passed on to
+    fetch_or_fill and codec, when given, is registered for the prefix.
+    Writers pair this with invalidates on the same prefix and key, keys whose
+    invalidation is still pending are read from the function directly.
+    """
+    if codec is not None:
+        cache.register_codec(prefix, codec)
+
+    cache_model, to_cache, from_cache = _result_model(doc_model)
+
+    def decorator(func: AsyncFunc) -> AsyncFunc:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            derived_key = _derive_key(signature, key, args, kwargs)
+            if derived_key in _deferred.get(prefix, ()):
+                return await func(*args, **kwargs)
+
+            async def fill():
+                return to_cache(await func(*args, **kwargs))
+
+            entity = await cache.fetch_or_fill(
+                prefix=prefix,
+                key=derived_key,
+                doc_model=cache_model,
+                fill=fill,
+                ttl=ttl,
+                soft_ttl=soft_ttl,
+                missing_ttl=missing_ttl,
+            )
+
+            return from_cache(entity)
+
+        return wrapper
+
+    return decorator
+
+
+def invalidates(prefix: str, key: str) -> Callable[[AsyncFunc], AsyncFunc]:
+    """
+    Deletes the cached entry for key, a format string filled from the
+    function's arguments like in cached, once the function returns. Nothing is
+    deleted if it raises.
+
+    The function's write has happened by then, so a delete failing with the
+    cache unavailable doesn't fail the call: it's retried in the background
+    every cache_breaker_reset_timeout seconds until it succeeds, and until
+    then cached reads of the key on this worker skip the cache.
+    """
+
+    def decorator(func: AsyncFunc) -> AsyncFunc:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            result = await func(*args, **kwargs)
+            derived_key = _derive_key(signature, key, args, kwargs)
+
+            try:
+                await cache.delete(prefix=prefix, key=derived_key)
+            except CacheUnavailableException:
+                _defer_delete(prefix=prefix, key=derived_key)
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+async def invalidate_many(prefix: str, keys: list[str]):
+    """
+    Deletes the cached entries for keys after a write made outside
+    invalidates, deferring them the same way while the cache is unavailable.
+    """
+    try:
+        await cache.delete_many(prefix=prefix, keys=keys)
+    except CacheUnavailableException:
+        for key in keys:
+            _defer_delete(prefix=prefix, key=key)
+
+
+def _defer_delete(prefix: str, key: str):
+    global _replay  # pylint: disable=global-statement
+
+    logger.warning(f"Cache unavailable, deferring delete of '{prefix}-{key}'")
+    _deferred.setdefault(prefix, set()).add(key)
+
+    if _replay is None or _replay.done():
+        _replay = cache.spawn(_replay_deletes())
+
+
+async def _replay_deletes():
+    while _deferred:
+        await asyncio.sleep(config.cache_breaker_reset_timeout)
+
+        for prefix in list(_deferred):
+            keys = _deferred.pop(prefix)
+            try:
+                await cache.delete_many(prefix=prefix, keys=sorted(keys))
+            except CacheUnavailableException:
+                _deferred.setdefault(prefix, set()).update(keys)
+            else:
+                logger.info(f"Replayed {len(keys)} deferred deletes of '{prefix}'")
+
+
+def _derive_key(
+    signature: inspect.Signature, key: str, args: tuple, kwargs: dict
+) -> str:
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+
+    return key.format(**bound.arguments)
+
+
+def _result_model(
+    doc_model: Any,
+) -> tuple[Type[PydanticModel], Callable, Callable]:
+    """
+    Cache entries are single models, so list results are stored wrapped in a
+    model with an items field.
+    """
+    if get_origin(doc_model) is not list:
+        return doc_model, _identity, _identity
+
+    (item_model,) = get_args(doc_model)
+    list_model = create_model(f"{item_model.__name__}Items", items=(doc_model, ...))
+
+    def to_cache(result: Optional[list]) -> Optional[PydanticModel]:
+        return None if result is None else list_model.construct(items=result)
+
+    def from_cache(entity: Optional[PydanticModel]) -> Optional[list]:
+        return None if entity is None else entity.items
+
+    return list_model, to_cache, from_cache
+
+
+def _identity(value: Any) -> Any:
+    return value
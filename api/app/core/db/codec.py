@@ -0,0 +1,189 @@
+import struct
+from datetime import date, datetime
+from typing import Any, Callable, NamedTuple, Optional, Type
+
+import orjson
+
+from app.core.util import PydanticModel, construct_model
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+NO_COMPRESSION = "none"
+ZSTD = "zstd"
+LZ4 = "lz4"
+
+HEADER_MARKER = b"\x00"
+ENVELOPE_MARKER = b"\x01"
+TOMBSTONE = b"\x02"
+
+_ENVELOPE = struct.Struct("!dd")
+
+_SERIALIZER_IDS = {JSON: b"j", MSGPACK: b"m"}
+_COMPRESSION_IDS = {NO_COMPRESSION: b"-", ZSTD: b"z", LZ4: b"l"}
+_SERIALIZERS = {value: key for key, value in _SERIALIZER_IDS.items()}
+_COMPRESSIONS = {value: key for key, value in _COMPRESSION_IDS.items()}
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+
+    return str(value)
+
+
+def _dumps(serializer: str, data: dict) -> bytes:
+    if serializer == MSGPACK:
+        return msgpack.packb(data, default=_default)
+
+    return orjson.dumps(data, default=_default)
+
+
+def _loads(serializer: str, payload: bytes) -> dict:
+    if serializer == MSGPACK:
+        return msgpack.unpackb(payload)
+
+    return orjson.loads(payload)
+
+
+def _compress(compression: str, payload: bytes) -> bytes:
+    if compression == ZSTD:
+        return zstandard.ZstdCompressor().compress(payload)
+
+    return lz4_frame.compress(payload)
+
+
+def _decompress(compression: str, payload: bytes) -> bytes:
+    if compression == ZSTD:
+        return zstandard.ZstdDecompressor().decompress(payload)
+
+    if compression == LZ4:
+        return lz4_frame.decompress(payload)
+
+    return payload
+
+
+def _check_available(serializer: str, compression: str):
+    modules = {MSGPACK: msgpack, ZSTD: zstandard, LZ4: lz4_frame}
+    packages = {MSGPACK: "msgpack", ZSTD: "zstandard", LZ4: "lz4"}
+
+    if serializer not in _SERIALIZER_IDS:
+        raise ValueError(f"Unknown cache serializer '{serializer}'")
+
+    if compression not in _COMPRESSION_IDS:
+        raise ValueError(f"Unknown cache compression '{compression}'")
+
+    for name in (serializer, compression):
+        if name in modules and modules[name] is None:
+            raise ValueError(
+                f"Cache codec '{name}' requires the '{packages[name]}' package"
+            )
+
+
+class Codec:
+    """
+    Serializes cached docs to bytes.
+
+    Plain uncompressed JSON is stored as-is so it stays readable and
+    compatible with entries written before codecs existed. Anything else is
+    prefixed with a 3 byte header (marker, serializer, compression) so values
+    always decode with the settings they were written with.
+
+    A trusted codec builds models without revalidating them, which is only
+    appropriate for data the app itself wrote to the cache.
+    """
+
+    def __init__(
+        self,
+        serializer: str = JSON,
+        compression: str = NO_COMPRESSION,
+        compression_threshold: int = 1024,
+        trusted: bool = False,
+    ):
+        _check_available(serializer, compression)
+
+        self.serializer = serializer
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.trusted = trusted
+
+    def encode(self, doc: PydanticModel) -> bytes:
+        payload = _dumps(self.serializer, doc.dict())
+        compression = NO_COMPRESSION
+
+        if (
+            self.compression != NO_COMPRESSION
+            and len(payload) >= self.compression_threshold
+        ):
+            payload = _compress(self.compression, payload)
+            compression = self.compression
+
+        if self.serializer == JSON and compression == NO_COMPRESSION:
+            return payload
+
+        header = (
+            HEADER_MARKER
+            + _SERIALIZER_IDS[self.serializer]
+            + _COMPRESSION_IDS[compression]
+        )
+
+        return header + payload
+
+    def decode(self, raw: bytes, doc_model: Type[PydanticModel]) -> PydanticModel:
+        data = self.loads(raw)
+        build: Callable = construct_model if self.trusted else _validate_model
+
+        return build(doc_model, data)
+
+    @staticmethod
+    def loads(raw: bytes) -> dict:
+        if raw[:1] != HEADER_MARKER:
+            return orjson.loads(raw)
+
+        serializer = _SERIALIZERS[raw[1:2]]
+        compression = _COMPRESSIONS[raw[2:3]]
+        payload = _decompress(compression, raw[3:])
+
+        return _loads(serializer, payload)
+
+
+def _validate_model(doc_model: Type[PydanticModel], data: dict) -> PydanticModel:
+    return doc_model(**data)
+
+
+class Envelope(NamedTuple):
+    raw: bytes
+    refresh_at: Optional[float] = None
+    delta: float = 0.0
+
+
+def wrap(raw: bytes, refresh_at: float, delta: float) -> bytes:
+    """
+    Prefixes an encoded value with when it should be refreshed (epoch seconds)
+    and how long the last fill took, for stale-while-revalidate entries.
+    """
+    return ENVELOPE_MARKER + _ENVELOPE.pack(refresh_at, delta) + raw
+
+
+def unwrap(raw: bytes) -> Envelope:
+    if raw[:1] != ENVELOPE_MARKER:
+        return Envelope(raw=raw)
+
+    refresh_at, delta = _ENVELOPE.unpack_from(raw, 1)
+
+    return Envelope(raw=raw[1 + _ENVELOPE.size :], refresh_at=refresh_at, delta=delta)
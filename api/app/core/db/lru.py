@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple
+
+MISSING = object()
+
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+    size: int
+
+
+class LruCache:  # pylint: disable=too-many-instance-attributes
+    """
+    Bounded in-process LRU with per-entry TTL. Entries are evicted least
+    recently used first once either max_entries or max_bytes (when non-zero)
+    is exceeded. Values are shared, so callers must treat them as read-only.
+
+    generation is bumped on every delete/clear so callers can detect that an
+    invalidation raced with a slower lookup before storing its result.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int = 0, ttl: float = 0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return MISSING
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: float = None, size: int = 0):
+        if ttl is None:
+            ttl = self.ttl
+
+        if key in self._entries:
+            self._remove(key)
+
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        self._entries[key] = _Entry(
+            value=value, expires_at=time.monotonic() + ttl, size=size
+        )
+        self.size_bytes += size
+
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes and self.size_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def delete(self, key: Hashable) -> bool:
+        self.generation += 1
+
+        if key not in self._entries:
+            return False
+
+        self._remove(key)
+
+        return True
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self.size_bytes -= entry.size
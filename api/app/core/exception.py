@@ -27,6 +27,14 @@ class UserDisabedException(Exception):
     pass
 
 
+class CacheUnavailableException(Exception):
+    pass
+
+
+class CryptUnavailableException(Exception):
+    pass
+
+
 def _exception_mapping() -> dict:
     return {
         DataConflictException: 409,
@@ -34,6 +42,8 @@ def _exception_mapping() -> dict:
         UserDisabedException: 403,
         InvalidCredentialException: 401,
         InvalidTokenException: 401,
+        CacheUnavailableException: 503,
+        CryptUnavailableException: 503,
     }
 
 
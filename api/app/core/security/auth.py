@@ -3,28 +3,40 @@ from typing import Optional
 
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
-from pydantic import BaseModel, SecretStr
+from pydantic import BaseModel, Field, SecretStr
 
 from app.core.config import get_config
+from app.core.db import cache
 from app.core.exception import (
+    CryptUnavailableException,
     InvalidCredentialException,
     ResourceNotFoundException,
     UserDisabedException,
 )
-from app.core.security.token import generate_token, revoke_token, validate_token
+from app.core.logging import get_logger
+from app.core.security.token import (
+    generate_token,
+    revoke_tokens,
+    token_generation,
+    validate_token,
+)
 from app.core.user import service as user_service
-from app.core.user.model import UserPublic, UserUpdatePrivate
+from app.core.user.model import UserPublic
+from app.core.util import construct_model, convert_model
 
-from .crypt import verify_password
+from . import crypt
 
 ACCESS_TOKEN = "ACCESS_TOKEN"
 REFRESH_TOKEN = "REFRESH_TOKEN"
 REVOKE_LOGOUT = "REVOKE_LOGOUT"
+REFRESHED_TOKEN_CACHE_PREFIX = "REFRESHED_TOKEN"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 config = get_config()
 
+logger = get_logger(__name__)
+
 
 class AuthToken(BaseModel):
     token_type: Optional[str] = "Bearer"
@@ -34,27 +46,40 @@ class AuthToken(BaseModel):
     refresh_token_expires_at: Optional[datetime]
 
 
+class TokenUser(BaseModel):
+    username: str
+    roles: list[str]
+    disabled: bool
+
+
+class CompactUserClaims(BaseModel):
+    roles: list[str] = Field(alias="r")
+    disabled: bool = Field(alias="d")
+
+    class Config:
+        allow_population_by_field_name = True
+
+
 async def user_login(username: str, password: SecretStr) -> AuthToken:
     api_user = await _get_api_user_from_credentials(
         username=username, password=password
     )
-    updated_user = await user_service.update_private(
-        username=api_user.username,
-        user_update_private=UserUpdatePrivate(last_login=datetime.now(timezone.utc)),
-    )
-    user_public = UserPublic(**updated_user.dict())
-
-    access_token, access_token_expires_at = generate_token(
-        claim=ACCESS_TOKEN,
-        expire_min=config.access_token_expire_min,
-        sub=user_public.username,
-        data=user_public,
+    # milliseconds, as tokens and mongo keep them
+    now = datetime.now(timezone.utc)
+    last_login = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    user_service.record_login(username=api_user.username, last_login=last_login)
+    user_public = api_user.copy(update={"last_login": last_login})
+    generation = await token_generation(user_public.username)
+
+    access_token, access_token_expires_at = _generate_access_token(
+        user_public, generation=generation
     )
     refresh_token, refresh_token_expires_at = generate_token(
         claim=REFRESH_TOKEN,
         expire_min=config.refresh_token_expire_min,
         sub=user_public.username,
         data=None,
+        generation=generation,
     )
 
     return AuthToken(
@@ -66,28 +91,49 @@ async def user_login(username: str, password: SecretStr) -> AuthToken:
 
 
 async def user_logout(access_token: str, refresh_token: str) -> tuple[bool, bool]:
-    access_revoked = await revoke_token(
-        claim=ACCESS_TOKEN, token=access_token, revoke_reason=REVOKE_LOGOUT
-    )
-    refresh_revoked = await revoke_token(
-        claim=REFRESH_TOKEN, token=refresh_token, revoke_reason=REVOKE_LOGOUT
+    access_revoked, refresh_revoked = await revoke_tokens(
+        tokens=[(ACCESS_TOKEN, access_token), (REFRESH_TOKEN, refresh_token)],
+        revoke_reason=REVOKE_LOGOUT,
     )
 
     return access_revoked, refresh_revoked
 
 
 async def refresh_access_token(refresh_token: str) -> AuthToken:
+    """
+    Refreshes of the same refresh token within cache_ttl_refresh seconds,
+    e.g. from several tabs or retries, share the first refresh's AuthToken
+    through the cache instead of each fetching the user and signing a new
+    access token. The refresh token is validated on every call, a user
+    disabled within that window only stops refreshing once it has passed.
+    """
     token_data = await validate_token(claim=REFRESH_TOKEN, token=refresh_token)
+
+    async def refresh() -> AuthToken:
+        return await _refresh_access_token(
+            refresh_token=refresh_token, token_data=token_data
+        )
+
+    if not config.cache_ttl_refresh:
+        return await refresh()
+
+    return await cache.fetch_or_fill(
+        prefix=REFRESHED_TOKEN_CACHE_PREFIX,
+        key=token_data["token_id"],
+        doc_model=AuthToken,
+        fill=refresh,
+        ttl=config.cache_ttl_refresh,
+    )
+
+
+async def _refresh_access_token(refresh_token: str, token_data: dict) -> AuthToken:
     refresh_token_expires_at = datetime.fromtimestamp(
         token_data["exp"], tz=timezone.utc
     )
     user = await _get_api_user_by_username(token_data["sub"])
 
-    access_token, access_token_expires_at = generate_token(
-        claim=ACCESS_TOKEN,
-        expire_min=config.access_token_expire_min,
-        sub=user.username,
-        data=user,
+    access_token, access_token_expires_at = _generate_access_token(
+        user, generation=token_data.get("gen")
     )
 
     return AuthToken(
@@ -99,12 +145,65 @@ async def refresh_access_token(refresh_token: str) -> AuthToken:
 
 
 async def get_user_from_token(token: str = Depends(oauth2_scheme)) -> UserPublic:
+    """
+    The full profile of the token's user, read from the user cache for
+    compact tokens.
+    """
     token_data = await validate_token(claim=ACCESS_TOKEN, token=token)
-    user = UserPublic(**token_data["data"])
+
+    if _is_compact(token_data):
+        user_private = await user_service.fetch(token_data["sub"])
+        return convert_model(UserPublic, user_private)
+
+    user = construct_model(UserPublic, token_data["data"])
 
     return user
 
 
+async def get_token_user(token: str = Depends(oauth2_scheme)) -> TokenUser:
+    """
+    The token's user as carried in the token, for endpoints that don't need
+    the full profile.
+    """
+    token_data = await validate_token(claim=ACCESS_TOKEN, token=token)
+    data = token_data["data"]
+
+    if _is_compact(token_data):
+        return TokenUser.construct(
+            username=token_data["sub"],
+            roles=data["r"],
+            disabled=data["d"],
+        )
+
+    return TokenUser.construct(
+        username=data["username"], roles=data["roles"], disabled=data["disabled"]
+    )
+
+
+def _generate_access_token(
+    user: UserPublic, generation: Optional[int] = None
+) -> tuple[str, datetime]:
+    """
+    With access_token_compact the token only carries the user's roles and
+    disabled flag under short claim names, otherwise the full profile.
+    """
+    data = user
+    if config.access_token_compact:
+        data = CompactUserClaims(roles=user.roles, disabled=user.disabled)
+
+    return generate_token(
+        claim=ACCESS_TOKEN,
+        expire_min=config.access_token_expire_min,
+        sub=user.username,
+        data=data,
+        generation=generation,
+    )
+
+
+def _is_compact(token_data: dict) -> bool:
+    return "r" in token_data["data"]
+
+
 async def _get_api_user_from_credentials(
     username: str, password: SecretStr
 ) -> UserPublic:
@@ -122,7 +221,7 @@ async def _get_api_user_from_credentials(
 
 async def _get_api_user_by_username(username: str) -> UserPublic:
     user_private = await user_service.fetch(username)
-    user_public = UserPublic(**user_private.dict())
+    user_public = convert_model(UserPublic, user_private)
 
     _check_authorized(user_public)
 
@@ -136,14 +235,45 @@ async def _authenticate_user(
 
     try:
         user_private = await user_service.fetch(username)
-        if verify_password(password=password, password_hash=user_private.password_hash):
-            user_public = UserPublic(**user_private.dict())
+        if await crypt.verify_password_async(
+            password=password, password_hash=user_private.password_hash
+        ):
+            user_public = convert_model(UserPublic, user_private)
+
+            if crypt.needs_update(user_private.password_hash):
+                cache.spawn(
+                    _rehash_password(
+                        username=username,
+                        password=password,
+                        password_hash=user_private.password_hash,
+                    )
+                )
     except ResourceNotFoundException:
         pass
 
     return user_public
 
 
+async def _rehash_password(username: str, password: SecretStr, password_hash: str):
+    """
+    Upgrades a password hash made with outdated settings after a successful
+    login, in the background so the login doesn't wait for the extra hash
+    and write. Skipped if the pool is busy, the next login retries it.
+    """
+    try:
+        new_password_hash = await crypt.hash_password_async(password)
+    except CryptUnavailableException:
+        logger.warning(f"Crypt pool busy, password rehash for '{username}' skipped")
+        return
+
+    if await user_service.update_password_hash(
+        username=username,
+        password_hash=password_hash,
+        new_password_hash=new_password_hash,
+    ):
+        logger.info(f"Password hash for '{username}' upgraded")
+
+
 def _check_authorized(user: UserPublic) -> bool:
     if user.disabled:
         raise UserDisabedException(f"User '{user.username}' has been disabled")
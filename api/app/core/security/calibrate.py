@@ -0,0 +1,72 @@
+"""
+Suggests crypt_bcrypt_rounds for a login latency budget, measured on the
+machine it runs on.
+
+python -m app.core.security.calibrate --budget-ms 250
+"""
+
+import argparse
+import time
+
+from passlib.hash import bcrypt
+
+MIN_ROUNDS = 4
+MAX_ROUNDS = 20
+SAMPLE_PASSWORD = "calibration password"
+
+
+def hash_time(rounds: int, samples: int) -> float:
+    """
+    Fastest of samples bcrypt hashes with rounds, in seconds.
+    """
+    hasher = bcrypt.using(rounds=rounds)
+    timings = []
+
+    for _ in range(samples):
+        start = time.perf_counter()
+        hasher.hash(SAMPLE_PASSWORD)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def suggest_rounds(budget: float, samples: int = 3) -> tuple[int, dict[int, float]]:
+    """
+    The most rounds hashing within budget seconds, and the hash time measured
+    for each rounds tried. Each round doubles the cost, so rounds are tried
+    upwards until one exceeds the budget.
+    """
+    timings = {}
+    suggested = MIN_ROUNDS
+
+    # the first hash loads the bcrypt backend
+    hash_time(MIN_ROUNDS, samples=1)
+
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        timings[rounds] = hash_time(rounds, samples=samples)
+        if timings[rounds] > budget:
+            break
+
+        suggested = rounds
+
+    return suggested, timings
+
+
+def main(args: list[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=250.0)
+    parser.add_argument("--samples", type=int, default=3)
+    parsed = parser.parse_args(args)
+
+    suggested, timings = suggest_rounds(
+        budget=parsed.budget_ms / 1000, samples=parsed.samples
+    )
+
+    for rounds, timing in timings.items():
+        print(f"rounds={rounds:<4} hash={timing * 1000:>10.1f}ms")
+
+    print(f"CRYPT_BCRYPT_ROUNDS={suggested}")
+
+
+if __name__ == "__main__":
+    main()
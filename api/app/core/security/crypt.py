@@ -1,7 +1,32 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
 from passlib.context import CryptContext
 from pydantic import SecretStr
 
-context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.config import get_config
+from app.core.exception import CryptUnavailableException
+from app.core.logging import get_logger
+
+config = get_config()
+
+logger = get_logger(__name__)
+
+context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=config.crypt_bcrypt_rounds,
+    bcrypt__min_rounds=config.crypt_bcrypt_rounds,
+    bcrypt__max_rounds=config.crypt_bcrypt_rounds,
+)
+
+T = TypeVar("T")
+
+_pool: Optional[ThreadPoolExecutor] = None  # pylint: disable=invalid-name
+_slots: Optional[asyncio.Semaphore] = None  # pylint: disable=invalid-name
+_slots_loop: Optional[asyncio.AbstractEventLoop] = None  # pylint: disable=invalid-name
+_waiting = 0  # pylint: disable=invalid-name
 
 
 def verify_password(password: SecretStr, password_hash: str) -> bool:
@@ -10,3 +35,95 @@ def verify_password(password: SecretStr, password_hash: str) -> bool:
 
 def hash_password(password: SecretStr) -> str:
     return context.hash(password.get_secret_value())
+
+
+def needs_update(password_hash: str) -> bool:
+    """
+    Whether password_hash was made with other settings than hash_password's
+    current ones, e.g. before crypt_bcrypt_rounds changed.
+    """
+    return context.needs_update(password_hash)
+
+
+async def verify_password_async(password: SecretStr, password_hash: str) -> bool:
+    """
+    verify_password on the crypt pool, keeping the event loop free while
+    bcrypt runs.
+    """
+    return await _run(lambda: verify_password(password, password_hash))
+
+
+async def hash_password_async(password: SecretStr) -> str:
+    """
+    hash_password on the crypt pool, keeping the event loop free while
+    bcrypt runs.
+    """
+    return await _run(lambda: hash_password(password))
+
+
+async def _run(func: Callable[[], T]) -> T:
+    """
+    Runs func on one of crypt_pool_size threads, bcrypt releases the GIL so
+    they hash in parallel. At most crypt_queue_depth calls wait for a thread,
+    for at most crypt_queue_timeout seconds, beyond that calls are rejected
+    with CryptUnavailableException rather than queueing without bound.
+    """
+    global _waiting  # pylint: disable=global-statement
+
+    slots = _crypt_slots()
+
+    if slots.locked():
+        if _waiting >= config.crypt_queue_depth:
+            raise CryptUnavailableException("Too many password checks queued")
+
+        _waiting += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=config.crypt_queue_timeout)
+        except asyncio.TimeoutError as te:
+            logger.warning("Timed out waiting for a crypt worker")
+            raise CryptUnavailableException(
+                "Timed out waiting for a crypt worker"
+            ) from te
+        finally:
+            _waiting -= 1
+    else:
+        await slots.acquire()
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_crypt_pool(), func)
+    finally:
+        slots.release()
+
+
+def _crypt_pool() -> ThreadPoolExecutor:
+    global _pool  # pylint: disable=global-statement
+
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=config.crypt_pool_size, thread_name_prefix="crypt"
+        )
+
+    return _pool
+
+
+def _crypt_slots() -> asyncio.Semaphore:
+    """
+    One slot per pool thread, recreated for each event loop since semaphores
+    can't be shared between loops.
+    """
+    global _slots, _slots_loop  # pylint: disable=global-statement
+
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots_loop is not loop:
+        _slots = asyncio.Semaphore(config.crypt_pool_size)
+        _slots_loop = loop
+
+    return _slots
+
+
+def close_crypt():
+    global _pool  # pylint: disable=global-statement
+
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,171 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from calendar import timegm
+from datetime import datetime
+from typing import Optional
+
+import orjson
+from jwt.exceptions import (
+    DecodeError,
+    ExpiredSignatureError,
+    ImmatureSignatureError,
+    InvalidAlgorithmError,
+    InvalidAudienceError,
+    InvalidIssuedAtError,
+    InvalidJTIError,
+    InvalidSignatureError,
+    InvalidSubjectError,
+)
+
+DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+class HmacJwtCodec:
+    """
+    Encodes and decodes JWTs signed with one HMAC algorithm and key, producing
+    the same tokens as jwt.encode for the same payload: the header segment is
+    encoded once and the keyed HMAC is copied per token instead of rebuilt.
+    Payloads are serialized with orjson, falling back to json for payloads
+    with text json escapes and orjson doesn't. Floats in exponent notation
+    are written differently by the two, e.g. 1e-07 and 1e-7, both decode to
+    the same claims.
+
+    Decoding checks the signature in constant time and the registered claims
+    like jwt.decode without an audience or issuer does, raising the same
+    jwt.exceptions: exp, nbf and iat are checked against the current time,
+    tokens with an aud are rejected and sub and jti must be strings.
+    """
+
+    def __init__(self, secret: str, algorithm: str):
+        self.algorithm = algorithm
+        self._hmac = hmac.new(secret.encode(), digestmod=DIGESTS[algorithm])
+        self._header = _b64encode(
+            orjson.dumps({"alg": algorithm, "typ": "JWT"}, option=orjson.OPT_SORT_KEYS)
+        )
+
+    def encode(self, payload: dict) -> str:
+        payload = payload.copy()
+        for claim in TIME_CLAIMS:
+            if isinstance(payload.get(claim), datetime):
+                payload[claim] = timegm(payload[claim].utctimetuple())
+
+        signing_input = self._header + b"." + _b64encode(_dumps(payload))
+
+        return (signing_input + b"." + _b64encode(self._sign(signing_input))).decode()
+
+    def decode(self, token: str) -> dict:
+        try:
+            signing_input, signature = token.encode().rsplit(b".", 1)
+            header, payload = signing_input.split(b".", 1)
+            signature = _b64decode(signature)
+        except (ValueError, binascii.Error) as error:
+            raise DecodeError("Invalid token") from error
+
+        if header != self._header:
+            self._check_header(header)
+
+        if not hmac.compare_digest(signature, self._sign(signing_input)):
+            raise InvalidSignatureError("Signature verification failed")
+
+        try:
+            claims = orjson.loads(_b64decode(payload))
+        except (ValueError, binascii.Error) as error:
+            raise DecodeError("Invalid payload") from error
+
+        if not isinstance(claims, dict):
+            raise DecodeError("Invalid payload, must be a json object")
+
+        _check_claims(claims)
+
+        return claims
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        signer = self._hmac.copy()
+        signer.update(signing_input)
+
+        return signer.digest()
+
+    def _check_header(self, segment: bytes):
+        """
+        Headers other than the one this codec writes, e.g. with keys in
+        another order, are accepted as long as they name its algorithm.
+        """
+        try:
+            header = orjson.loads(_b64decode(segment))
+        except (ValueError, binascii.Error) as error:
+            raise DecodeError("Invalid header") from error
+
+        if not isinstance(header, dict):
+            raise DecodeError("Invalid header, must be a json object")
+
+        if header.get("alg") != self.algorithm:
+            raise InvalidAlgorithmError("The specified alg value is not allowed")
+
+
+def codec_for(secret: str, algorithm: str) -> Optional[HmacJwtCodec]:
+    """
+    A codec for HMAC algorithms, None for any other algorithm.
+    """
+    if algorithm not in DIGESTS:
+        return None
+
+    return HmacJwtCodec(secret=secret, algorithm=algorithm)
+
+
+def _dumps(payload: dict) -> bytes:
+    """
+    json.dumps escapes non-ASCII and DEL characters, orjson writes them as is.
+    """
+    dumped = orjson.dumps(payload)
+
+    if dumped.isascii() and b"\x7f" not in dumped:
+        return dumped
+
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def _check_claims(claims: dict):
+    now = time.time()
+
+    if "iat" in claims and _time_claim(claims, "iat", InvalidIssuedAtError) > now:
+        raise ImmatureSignatureError("The token is not yet valid (iat)")
+
+    if "nbf" in claims and _time_claim(claims, "nbf", DecodeError) > now:
+        raise ImmatureSignatureError("The token is not yet valid (nbf)")
+
+    if "exp" in claims and _time_claim(claims, "exp", DecodeError) <= now:
+        raise ExpiredSignatureError("Signature has expired")
+
+    if claims.get("aud"):
+        raise InvalidAudienceError("Invalid audience")
+
+    if "sub" in claims and not isinstance(claims["sub"], str):
+        raise InvalidSubjectError("Subject must be a string")
+
+    if "jti" in claims and not isinstance(claims["jti"], str):
+        raise InvalidJTIError("JWT ID must be a string")
+
+
+def _time_claim(claims: dict, claim: str, error: type[Exception]) -> int:
+    try:
+        return int(claims[claim])
+    except (ValueError, TypeError, OverflowError):
+        raise error(f"{claim} claim must be an integer") from None
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
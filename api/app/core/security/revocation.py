@@ -0,0 +1,169 @@
+import asyncio
+import math
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.core.config import get_config
+from app.core.db import cache
+from app.core.db.backend import LOG_START
+from app.core.db.bloom import SlicedBloomFilter
+from app.core.exception import CacheUnavailableException
+from app.core.logging import get_logger
+
+config = get_config()
+
+logger = get_logger(__name__)
+
+REVOCATION_LOG = "REVOKED_TOKEN_LOG"
+REVOCATION_LOG_START_CACHE_PREFIX = "REVOKED_TOKEN_LOG_START"
+REVOCATION_LOG_START_TTL = 365 * 24 * 3600
+SYNC_BATCH_SIZE = 1000
+
+_filter: Optional[SlicedBloomFilter] = None  # pylint: disable=invalid-name
+_cursor = LOG_START  # pylint: disable=invalid-name
+_synced_at: Optional[float] = None  # pylint: disable=invalid-name
+_log_started: Optional[float] = None  # pylint: disable=invalid-name
+
+
+class RevocationLogStart(BaseModel):
+    started: float
+
+
+def _revocation_filter() -> SlicedBloomFilter:
+    """
+    Revoked token_ids sliced by token expiry, one slice per
+    access_token_expire_min, so revocations age out with their tokens.
+    """
+    global _filter  # pylint: disable=global-statement
+
+    if _filter is None:
+        _filter = SlicedBloomFilter(
+            slice_seconds=config.access_token_expire_min * 60,
+            slice_count=math.ceil(_max_token_age() / config.access_token_expire_min)
+            + 1,
+            max_bytes=config.revocation_filter_max_bytes,
+            fp_rate=config.revocation_filter_fp_rate,
+        )
+
+    return _filter
+
+
+def _max_token_age() -> float:
+    return max(config.access_token_expire_min, config.refresh_token_expire_min)
+
+
+def might_be_revoked(token_id: str, exp: float) -> bool:
+    """
+    False only if the token certainly wasn't revoked as of the last sync with
+    the revocation log. Every token might be revoked while the filter is
+    disabled, hasn't synced within revocation_filter_max_staleness seconds or
+    the log doesn't hold every revocation of still valid tokens yet.
+    """
+    if not config.revocation_filter_enabled or not _is_fresh() or not _is_complete():
+        return True
+
+    return _revocation_filter().might_contain(token_id, expires_at=exp)
+
+
+def _is_fresh() -> bool:
+    return (
+        _synced_at is not None
+        and time.monotonic() - _synced_at <= config.revocation_filter_max_staleness
+    )
+
+
+def _is_complete() -> bool:
+    """
+    Revocations made before the log started, e.g. while it was kept by older
+    versions or only while the filter was enabled, aren't in it, so the log is
+    only complete once every token that could have been revoked before it
+    started has expired.
+    """
+    return (
+        _log_started is not None and time.time() - _log_started >= _max_token_age() * 60
+    )
+
+
+async def record(token_id: str, exp: float):
+    """
+    Logs a revocation for filters to pick up on their next sync, also while
+    the filter is disabled so the log is complete when it's enabled, and adds
+    it to this worker's filter right away.
+    """
+    await cache.append_log(
+        REVOCATION_LOG, f"{token_id}|{exp}".encode(), max_age=_max_token_age() * 60
+    )
+
+    if config.revocation_filter_enabled:
+        _revocation_filter().add(token_id, expires_at=exp)
+
+
+async def sync() -> int:
+    """
+    Adds revocations logged since the last sync to the filter, returning how
+    many were added.
+    """
+    global _cursor, _synced_at, _log_started  # pylint: disable=global-statement
+
+    started = time.monotonic()
+    revocation_filter = _revocation_filter()
+    synced = 0
+
+    if _log_started is None:
+        _log_started = await _load_log_start()
+
+    while True:
+        entries = await cache.read_log(
+            REVOCATION_LOG, after=_cursor, count=SYNC_BATCH_SIZE
+        )
+
+        for entry_id, value in entries:
+            token_id, _, exp = value.decode().partition("|")
+            revocation_filter.add(token_id, expires_at=float(exp))
+            _cursor = entry_id
+
+        synced += len(entries)
+
+        if len(entries) < SYNC_BATCH_SIZE:
+            break
+
+    _synced_at = started
+
+    return synced
+
+
+async def _load_log_start() -> float:
+    """
+    When the log started holding every revocation, recorded by the first
+    worker to sync so later workers and restarts agree on it.
+    """
+    log_start = RevocationLogStart(started=time.time())
+    await cache.add_many(
+        prefix=REVOCATION_LOG_START_CACHE_PREFIX,
+        docs={REVOCATION_LOG: (log_start, REVOCATION_LOG_START_TTL)},
+    )
+    stored = await cache.fetch(
+        prefix=REVOCATION_LOG_START_CACHE_PREFIX,
+        key=REVOCATION_LOG,
+        doc_model=RevocationLogStart,
+    )
+
+    return (stored or log_start).started
+
+
+async def watch():
+    """
+    Syncs the filter every revocation_filter_sync_interval seconds until
+    cancelled.
+    """
+    while True:
+        try:
+            synced = await sync()
+            if synced:
+                logger.info(f"Revocation filter synced {synced} revocations")
+        except CacheUnavailableException:
+            logger.warning("Revocation filter sync failed, using cache lookups")
+
+        await asyncio.sleep(config.revocation_filter_sync_interval)
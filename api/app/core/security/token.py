@@ -1,5 +1,10 @@
+import asyncio
+import hashlib
+import time
+from contextlib import suppress
 from datetime import datetime, timedelta, timezone
-from uuid import uuid4
+from typing import Optional
+from uuid import UUID, uuid4
 
 import jwt
 from jwt.exceptions import InvalidTokenError
@@ -7,19 +12,28 @@ from pydantic import BaseModel
 
 from app.core.config import get_config
 from app.core.db import cache
-from app.core.exception import InvalidTokenException
+from app.core.db.lru import MISSING, LruCache
+from app.core.exception import CacheUnavailableException, InvalidTokenException
 from app.core.logging import get_logger
-from app.core.util import (
-    PydanticModel,
-    convert_datetime_to_str,
-    convert_timestamp_to_ttl,
-)
+from app.core.security import revocation
+from app.core.security.jwt_codec import codec_for
+from app.core.util import PydanticModel, construct_model, convert_datetime_to_str
 
 config = get_config()
 
 logger = get_logger(__name__)
 
 REVOKED_TOKEN_CACHE_PREFIX = "REVOKED_TOKEN"
+TOKEN_GENERATION_CACHE_PREFIX = "TOKEN_GENERATION"
+REVOCATION_BUCKET_SECONDS = 3600
+
+_verified = LruCache(max_entries=config.token_cache_max_entries)
+_generations = LruCache(
+    max_entries=config.token_cache_max_entries, ttl=config.token_generation_ttl
+)
+_codec = codec_for(
+    secret=config.jwt_secret_key.get_secret_value(), algorithm=config.jwt_algorithm
+)
 
 
 class RevokedToken(BaseModel):
@@ -32,14 +46,18 @@ class RevokedToken(BaseModel):
 
 
 def generate_token(
-    claim: str, expire_min: float, sub: str, data: PydanticModel = None
+    claim: str,
+    expire_min: float,
+    sub: str,
+    data: PydanticModel = None,
+    generation: Optional[int] = None,
 ) -> tuple[str, datetime]:
     date_created = datetime.now(timezone.utc)
     date_expires = date_created + timedelta(minutes=expire_min)
 
     data_dict = None
     if data:
-        data_dict = data.dict()
+        data_dict = data.dict(by_alias=True)
         convert_datetime_to_str(data_dict)
 
     jwt_data = {
@@ -49,68 +67,300 @@ def generate_token(
         "sub": sub,
         "data": data_dict,
     }
+    if generation is not None:
+        jwt_data["gen"] = generation
 
-    encoded_jwt = jwt.encode(
-        jwt_data, config.jwt_secret_key.get_secret_value(), config.jwt_algorithm
-    )
-
-    return encoded_jwt, date_expires
+    return _encode_jwt(jwt_data), date_expires
 
 
 async def validate_token(claim: str, token: str) -> dict:
-    jwt_data = None
+    jwt_data = _verify(claim=claim, token=token)
 
-    try:
-        jwt_data = jwt.decode(
-            token,
-            config.jwt_secret_key.get_secret_value(),
-            algorithms=[config.jwt_algorithm],
+    token_id = jwt_data["token_id"]
+
+    revoked, current = await asyncio.gather(
+        _is_token_revoked(token_id, exp=jwt_data["exp"]),
+        _is_current_generation(jwt_data),
+    )
+
+    if revoked or not current:
+        raise InvalidTokenException(
+            f"Token with token_id '{token_id}' has been revoked"
         )
 
-        decoded_claim = jwt_data.get("claim", None)
-        if decoded_claim != claim:
-            raise InvalidTokenException(
-                f"Token claim '{decoded_claim}' didn't match expected claim '{claim}'"
+    return jwt_data
+
+
+async def revoke_token(claim: str, token: str, revoke_reason: str) -> bool:
+    (revoked,) = await revoke_tokens(
+        tokens=[(claim, token)], revoke_reason=revoke_reason
+    )
+
+    return revoked
+
+
+async def revoke_tokens(
+    tokens: list[tuple[str, str]], revoke_reason: str
+) -> list[bool]:
+    """
+    Revokes (claim, token) pairs together, returning for each whether it was
+    revoked: False if it was invalid, expired or already revoked.
+
+    Tokens are verified locally, then each token_id is added to its
+    revocation set, which checks and revokes in one round trip per cache
+    node. Generations are checked at the same time, so a token of an old
+    generation may get a redundant revocation but is still reported as not
+    revoked.
+    """
+    verified = {}
+    for claim, token in tokens:
+        with suppress(InvalidTokenException):
+            verified[token] = _verify(claim=claim, token=token)
+
+    if not verified:
+        return [False] * len(tokens)
+
+    revoked_tokens = [
+        construct_model(RevokedToken, jwt_data | {"revoke_reason": revoke_reason})
+        for jwt_data in verified.values()
+    ]
+    generations = {
+        (jwt_data["sub"], jwt_data.get("gen")): jwt_data
+        for jwt_data in verified.values()
+    }
+
+    added, *current = await asyncio.gather(
+        cache.add_members(
+            prefix=REVOKED_TOKEN_CACHE_PREFIX,
+            members=[
+                _revocation_entry(revoked_token.token_id, exp=revoked_token.exp)
+                for revoked_token in revoked_tokens
+            ],
+        ),
+        *[_is_current_generation(jwt_data) for jwt_data in generations.values()],
+    )
+    added = dict(
+        zip([revoked_token.token_id for revoked_token in revoked_tokens], added)
+    )
+    current = dict(zip(generations, current))
+
+    for token in verified:
+        _verified.delete(_token_key(token))
+
+    for revoked_token in revoked_tokens:
+        if added[revoked_token.token_id]:
+            logger.info(
+                f"Token '{revoked_token.token_id}' of '{revoked_token.sub}' "
+                f"revoked: {revoked_token.revoke_reason}"
             )
 
+    await asyncio.gather(
+        *[
+            revocation.record(revoked_token.token_id, exp=revoked_token.exp)
+            for revoked_token in revoked_tokens
+            if added[revoked_token.token_id]
+        ]
+    )
+
+    revoked = []
+    for _, token in tokens:
+        jwt_data = verified.get(token)
+        revoked.append(
+            jwt_data is not None
+            and added[jwt_data["token_id"]]
+            and current[(jwt_data["sub"], jwt_data.get("gen"))]
+        )
+
+    return revoked
+
+
+async def token_generation(sub: str) -> Optional[int]:
+    """
+    The generation embedded in sub's new tokens, None when token generations
+    are disabled. Only tokens of the current generation are valid.
+    """
+    if not config.token_generation_enabled:
+        return None
+
+    return await _fetch_generation(sub)
+
+
+async def revoke_all_tokens(sub: str) -> Optional[int]:
+    """
+    Revokes every token issued to sub in one write by moving it to a new
+    generation, returning the new generation.
+    """
+    if not config.token_generation_enabled:
+        return None
+
+    generation = await cache.incr_counter(prefix=TOKEN_GENERATION_CACHE_PREFIX, key=sub)
+    _remember_generation(sub, generation)
+    logger.info(f"Tokens for '{sub}' revoked, now at generation {generation}")
+
+    return generation
+
+
+def _verify(claim: str, token: str) -> dict:
+    """
+    Checks the token's signature, expiry and claim without any cache lookups.
+    """
+    try:
+        jwt_data = _decode(token)
     except InvalidTokenError as ite:
         logger.error(ite)
         raise InvalidTokenException(f"Invalid token with claim '{claim}'") from ite
 
-    token_id = jwt_data["token_id"]
-
-    if await _is_token_revoked(token_id):
+    decoded_claim = jwt_data.get("claim", None)
+    if decoded_claim != claim:
         raise InvalidTokenException(
-            f"Token with token_id '{token_id}' has been revoked"
+            f"Token claim '{decoded_claim}' didn't match expected claim '{claim}'"
         )
 
     return jwt_data
 
 
-async def revoke_token(claim: str, token: str, revoke_reason: str) -> bool:
-    revoked = True
+def _decode(token: str) -> dict:
+    """
+    _decode_jwt, with the verified claims cached by a hash of the token until
+    it expires so repeat requests with the same token skip the signature
+    check and parse. Revocation is checked separately on every call. Cached
+    claims are shared, so callers must treat them as read-only.
+    """
+    if not config.token_cache_max_entries:
+        return _decode_jwt(token)
+
+    key = _token_key(token)
+    jwt_data = _verified.get(key)
+
+    if jwt_data is MISSING or jwt_data["exp"] <= time.time():
+        jwt_data = _decode_jwt(token)
+
+        exp = jwt_data.get("exp")
+        if exp is not None:
+            _verified.set(key, jwt_data, ttl=exp - time.time())
+
+    return jwt_data
+
+
+def _encode_jwt(jwt_data: dict) -> str:
+    """
+    Encodes with the HMAC codec for HS* algorithms, with PyJWT otherwise.
+    """
+    if _codec is not None:
+        return _codec.encode(jwt_data)
+
+    return jwt.encode(
+        jwt_data, config.jwt_secret_key.get_secret_value(), config.jwt_algorithm
+    )
+
+
+def _decode_jwt(token: str) -> dict:
+    if _codec is not None:
+        return _codec.decode(token)
+
+    return jwt.decode(
+        token,
+        config.jwt_secret_key.get_secret_value(),
+        algorithms=[config.jwt_algorithm],
+    )
+
+
+def _token_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+async def _is_token_revoked(token_id: str, exp: int) -> bool:
+    """
+    With revocation_legacy_check tokens revoked before revocation sets, stored
+    as a RevokedToken document per token_id, are checked at the same time.
+    """
+    if not revocation.might_be_revoked(token_id, exp=exp):
+        return False
+
+    key, member, _ = _revocation_entry(token_id, exp=exp)
 
     try:
-        jwt_data = await validate_token(claim=claim, token=token)
-        revoked_token = RevokedToken(
-            **jwt_data,
-            revoke_reason=revoke_reason,
+        if not config.revocation_legacy_check:
+            return await cache.is_member(
+                prefix=REVOKED_TOKEN_CACHE_PREFIX, key=key, member=member
+            )
+
+        revoked, legacy = await asyncio.gather(
+            cache.is_member(prefix=REVOKED_TOKEN_CACHE_PREFIX, key=key, member=member),
+            cache.fetch(
+                prefix=REVOKED_TOKEN_CACHE_PREFIX, key=token_id, doc_model=RevokedToken
+            ),
         )
-        await cache.put(
-            prefix=REVOKED_TOKEN_CACHE_PREFIX,
-            key=revoked_token.token_id,
-            doc=revoked_token,
-            ttl=convert_timestamp_to_ttl(revoked_token.exp),
+
+        return revoked or legacy is not None
+    except CacheUnavailableException:
+        if not config.cache_revocation_fail_open:
+            raise
+
+        logger.warning(f"Cache unavailable, treating token '{token_id}' as valid")
+        return False
+
+
+def _revocation_entry(token_id: str, exp: int) -> tuple[str, bytes, int]:
+    """
+    Revoked token_ids are kept as 16 byte members of sets bucketed by token
+    expiry, one bucket per REVOCATION_BUCKET_SECONDS and split 16 ways by the
+    token_id's first character to spread buckets over cache nodes. A bucket
+    expires as a whole once the last token it can hold has expired.
+    """
+    bucket = int(exp) // REVOCATION_BUCKET_SECONDS
+
+    try:
+        member = UUID(token_id).bytes
+    except ValueError:
+        member = token_id.encode()
+
+    return (
+        f"{bucket}:{token_id[:1]}",
+        member,
+        (bucket + 1) * REVOCATION_BUCKET_SECONDS,
+    )
+
+
+async def _is_current_generation(jwt_data: dict) -> bool:
+    """
+    Tokens issued without a generation predate generations and are only
+    subject to per token revocation.
+
+    Generations are kept in memory for token_generation_ttl seconds so most
+    checks don't reach the cache, a token that doesn't match the remembered
+    generation is checked against the cache. Tokens revoked by a bump on
+    another worker may be accepted for up to token_generation_ttl seconds.
+    """
+    generation = jwt_data.get("gen")
+    if generation is None:
+        return True
+
+    try:
+        current = _generations.get(jwt_data["sub"])
+        if current != generation:
+            current = await _fetch_generation(jwt_data["sub"])
+    except CacheUnavailableException:
+        if not config.cache_revocation_fail_open:
+            raise
+
+        logger.warning(
+            f"Cache unavailable, treating tokens of '{jwt_data['sub']}' as current"
         )
-    except InvalidTokenException:
-        revoked = False
+        return True
 
-    return revoked
+    return generation == current
 
 
-async def _is_token_revoked(token_id: str) -> bool:
-    revoked_token = await cache.fetch(
-        prefix=REVOKED_TOKEN_CACHE_PREFIX, key=token_id, doc_model=RevokedToken
+async def _fetch_generation(sub: str) -> int:
+    generation = await cache.fetch_counter(
+        prefix=TOKEN_GENERATION_CACHE_PREFIX, key=sub
     )
+    _remember_generation(sub, generation)
+
+    return generation
+
 
-    return revoked_token is not None
+def _remember_generation(sub: str, generation: int):
+    if config.token_generation_ttl:
+        _generations.set(sub, generation)
@@ -4,6 +4,8 @@ from uuid import UUID
 
 from pydantic import BaseModel
 
+TODO_LISTS_CACHE_PREFIX = "TODO_LISTS"
+
 
 class TodoList(BaseModel):
     todo_list_id: UUID
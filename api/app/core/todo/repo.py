@@ -5,10 +5,13 @@ from beanie import Document, Indexed
 from pymongo.errors import DuplicateKeyError
 
 from app.core import util
+from app.core.config import get_config
+from app.core.db.cache_aside import cached, invalidates
 from app.core.exception import DataConflictException, ResourceNotFoundException
 from app.core.logging import get_logger
 
 from .model import (
+    TODO_LISTS_CACHE_PREFIX,
     Todo,
     TodoCreate,
     TodoList,
@@ -17,6 +20,7 @@ from .model import (
     TodoUpdate,
 )
 
+config = get_config()
 logger = get_logger(__name__)
 
 
@@ -38,6 +42,7 @@ class TodoDb(Document):
     date_modified: datetime | None = None
 
 
+@invalidates(prefix=TODO_LISTS_CACHE_PREFIX, key="{username}")
 async def create_todo_list(username: str, todo_list_create: TodoListCreate) -> TodoList:
     todo_list_db = TodoListDb(
         **todo_list_create.dict(),
@@ -53,15 +58,23 @@ async def create_todo_list(username: str, todo_list_create: TodoListCreate) -> T
             f"Todo list resource already exists with id '{todo_list_create.todo_list_id}'"  # pylint: disable=line-too-long
         ) from dke
 
-    return TodoList(**todo_list_db.dict())
+    return util.convert_model(TodoList, todo_list_db)
 
 
+@cached(
+    prefix=TODO_LISTS_CACHE_PREFIX,
+    key="{username}",
+    doc_model=list[TodoList],
+    ttl=config.cache_ttl_todo_lists,
+)
 async def fetch_todo_lists(username: str) -> list[TodoList]:
     todo_list_dbs = await TodoListDb.find_many(
         TodoListDb.username == username
     ).to_list()
 
-    todo_lists = [TodoList(**todo_list_db.dict()) for todo_list_db in todo_list_dbs]
+    todo_lists = [
+        util.convert_model(TodoList, todo_list_db) for todo_list_db in todo_list_dbs
+    ]
 
     for todo_list in todo_lists:
         util.update_date_timezones_to_utc(todo_list, ["date_created", "date_modified"])
@@ -69,6 +82,7 @@ async def fetch_todo_lists(username: str) -> list[TodoList]:
     return todo_lists
 
 
+@invalidates(prefix=TODO_LISTS_CACHE_PREFIX, key="{username}")
 async def update_todo_list(
     username: str, todo_list_id: UUID, todo_list_update: TodoListUpdate
 ) -> TodoList:
@@ -93,12 +107,13 @@ async def update_todo_list(
 
     await todo_list_db.replace()
 
-    todo_list = TodoList(**todo_list_db.dict())
+    todo_list = util.convert_model(TodoList, todo_list_db)
     util.update_date_timezones_to_utc(todo_list, ["date_created", "date_modified"])
 
     return todo_list
 
 
+@invalidates(prefix=TODO_LISTS_CACHE_PREFIX, key="{username}")
 async def delete_todo_list(username: str, todo_list_id: UUID) -> TodoList:
     todo_list_dbs = (
         await TodoListDb.find(TodoListDb.todo_list_id == todo_list_id)
@@ -120,7 +135,7 @@ async def delete_todo_list(username: str, todo_list_id: UUID) -> TodoList:
 
     await todo_list_db.delete()
 
-    todo_list = TodoList(**todo_list_db.dict())
+    todo_list = util.convert_model(TodoList, todo_list_db)
     util.update_date_timezones_to_utc(todo_list, ["date_created", "date_modified"])
 
     return todo_list
@@ -159,7 +174,7 @@ async def create_todo(username: str, todo_create: TodoCreate) -> Todo:
             f"Todo resource already exists with id '{todo_create.todo_id}'"
         ) from dke
 
-    return Todo(**todo_db.dict())
+    return util.convert_model(Todo, todo_db)
 
 
 async def fetch_todos(
@@ -189,7 +204,7 @@ async def fetch_todos(
     else:
         todo_dbs = await TodoDb.find(TodoDb.username == username).to_list()
 
-    todos = [Todo(**todo_db.dict()) for todo_db in todo_dbs]
+    todos = [util.convert_model(Todo, todo_db) for todo_db in todo_dbs]
 
     for todo in todos:
         util.update_date_timezones_to_utc(todo, ["date_created", "date_modified"])
@@ -226,7 +241,7 @@ async def update_todo(username: str, todo_id: UUID, todo_update: TodoUpdate) ->
 
     await todo_db.replace()
 
-    todo = Todo(**todo_db.dict())
+    todo = util.convert_model(Todo, todo_db)
     util.update_date_timezones_to_utc(todo, ["date_created", "date_modified"])
 
     return todo
@@ -247,7 +262,7 @@ async def delete_todo(username: str, todo_id: UUID) -> Todo:
 
     await todo_db.delete()
 
-    todo = Todo(**todo_db.dict())
+    todo = util.convert_model(Todo, todo_db)
     util.update_date_timezones_to_utc(todo, ["date_created", "date_modified"])
 
     return todo
@@ -1,15 +1,25 @@
+import asyncio
 from datetime import datetime, timezone
+from typing import Optional
 
-from beanie import Document, Indexed
+from beanie import Document, Indexed, SortDirection
+from beanie.operators import NE, Set
 from pydantic import EmailStr
-from pymongo.errors import DuplicateKeyError
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
 
 from app.core import util
 from app.core.config import get_config
 from app.core.db import cache
-from app.core.exception import DataConflictException, ResourceNotFoundException
+from app.core.db.cache_aside import cached, invalidate_many, invalidates
+from app.core.exception import (
+    CacheUnavailableException,
+    DataConflictException,
+    ResourceNotFoundException,
+)
 from app.core.logging import get_logger
 from app.core.security import crypt
+from app.core.security.token import revoke_all_tokens
 
 from .model import (
     USER_CACHE_PREFIX,
@@ -22,6 +32,8 @@ from .model import (
 config = get_config()
 logger = get_logger(__name__)
 
+_pending_logins: dict[str, datetime] = {}
+
 
 class UserDb(Document):
     username: Indexed(str, unique=True)
@@ -37,11 +49,12 @@ class UserDb(Document):
     password_hash: str
 
 
+@invalidates(prefix=USER_CACHE_PREFIX, key="{user_create.username}")
 async def create(user_create: UserCreate, roles: list[str]) -> UserPrivate:
     if roles is None:
         roles = []
 
-    password_hash = crypt.hash_password(user_create.password)
+    password_hash = await crypt.hash_password_async(user_create.password)
     user_db = UserDb(
         **user_create.dict(),
         date_created=datetime.now(timezone.utc),
@@ -55,38 +68,45 @@ async def create(user_create: UserCreate, roles: list[str]) -> UserPrivate:
         logger.error(dke)
         raise DataConflictException("Email or username already exists") from dke
 
-    return UserPrivate(**user_db.dict())
+    return util.convert_model(UserPrivate, user_db)
 
 
 async def fetch(username: str) -> UserPrivate:
     logger.info(f"fetching user: {username} from db")
 
-    user_private = await cache.fetch(
-        prefix=USER_CACHE_PREFIX, key=username, doc_model=UserPrivate
-    )
-    if not user_private:
-        user_db = await UserDb.find_one(UserDb.username == username)
-
-        if user_db:
-            user_private = UserPrivate(**user_db.dict())
-            util.update_date_timezones_to_utc(
-                user_private, ["date_created", "date_modified", "last_login"]
-            )
-            await cache.put(
-                prefix=USER_CACHE_PREFIX,
-                key=username,
-                doc=user_private,
-                ttl=config.cache_ttl_user,
-            )
+    user_private = await _fetch_cached(username)
 
     if not user_private:
         raise ResourceNotFoundException(
             f"User resource not found for username '{username}'"
         )
 
+    return _with_pending_login(user_private)
+
+
+@cached(
+    prefix=USER_CACHE_PREFIX,
+    key="{username}",
+    doc_model=UserPrivate,
+    ttl=config.cache_ttl_user,
+    soft_ttl=config.cache_soft_ttl_user,
+    missing_ttl=config.cache_ttl_user_missing,
+    codec=cache.configured_codec(trusted=True),
+)
+async def _fetch_cached(username: str) -> Optional[UserPrivate]:
+    user_private = None
+    user_db = await UserDb.find_one(UserDb.username == username)
+
+    if user_db:
+        user_private = util.convert_model(UserPrivate, user_db)
+        util.update_date_timezones_to_utc(
+            user_private, ["date_created", "date_modified", "last_login"]
+        )
+
     return user_private
 
 
+@invalidates(prefix=USER_CACHE_PREFIX, key="{username}")
 async def update(username: str, user_update: UserUpdate) -> UserPrivate:
     user_db = await UserDb.find_one(UserDb.username == username)
 
@@ -105,27 +125,31 @@ async def update(username: str, user_update: UserUpdate) -> UserPrivate:
         user_db.email = user_update.email
 
     if user_update.password:
-        password_hash = crypt.hash_password(user_update.password)
+        password_hash = await crypt.hash_password_async(user_update.password)
         user_db.password_hash = password_hash
 
     user_db.date_modified = datetime.now(timezone.utc)
 
+    # before the write, so the password doesn't change if this fails
+    if user_update.password:
+        await revoke_all_tokens(username)
+
     # todo: check duplicate key error
     try:
         await user_db.replace()
-        await cache.delete(prefix=USER_CACHE_PREFIX, key=username)
     except DuplicateKeyError as dke:
         logger.error(dke)
         raise DataConflictException("Email already exists") from dke
 
-    user_private = UserPrivate(**user_db.dict())
+    user_private = util.convert_model(UserPrivate, user_db)
     util.update_date_timezones_to_utc(
         user_private, ["date_created", "date_modified", "last_login"]
     )
 
-    return user_private
+    return _with_pending_login(user_private)
 
 
+@invalidates(prefix=USER_CACHE_PREFIX, key="{username}")
 async def update_private(
     username: str, user_update_private: UserUpdatePrivate
 ) -> UserPrivate:
@@ -147,13 +171,157 @@ async def update_private(
 
     user_db.date_modified = datetime.now(timezone.utc)
 
-    await user_db.replace()
+    # before the write, so the user isn't disabled if this fails
+    if user_update_private.disabled:
+        await revoke_all_tokens(username)
 
-    await cache.delete(prefix=USER_CACHE_PREFIX, key=username)
+    await user_db.replace()
 
-    user_private = UserPrivate(**user_db.dict())
+    user_private = util.convert_model(UserPrivate, user_db)
     util.update_date_timezones_to_utc(
         user_private, ["date_created", "date_modified", "last_login"]
     )
 
+    return _with_pending_login(user_private)
+
+
+@invalidates(prefix=USER_CACHE_PREFIX, key="{username}")
+async def update_password_hash(
+    username: str, password_hash: str, new_password_hash: str
+) -> bool:
+    """
+    Replaces the user's password_hash with an equivalent new_password_hash,
+    only if it is still password_hash so a concurrent password change isn't
+    overwritten, returning whether it was replaced. Unlike a password change
+    this keeps date_modified and the user's tokens.
+    """
+    result = await UserDb.find_one(
+        UserDb.username == username, UserDb.password_hash == password_hash
+    ).update(Set({UserDb.password_hash: new_password_hash}))
+
+    return result.modified_count == 1
+
+
+def record_login(username: str, last_login: datetime):
+    """
+    Buffers the user's last_login for the next flush_logins instead of
+    writing it now, fetch returns it until then.
+    """
+    _pending_logins[username] = last_login
+
+
+def _with_pending_login(user_private: UserPrivate) -> UserPrivate:
+    last_login = _pending_logins.get(user_private.username)
+
+    if last_login:
+        user_private = user_private.copy(update={"last_login": last_login})
+
     return user_private
+
+
+async def flush_logins() -> int:
+    """
+    Writes buffered last_logins in one unordered bulk write of $set updates
+    and invalidates the users' cached entries, returning how many were
+    written. On failure or cancellation they are buffered again unless a newer
+    login was recorded meanwhile.
+    """
+    if not _pending_logins:
+        return 0
+
+    pending = dict(_pending_logins)
+    _pending_logins.clear()
+
+    try:
+        await UserDb.get_motor_collection().bulk_write(
+            [
+                UpdateOne({"username": username}, {"$set": {"last_login": last_login}})
+                for username, last_login in pending.items()
+            ],
+            ordered=False,
+        )
+    except PyMongoError as pme:
+        logger.error(f"Flushing {len(pending)} last_logins failed: {pme}")
+        _rebuffer_logins(pending)
+        return 0
+    except asyncio.CancelledError:
+        _rebuffer_logins(pending)
+        raise
+
+    await invalidate_many(prefix=USER_CACHE_PREFIX, keys=list(pending))
+
+    return len(pending)
+
+
+def _rebuffer_logins(pending: dict[str, datetime]):
+    for username, last_login in pending.items():
+        _pending_logins.setdefault(username, last_login)
+
+
+async def watch_logins():
+    """
+    Flushes buffered last_logins every user_login_flush_interval seconds
+    until cancelled.
+    """
+    while True:
+        await asyncio.sleep(config.user_login_flush_interval)
+        await flush_logins()
+
+
+async def warm_cache() -> int:
+    """
+    Preloads the cache_warm_users most recently logged in users into the
+    cache, cache_warm_batch_size users per round trip and at most
+    cache_warm_rate users per second, returning how many were warmed.
+    """
+    warmed = 0
+    batch: dict[str, UserPrivate] = {}
+    user_dbs = (
+        UserDb.find(NE(UserDb.last_login, None))
+        .sort((UserDb.last_login, SortDirection.DESCENDING))
+        .limit(config.cache_warm_users)
+    )
+
+    logger.info(f"Cache warm-up started for up to {config.cache_warm_users} users")
+
+    try:
+        async for user_db in user_dbs:
+            user_private = util.convert_model(UserPrivate, user_db)
+            util.update_date_timezones_to_utc(
+                user_private, ["date_created", "date_modified", "last_login"]
+            )
+            batch[user_private.username] = user_private
+
+            if len(batch) >= config.cache_warm_batch_size:
+                warmed += await _warm_batch(batch)
+                batch = {}
+
+        if batch:
+            warmed += await _warm_batch(batch)
+    except CacheUnavailableException:
+        logger.warning(f"Cache warm-up stopped, cache unavailable after {warmed} users")
+        return warmed
+
+    logger.info(f"Cache warm-up complete, {warmed} users warmed")
+
+    return warmed
+
+
+async def _warm_batch(batch: dict[str, UserPrivate]) -> int:
+    """
+    Only adds users that aren't cached yet, so entries written since the
+    batch was read aren't overwritten with older data. Warmed entries don't
+    get a soft ttl.
+    """
+    added = await cache.add_many(
+        prefix=USER_CACHE_PREFIX,
+        docs={
+            username: (user_private, config.cache_ttl_user)
+            for username, user_private in batch.items()
+        },
+    )
+    logger.info(f"Cache warm-up stored {sum(added)} of {len(batch)} users")
+
+    await asyncio.sleep(len(batch) / config.cache_warm_rate)
+
+    return sum(added)
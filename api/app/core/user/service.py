@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from app.core.config import get_config
 from app.core.logging import get_logger
 from app.core.user import repo as user_repo
@@ -27,3 +29,17 @@ async def update_private(
     return await user_repo.update_private(
         username=username, user_update_private=user_update_private
     )
+
+
+async def update_password_hash(
+    username: str, password_hash: str, new_password_hash: str
+) -> bool:
+    return await user_repo.update_password_hash(
+        username=username,
+        password_hash=password_hash,
+        new_password_hash=new_password_hash,
+    )
+
+
+def record_login(username: str, last_login: datetime):
+    user_repo.record_login(username=username, last_login=last_login)
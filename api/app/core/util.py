@@ -1,6 +1,7 @@
 import os
 from datetime import datetime, timezone
 from typing import Any, Type, TypeVar, get_type_hints
+from uuid import UUID
 
 from pydantic import BaseModel, SecretStr
 
@@ -58,3 +59,51 @@ def populate_from_env(doc_model: Type[PydanticModel]) -> dict:
             env[key] = value_type(value)
 
     return env
+
+
+def construct_model(doc_model: Type[PydanticModel], data: dict) -> PydanticModel:
+    """
+    Builds doc_model from data the app produced itself without validating it.
+    Serialized datetime, UUID and nested model fields are converted back to
+    their types, everything else is used as-is. Keys that aren't fields of
+    doc_model are dropped, as validation would.
+    """
+    values = {name: data[name] for name in doc_model.__fields__ if name in data}
+
+    for name, field in doc_model.__fields__.items():
+        value = values.get(name)
+
+        if value is None:
+            continue
+
+        if field.type_ is datetime and isinstance(value, str):
+            values[name] = datetime.fromisoformat(value)
+        elif field.type_ is UUID and isinstance(value, str):
+            values[name] = UUID(value)
+        elif isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+            if isinstance(value, dict):
+                values[name] = construct_model(field.type_, value)
+            elif isinstance(value, list):
+                values[name] = [
+                    (
+                        construct_model(field.type_, item)
+                        if isinstance(item, dict)
+                        else item
+                    )
+                    for item in value
+                ]
+
+    return doc_model.construct(**values)
+
+
+def convert_model(doc_model: Type[PydanticModel], model: BaseModel) -> PydanticModel:
+    """
+    Builds doc_model from the fields it shares with model, an instance the app
+    validated or loaded itself, without validating them again. Unlike
+    doc_model(**model.dict()) values are shared with model, not copied.
+    """
+    values = model.__dict__
+
+    return doc_model.construct(
+        **{name: values[name] for name in doc_model.__fields__ if name in values}
+    )
@@ -1,12 +1,20 @@
+import asyncio
+import contextlib
+
 from fastapi import FastAPI
 
 from app.core.api.middleware import middlewares
 from app.core.api.router import router
-from app.core.config import app_settings
+from app.core.config import app_settings, get_config
+from app.core.db.cache import close_cache, init_cache, spawn
 from app.core.db.initialize import init_db
 from app.core.exception import register_exceptions
 from app.core.logging import get_logger
+from app.core.security import revocation
+from app.core.security.crypt import close_crypt
+from app.core.user.repo import flush_logins, warm_cache, watch_logins
 
+config = get_config()
 logger = get_logger(__name__)
 
 
@@ -24,4 +32,28 @@ app = app_setup()
 @app.on_event("startup")
 async def app_init():
     logger.info("App initializing")
-    return await init_db(app)
+    await init_cache()
+    initialized = await init_db(app)
+    app.state.login_watcher = spawn(watch_logins())
+
+    if config.cache_warm_enabled:
+        spawn(warm_cache())
+
+    if config.revocation_filter_enabled:
+        spawn(revocation.watch())
+
+    return initialized
+
+
+@app.on_event("shutdown")
+async def app_shutdown():
+    logger.info("App shutting down")
+    close_crypt()
+    # stopped before the final flush so it doesn't race or interrupt it
+    login_watcher = app.state.login_watcher
+    login_watcher.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await login_watcher
+    await flush_logins()
+
+    return await close_cache()
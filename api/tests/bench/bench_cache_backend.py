@@ -0,0 +1,64 @@
+"""
+Per-call latency of cache.fetch hits and cache.put through the configured
+backend, using a trusted codec so decoding stays out of the way. With
+CACHE_BACKEND=memory no cache service is needed.
+
+python -m tests.bench.bench_cache_backend
+"""
+
+import asyncio
+import time
+
+from app.core.db import cache
+from app.core.user.model import UserPrivate
+from tests.bench.util import report
+from tests.factories.user_factory import UserPrivateFactory
+
+ITERATIONS = 5000
+
+
+async def put(user_private: UserPrivate) -> list[float]:
+    timings = []
+
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        await cache.put(
+            prefix="BENCH", key=user_private.username, doc=user_private, ttl=60
+        )
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+async def fetch(user_private: UserPrivate) -> list[float]:
+    timings = []
+
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        await cache.fetch(
+            prefix="BENCH", key=user_private.username, doc_model=UserPrivate
+        )
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+async def run():
+    user_private = UserPrivateFactory.build()
+    backend = cache.config.cache_backend
+    cache.register_codec("BENCH", cache.configured_codec(trusted=True))
+    await cache.init_cache()
+
+    report(f"{backend} put", await put(user_private))
+    report(f"{backend} fetch hit", await fetch(user_private))
+
+    await cache.delete(prefix="BENCH", key=user_private.username)
+    await cache.close_cache()
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Encoded size and decode time of a cached UserPrivate for each codec, with and
+without the trusted decode path.
+
+python -m tests.bench.bench_cache_codec
+"""
+
+import time
+
+from app.core.db.codec import JSON, LZ4, MSGPACK, NO_COMPRESSION, ZSTD, Codec
+from app.core.user.model import UserPrivate
+from tests.bench.util import report
+from tests.factories.user_factory import UserPrivateFactory
+
+ITERATIONS = 20000
+
+
+def legacy_decode(user_private: UserPrivate) -> list[float]:
+    raw = user_private.json()
+    timings = []
+
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        UserPrivate.parse_raw(raw)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def codec_decode(codec: Codec, raw: bytes) -> list[float]:
+    timings = []
+
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        codec.decode(raw, UserPrivate)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def main():
+    user_private = UserPrivateFactory.build()
+
+    print(f"{'legacy doc.json()':<32} size={len(user_private.json().encode())}B")
+    report("legacy decode", legacy_decode(user_private))
+
+    for serializer in (JSON, MSGPACK):
+        for compression in (NO_COMPRESSION, ZSTD, LZ4):
+            for trusted in (False, True):
+                codec = Codec(
+                    serializer=serializer,
+                    compression=compression,
+                    compression_threshold=0,
+                    trusted=trusted,
+                )
+                raw = codec.encode(user_private)
+                mode = "trusted" if trusted else "validated"
+                name = f"{serializer}/{compression}/{mode}"
+                print(f"{name:<32} size={len(raw)}B")
+                report(name, codec_decode(codec, raw))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Per-call latency of a cache GET with a client built per call (the previous
+behaviour) versus the shared pooled client.
+
+Requires a reachable redis at CACHE_URL.
+
+python -m tests.bench.bench_cache_connection
+"""
+
+import asyncio
+import time
+
+from redis import asyncio as aioredis
+
+from app.core.db import cache
+from tests.bench.util import report
+
+ITERATIONS = 2000
+
+
+async def per_call_client() -> list[float]:
+    timings = []
+
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        redis = aioredis.from_url(cache.config.cache_url, decode_responses=True)
+        await redis.get("BENCH-missing")
+        timings.append(time.perf_counter() - start)
+        await redis.aclose()
+
+    return timings
+
+
+async def pooled_client() -> list[float]:
+    timings = []
+    await cache.init_cache()
+
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        redis = cache._connection()  # pylint: disable=protected-access
+        await redis.get("BENCH-missing")
+        timings.append(time.perf_counter() - start)
+
+    await cache.close_cache()
+
+    return timings
+
+
+async def run():
+    report("per-call client", await per_call_client())
+    report("pooled client", await pooled_client())
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Latency of GET /health and GET /todo/list while concurrent logins run
+bcrypt, with password checks made inline on the event loop (the previous
+behaviour) versus on the crypt pool. Runs the app in-process against an
+in-memory mongo, with CACHE_BACKEND=memory no cache service is needed.
+
+CACHE_BACKEND=memory python -m tests.bench.bench_crypt_pool
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+
+from beanie import init_beanie
+from httpx import ASGITransport, AsyncClient
+from mongomock_motor import AsyncMongoMockClient
+from pydantic import SecretStr
+
+from app.core.db import cache
+from app.core.db.initialize import doc_models
+from app.core.security import crypt
+from app.main import app
+from tests import util
+from tests.bench.util import report
+from tests.factories.user_factory import UserDbFactory
+
+LOGINS = 64
+LOGIN_CONCURRENCY = 8
+
+
+@contextmanager
+def inline_crypt():
+    async def verify_inline(password: SecretStr, password_hash: str) -> bool:
+        return crypt.verify_password(password=password, password_hash=password_hash)
+
+    verify_password_async = crypt.verify_password_async
+    crypt.verify_password_async = verify_inline
+
+    try:
+        yield
+    finally:
+        crypt.verify_password_async = verify_password_async
+
+
+async def login_load(client: AsyncClient, username: str):
+    credential = {"username": username, "password": "password"}
+    slots = asyncio.Semaphore(LOGIN_CONCURRENCY)
+
+    async def login():
+        async with slots:
+            response = await client.post("/api/v1/auth/login", data=credential)
+            assert response.status_code == 200
+
+    await asyncio.gather(*[login() for _ in range(LOGINS)])
+
+
+async def probe(client: AsyncClient, url: str, headers: dict, done: asyncio.Event):
+    timings = []
+
+    while not done.is_set():
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200
+
+    return timings
+
+
+async def under_load(name: str, client: AsyncClient, username: str, headers: dict):
+    done = asyncio.Event()
+    probes = [
+        asyncio.ensure_future(probe(client, url, headers, done))
+        for url in ("/api/v1/health/", "/api/v1/todo/list")
+    ]
+
+    await login_load(client, username)
+    done.set()
+    health, todo = await asyncio.gather(*probes)
+
+    report(f"{name} /health", health)
+    report(f"{name} /todo/list", todo)
+
+
+async def run():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    mongo = AsyncMongoMockClient()
+    await init_beanie(
+        document_models=doc_models(), database=mongo.get_database(name="bench_db")
+    )
+    await cache.init_cache()
+    user = await UserDbFactory.create(created=True)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post(
+            "/api/v1/auth/login",
+            data={"username": user.username, "password": "password"},
+        )
+        headers = util.authorization_header(response.json()["access_token"])
+
+        with inline_crypt():
+            await under_load("inline", client, user.username, headers)
+        await under_load("crypt pool", client, user.username, headers)
+
+    crypt.close_crypt()
+    await cache.close_cache()
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
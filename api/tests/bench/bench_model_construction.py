@@ -0,0 +1,98 @@
+"""
+Per-request CPU spent building models from data the app signed or stored
+itself, validating it again (the previous behaviour) versus the trusted
+construct path: the user of a full access token, the public user built at
+login and user and todo rows read from mongo.
+
+python -m tests.bench.bench_model_construction
+"""
+
+import asyncio
+import statistics
+import time
+from typing import Callable
+
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.db.initialize import doc_models
+from app.core.security import token
+from app.core.security.auth import _generate_access_token
+from app.core.todo.model import Todo
+from app.core.user.model import UserPrivate, UserPublic
+from app.core.util import construct_model, convert_model
+from tests.bench.util import report
+from tests.factories.todo_factory import TodoDbFactory
+from tests.factories.user_factory import (
+    UserDbFactory,
+    UserPrivateFactory,
+    UserPublicFactory,
+)
+
+ITERATIONS = 20000
+TODO_ROWS = 20
+
+
+def measure(build: Callable[[], object]) -> list[float]:
+    timings = []
+
+    for _ in range(ITERATIONS):
+        start = time.process_time()
+        build()
+        timings.append(time.process_time() - start)
+
+    return timings
+
+
+def compare(name: str, validated: Callable[[], object], trusted: Callable[[], object]):
+    validated_timings = measure(validated)
+    trusted_timings = measure(trusted)
+    saved_us = (
+        statistics.mean(validated_timings) - statistics.mean(trusted_timings)
+    ) * 1_000_000
+
+    report(f"validated {name}", validated_timings)
+    report(f"trusted {name}", trusted_timings)
+    print(f"{'saved ' + name:<32} {saved_us:>10.1f}us per request")
+
+
+async def run():
+    mongo = AsyncMongoMockClient()
+    await init_beanie(
+        document_models=doc_models(), database=mongo.get_database(name="bench_db")
+    )
+
+    user_private = UserPrivateFactory.build()
+    access_token, _ = _generate_access_token(UserPublicFactory.build())
+    token_data = token._decode_jwt(access_token)  # pylint: disable=protected-access
+    user_db = UserDbFactory.build()
+    todo_dbs = TodoDbFactory.build_batch(TODO_ROWS)
+
+    compare(
+        "token user",
+        lambda: UserPublic(**token_data["data"]),
+        lambda: construct_model(UserPublic, token_data["data"]),
+    )
+    compare(
+        "login user",
+        lambda: UserPublic(**user_private.dict()),
+        lambda: convert_model(UserPublic, user_private),
+    )
+    compare(
+        "user row",
+        lambda: UserPrivate(**user_db.dict()),
+        lambda: convert_model(UserPrivate, user_db),
+    )
+    compare(
+        f"{TODO_ROWS} todo rows",
+        lambda: [Todo(**todo_db.dict()) for todo_db in todo_dbs],
+        lambda: [convert_model(Todo, todo_db) for todo_db in todo_dbs],
+    )
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
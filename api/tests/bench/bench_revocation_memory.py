@@ -0,0 +1,133 @@
+"""
+Redis memory per million revocations stored as one json document per token
+(the previous layout) versus token_ids in expiry bucketed sets, and the
+latency of a revocation check against each.
+
+Requires a reachable redis at CACHE_URL, keys are written under BENCH_
+prefixes and deleted afterwards.
+
+python -m tests.bench.bench_revocation_memory
+"""
+
+import asyncio
+import time
+from uuid import uuid4
+
+from redis import asyncio as aioredis
+
+from app.core.db import cache
+from app.core.security.token import RevokedToken, _revocation_entry
+from tests.bench.util import report
+
+REVOCATIONS = 100_000
+BATCH_SIZE = 1000
+CHECKS = 2000
+DOC_PREFIX = "BENCH_REVOKED_DOC"
+SET_PREFIX = "BENCH_REVOKED_SET"
+
+
+def revoked_tokens() -> list[RevokedToken]:
+    now = int(time.time())
+
+    return [
+        RevokedToken(
+            token_id=str(uuid4()),
+            claim="REFRESH_TOKEN",
+            exp=now + 60 + index % 10800,
+            sub=f"user-{index % 5000}",
+            revoke_reason="logout",
+        )
+        for index in range(REVOCATIONS)
+    ]
+
+
+async def store_docs(redis: aioredis.Redis, tokens: list[RevokedToken]):
+    now = int(time.time())
+
+    for start in range(0, len(tokens), BATCH_SIZE):
+        async with redis.pipeline(transaction=False) as pipe:
+            for revoked_token in tokens[start : start + BATCH_SIZE]:
+                pipe.set(
+                    f"{DOC_PREFIX}-{revoked_token.token_id}",
+                    revoked_token.json(),
+                    ex=revoked_token.exp - now,
+                )
+            await pipe.execute()
+
+
+async def store_sets(redis: aioredis.Redis, tokens: list[RevokedToken]):
+    for start in range(0, len(tokens), BATCH_SIZE):
+        async with redis.pipeline(transaction=False) as pipe:
+            for revoked_token in tokens[start : start + BATCH_SIZE]:
+                key, member, expire_at = _revocation_entry(
+                    revoked_token.token_id, exp=revoked_token.exp
+                )
+                pipe.sadd(f"{SET_PREFIX}-{key}", member)
+                pipe.expireat(f"{SET_PREFIX}-{key}", expire_at)
+            await pipe.execute()
+
+
+async def check_docs(redis: aioredis.Redis, tokens: list[RevokedToken]) -> list[float]:
+    timings = []
+
+    for revoked_token in tokens[:CHECKS]:
+        start = time.perf_counter()
+        await redis.get(f"{DOC_PREFIX}-{revoked_token.token_id}")
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+async def check_sets(redis: aioredis.Redis, tokens: list[RevokedToken]) -> list[float]:
+    timings = []
+
+    for revoked_token in tokens[:CHECKS]:
+        start = time.perf_counter()
+        key, member, _ = _revocation_entry(
+            revoked_token.token_id, exp=revoked_token.exp
+        )
+        await redis.sismember(f"{SET_PREFIX}-{key}", member)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+async def used_memory(redis: aioredis.Redis) -> int:
+    return (await redis.info("memory"))["used_memory"]
+
+
+async def clear(redis: aioredis.Redis, prefix: str):
+    async for key in redis.scan_iter(match=f"{prefix}-*", count=BATCH_SIZE):
+        await redis.delete(key)
+
+
+async def measure(name: str, redis: aioredis.Redis, store, tokens: list[RevokedToken]):
+    before = await used_memory(redis)
+    await store(redis, tokens)
+    used = await used_memory(redis) - before
+
+    per_million = used * 1_000_000 / len(tokens) / 1024 / 1024
+    print(f"{name:<32} memory={per_million:>10.1f}MiB per million revocations")
+
+
+async def run():
+    redis = aioredis.from_url(cache.config.cache_url)
+    tokens = revoked_tokens()
+
+    try:
+        await measure("json documents", redis, store_docs, tokens)
+        await measure("bucketed sets", redis, store_sets, tokens)
+        report("json document check", await check_docs(redis, tokens))
+        report("bucketed set check", await check_sets(redis, tokens))
+    finally:
+        await clear(redis, DOC_PREFIX)
+        await clear(redis, SET_PREFIX)
+        await redis.aclose()
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Per-call latency of token.generate_token and token.validate_token encoding
+and decoding with PyJWT (the previous behaviour) versus the HMAC codec.
+Every token is validated once so the verified-token cache never hits. With
+CACHE_BACKEND=memory no cache service is needed.
+
+python -m tests.bench.bench_token_codec
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+
+from app.core.db import cache
+from app.core.security import token
+from app.core.security.auth import ACCESS_TOKEN
+from app.core.user.model import UserPublic
+from tests.bench.util import report
+from tests.factories.user_factory import UserPublicFactory
+
+ITERATIONS = 5000
+
+
+@contextmanager
+def pyjwt():
+    codec = token._codec  # pylint: disable=protected-access
+    token._codec = None  # pylint: disable=protected-access
+
+    try:
+        yield
+    finally:
+        token._codec = codec  # pylint: disable=protected-access
+
+
+def generate(user_public: UserPublic) -> tuple[list[float], list[str]]:
+    timings = []
+    tokens = []
+
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        access_token, _ = token.generate_token(
+            claim=ACCESS_TOKEN,
+            expire_min=60,
+            sub=user_public.username,
+            data=user_public,
+        )
+        timings.append(time.perf_counter() - start)
+        tokens.append(access_token)
+
+    return timings, tokens
+
+
+async def validate(tokens: list[str]) -> list[float]:
+    timings = []
+
+    for access_token in tokens:
+        start = time.perf_counter()
+        await token.validate_token(claim=ACCESS_TOKEN, token=access_token)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+async def run():
+    user_public = UserPublicFactory.build()
+    await cache.init_cache()
+
+    with pyjwt():
+        timings, tokens = generate(user_public)
+        report("pyjwt generate_token", timings)
+        report("pyjwt validate_token", await validate(tokens))
+
+    timings, tokens = generate(user_public)
+    report("codec generate_token", timings)
+    report("codec validate_token", await validate(tokens))
+
+    await cache.close_cache()
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
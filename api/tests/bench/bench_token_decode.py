@@ -0,0 +1,51 @@
+"""
+Per-request cost of decoding and verifying an access token against the
+verified-token cache in security.token, for a client reusing one token.
+
+python -m tests.bench.bench_token_decode
+"""
+
+import time
+
+from app.core.security import token
+from app.core.security.auth import ACCESS_TOKEN
+from tests.bench.util import report
+from tests.factories.user_factory import UserPublicFactory
+
+ITERATIONS = 20000
+
+
+def decode_jwt(access_token: str) -> list[float]:
+    timings = []
+
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        token._decode_jwt(access_token)  # pylint: disable=protected-access
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def decode_cached(access_token: str) -> list[float]:
+    timings = []
+
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        token._decode(access_token)  # pylint: disable=protected-access
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def main():
+    user_public = UserPublicFactory.build()
+    access_token, _ = token.generate_token(
+        claim=ACCESS_TOKEN, expire_min=60, sub=user_public.username, data=user_public
+    )
+
+    report("decode", decode_jwt(access_token))
+    report("verified cache hit", decode_cached(access_token))
+
+
+if __name__ == "__main__":
+    main()
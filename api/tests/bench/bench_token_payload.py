@@ -0,0 +1,68 @@
+"""
+Access token size and per-request parse time, decoding plus building the
+request's user, for full and compact token payloads.
+
+python -m tests.bench.bench_token_payload
+"""
+
+import time
+from typing import Callable
+
+from app.core.security import token
+from app.core.security.auth import (
+    ACCESS_TOKEN,
+    CompactUserClaims,
+    TokenUser,
+    _generate_access_token,
+)
+from app.core.user.model import UserPublic
+from app.core.util import construct_model
+from tests.bench.util import report
+from tests.factories.user_factory import UserPublicFactory
+
+ITERATIONS = 20000
+
+
+def parse(access_token: str, build_user: Callable[[dict], object]) -> list[float]:
+    timings = []
+
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        token_data = token._decode_jwt(access_token)  # pylint: disable=protected-access
+        build_user(token_data)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def full_user(token_data: dict) -> UserPublic:
+    return construct_model(UserPublic, token_data["data"])
+
+
+def compact_user(token_data: dict) -> TokenUser:
+    data = token_data["data"]
+
+    return TokenUser.construct(
+        username=token_data["sub"], roles=data["r"], disabled=data["d"]
+    )
+
+
+def main():
+    user_public = UserPublicFactory.build()
+
+    full_token, _ = _generate_access_token(user_public)
+    compact_token, _ = token.generate_token(
+        claim=ACCESS_TOKEN,
+        expire_min=60,
+        sub=user_public.username,
+        data=CompactUserClaims(roles=user_public.roles, disabled=user_public.disabled),
+    )
+
+    print(f"{'full token':<32} size={len(full_token)}B")
+    print(f"{'compact token':<32} size={len(compact_token)}B")
+    report("full parse", parse(full_token, full_user))
+    report("compact parse", parse(compact_token, compact_user))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import statistics
+
+
+def percentile(timings: list[float], pct: float) -> float:
+    ordered = sorted(timings)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+
+    return ordered[index]
+
+
+def report(name: str, timings: list[float]):
+    mean_us = statistics.mean(timings) * 1_000_000
+    p50_us = percentile(timings, 50) * 1_000_000
+    p99_us = percentile(timings, 99) * 1_000_000
+
+    print(
+        f"{name:<32} n={len(timings):<8} mean={mean_us:>10.1f}us "
+        f"p50={p50_us:>10.1f}us p99={p99_us:>10.1f}us"
+    )
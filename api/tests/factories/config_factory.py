@@ -10,7 +10,58 @@ class ConfigFactory(BaseFactory):
     api_docs_enabled = False
     db_url = "mongodb://admin:password@db:27017"
     cache_url = "redis://cache:6379"
+    cache_urls = ""
+    cache_backend = "redis"
+    cache_memory_max_entries = 100000
+    cache_memory_max_bytes = 0
     cache_ttl_user = 1800
+    cache_soft_ttl_user = 0
+    cache_ttl_user_missing = 30
+    cache_ttl_todo_lists = 300
+    cache_ttl_refresh = 1
+    cache_warm_enabled = False
+    cache_warm_users = 1000
+    cache_warm_batch_size = 100
+    cache_warm_rate = 1000.0
+    cache_max_connections = 50
+    cache_pool_timeout = 2.0
+    cache_socket_timeout = 2.0
+    cache_socket_connect_timeout = 2.0
+    cache_health_check_interval = 30
+    cache_local_enabled = False
+    cache_local_max_entries = 10000
+    cache_local_max_bytes = 0
+    cache_local_ttl = 5.0
+    cache_serializer = "json"
+    cache_compression = "none"
+    cache_compression_threshold = 1024
+    cache_fill_lock_enabled = False
+    cache_fill_lock_ttl = 5.0
+    cache_fill_lock_poll_interval = 0.05
+    cache_ttl_jitter = 0.1
+    cache_early_refresh_beta = 1.0
+    cache_namespace_ttl = 5.0
+    cache_read_timeout = 0.25
+    cache_write_timeout = 0.5
+    cache_breaker_failure_threshold = 5
+    cache_breaker_reset_timeout = 10.0
+    cache_fail_open_reads = True
+    cache_revocation_fail_open = False
+    revocation_filter_enabled = False
+    revocation_filter_fp_rate = 0.001
+    revocation_filter_max_bytes = 1048576
+    revocation_filter_sync_interval = 1.0
+    revocation_filter_max_staleness = 5.0
+    token_cache_max_entries = 10000
+    access_token_compact = False
+    token_generation_enabled = True
+    token_generation_ttl = 1.0
+    revocation_legacy_check = True
+    crypt_bcrypt_rounds = 12
+    crypt_pool_size = 4
+    crypt_queue_depth = 64
+    crypt_queue_timeout = 5.0
+    user_login_flush_interval = 1.0
     access_token_expire_min = 60
     refresh_token_expire_min = 180
     jwt_algorithm = "HS256"
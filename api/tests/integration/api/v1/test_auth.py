@@ -1,6 +1,9 @@
 import jwt
 import orjson
 
+from app.core.db import cache
+from app.core.security import revocation
+from app.core.user.model import USER_CACHE_PREFIX
 from tests.factories.server_response_factory import ServerResponseFactory
 from tests.factories.token_factory import AuthTokenFactory
 from tests.factories.user_factory import UserDbFactory
@@ -120,6 +123,17 @@ async def test_refresh_auth_token(client, login_auth_token):
     assert list(actual.json()) == expected
 
 
+async def test_refresh_auth_token_repeated(client, login_auth_token):
+    expected = client.post(
+        "/api/v1/auth/refresh", data=orjson.dumps(login_auth_token)
+    ).json()
+
+    actual = client.post("/api/v1/auth/refresh", data=orjson.dumps(login_auth_token))
+
+    assert actual.status_code == 200
+    assert actual.json() == expected
+
+
 async def test_refresh_auth_token_revoked_token(client, login_auth_token):
     token_data = jwt.decode(
         login_auth_token["refresh_token"], options={"verify_signature": False}
@@ -138,6 +152,23 @@ async def test_refresh_auth_token_revoked_token(client, login_auth_token):
     assert actual.json() == expected
 
 
+async def test_refresh_auth_token_revoked_token_filter(
+    mocker, client, login_auth_token
+):
+    mocker.patch("app.core.security.revocation.config.revocation_filter_enabled", True)
+    mocker.patch("app.core.security.revocation._filter", None)
+    mocker.patch("app.core.security.revocation._cursor", "0")
+    mocker.patch("app.core.security.revocation._synced_at", None)
+    await revocation.sync()
+
+    response = client.post("/api/v1/auth/logout", data=orjson.dumps(login_auth_token))
+    assert response.status_code == 200
+
+    actual = client.post("/api/v1/auth/refresh", data=orjson.dumps(login_auth_token))
+
+    assert actual.status_code == 401
+
+
 async def test_refresh_auth_token_expired_token(client):
     auth_token = AuthTokenFactory.build(jan_01_2020=True)
 
@@ -167,6 +198,7 @@ async def test_refresh_auth_token_invalid_token(client, login_auth_token):
 async def test_refresh_auth_token_disabled(client, login_auth_token, created_user):
     created_user.disabled = True
     await created_user.save()
+    await cache.delete(prefix=USER_CACHE_PREFIX, key=created_user.username)
 
     expected = ServerResponseFactory.build(
         message=f"User '{created_user.username}' has been disabled"
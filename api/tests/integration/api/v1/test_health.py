@@ -8,3 +8,11 @@ def test_service_health(client):
 
     assert actual.status_code == 200
     assert actual.json() == expected
+
+
+def test_cache_health(client):
+    actual = client.get("/api/v1/health/cache")
+
+    assert actual.status_code == 200
+    assert actual.json()["local"] is None
+    assert actual.json()["breakers"][0]["state"] == "closed"
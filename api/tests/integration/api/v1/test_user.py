@@ -67,12 +67,12 @@ async def test_register_new_user_persists(client):
     actual = client.get("/api/v1/user/", headers=headers_access_token)
     actual_json = actual.json()
     actual_date_created = datetime.fromisoformat(actual_json.pop("date_created"))
-    actual_date_modified = datetime.fromisoformat(actual_json.pop("date_modified"))
+    actual_date_modified = actual_json.pop("date_modified")
     actual_last_login = datetime.fromisoformat(actual_json.pop("last_login"))
 
     assert actual.status_code == 200
     assert actual_date_created > datetime.now(timezone.utc) - timedelta(seconds=5)
-    assert actual_date_modified > datetime.now(timezone.utc) - timedelta(seconds=5)
+    assert actual_date_modified is None
     assert actual_last_login > datetime.now(timezone.utc) - timedelta(seconds=5)
     assert actual_json == expected
 
@@ -113,6 +113,19 @@ async def test_read_current_user(client, headers_access_token, user_access_token
     assert actual.json() == expected
 
 
+async def test_read_current_user_compact_token(mocker, client, created_user):
+    mocker.patch("app.core.security.auth.config.access_token_compact", True)
+    credential = {"username": created_user.username, "password": "password"}
+    login_response = client.post("/api/v1/auth/login", data=credential)
+    headers = util.authorization_header(login_response.json()["access_token"])
+
+    actual = client.get("/api/v1/user/", headers=headers)
+
+    assert actual.status_code == 200
+    assert actual.json()["username"] == created_user.username
+    assert actual.json()["email"] == created_user.email
+
+
 async def test_update_current_user(client, headers_access_token, user_access_token):
     # pylint: disable=duplicate-code
     user_update = UserUpdateFactory.build()
@@ -131,6 +144,21 @@ async def test_update_current_user(client, headers_access_token, user_access_tok
     assert actual_json == expected
 
 
+async def test_update_current_user_password_revokes_tokens(
+    client, headers_access_token
+):
+    user_update = UserUpdateFactory.build()
+
+    response = client.put(
+        "/api/v1/user/", headers=headers_access_token, data=user_update.json()
+    )
+    assert response.status_code == 200
+
+    actual = client.get("/api/v1/user/", headers=headers_access_token)
+
+    assert actual.status_code == 401
+
+
 async def test_update_current_user_persists(
     client, headers_access_token, user_access_token
 ):
@@ -1,12 +1,14 @@
-from unittest.mock import AsyncMock, Mock
+from unittest.mock import Mock
 
 import pytest
 from beanie import init_beanie
+from fakeredis import FakeAsyncRedis
 from fastapi.testclient import TestClient
 from mongomock_motor import AsyncMongoMockClient
 
 from app.core.db.initialize import doc_models
-from app.core.security.auth import get_user_from_token
+from app.core.db.lru import LruCache
+from app.core.security.auth import get_token_user, get_user_from_token
 from app.main import app
 from tests import util
 from tests.factories.token_factory import AuthTokenFactory
@@ -33,10 +35,12 @@ def override_get_user_from_token(client):
         return user_public
 
     client.app.dependency_overrides[get_user_from_token] = _override_get_user_from_token
+    client.app.dependency_overrides[get_token_user] = _override_get_user_from_token
 
     yield user_public
 
     client.app.dependency_overrides.pop(get_user_from_token)
+    client.app.dependency_overrides.pop(get_token_user)
 
 
 @pytest.fixture
@@ -53,14 +57,19 @@ async def _setup_db():
 
 
 @pytest.fixture
-def _setup_cache(mocker):
+def fake_cache(mocker):
+    redis = FakeAsyncRedis()
+    mocker.patch("app.core.db.cache._connection", Mock(return_value=redis))
+    mocker.patch("app.core.db.cache._breakers", {})
+    mocker.patch("app.core.db.cache._namespaces", {})
     mocker.patch(
-        "app.core.db.cache.aioredis.from_url",
-        Mock(
-            return_value=AsyncMock(
-                get=AsyncMock(return_value=None),
-                set=AsyncMock(return_value=True),
-                delete=AsyncMock(return_value=1),
-            )
-        ),
+        "app.core.security.token._generations",
+        LruCache(max_entries=10, ttl=1.0),
     )
+
+    return redis
+
+
+@pytest.fixture
+def _setup_cache(fake_cache):
+    return fake_cache
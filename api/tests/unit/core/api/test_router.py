@@ -4,6 +4,7 @@ from app.core.api import router as uut
 def test_router():
     expected = {
         "/api/v1/health/",
+        "/api/v1/health/cache",
         "/api/v1/auth/login",
         "/api/v1/auth/logout",
         "/api/v1/auth/refresh",
@@ -0,0 +1,299 @@
+import asyncio
+import time
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from app.core.db import backend as uut
+
+UUT_PATH = "app.core.db.backend"
+
+
+@pytest.fixture
+def memory():
+    return uut.MemoryBackend(max_entries=3)
+
+
+@pytest.fixture
+def redis():
+    return FakeAsyncRedis()
+
+
+async def test_memory_get_many(memory):
+    await memory.set_many({"first": b"1", "second": b"2"}, ttl=60)
+
+    actual = await memory.get_many(["second", "missing", "first"])
+
+    assert actual == [b"2", None, b"1"]
+
+
+async def test_memory_set_many(memory):
+    actual = await memory.set_many({"first": b"1", "second": b"2"}, ttl=60)
+
+    assert actual == [True, True]
+
+
+async def test_memory_ttl(mocker, memory):
+    monotonic = mocker.patch("app.core.db.lru.time.monotonic", return_value=100.0)
+    await memory.set_many({"first": b"1"}, ttl=60)
+
+    monotonic.return_value = 160.0
+    actual = await memory.get_many(["first"])
+
+    assert actual == [None]
+
+
+async def test_memory_bounded(memory):
+    await memory.set_many({str(index): b"value" for index in range(5)}, ttl=60)
+
+    actual = await memory.get_many([str(index) for index in range(5)])
+
+    assert actual == [None, None, b"value", b"value", b"value"]
+
+
+async def test_memory_max_bytes():
+    memory = uut.MemoryBackend(max_entries=10, max_bytes=10)
+    await memory.set_many({"first": b"12345", "second": b"123456"}, ttl=60)
+
+    actual = await memory.get_many(["first", "second"])
+
+    assert actual == [None, b"123456"]
+
+
+async def test_memory_delete_many(memory):
+    await memory.set_many({"first": b"1", "second": b"2"}, ttl=60)
+
+    actual = await memory.delete_many(["first", "second", "missing"])
+
+    assert actual == 2
+    assert await memory.get_many(["first", "second"]) == [None, None]
+
+
+async def test_memory_concurrent_writes(memory):
+    await asyncio.gather(
+        *[memory.set_many({"key": str(index).encode()}, ttl=60) for index in range(50)]
+    )
+
+    actual = await memory.get_many(["key"])
+
+    assert actual == [b"49"]
+
+
+async def test_memory_add_many(memory):
+    await memory.set_many({"first": b"1"}, ttl=60)
+
+    actual = await memory.add_many({"first": (b"one", 60), "second": (b"2", 30)})
+
+    assert actual == [False, True]
+    assert await memory.get_many(["first", "second"]) == [b"1", b"2"]
+
+
+async def test_memory_members(mocker, memory):
+    mocker.patch(f"{UUT_PATH}.time.time", return_value=100.0)
+
+    actual = await memory.add_members(
+        [("set", b"1", 160), ("set", b"2", 160), ("set", b"1", 160)]
+    )
+
+    assert actual == [True, True, False]
+    assert await memory.is_member("set", b"1") is True
+    assert await memory.is_member("set", b"3") is False
+    assert await memory.is_member("missing", b"1") is False
+
+
+async def test_memory_members_not_evicted(memory):
+    await memory.add_members([("set", b"1", int(time.time()) + 60)])
+
+    await memory.set_many({f"key{index}": b"1" for index in range(10)}, ttl=60)
+
+    assert await memory.is_member("set", b"1") is True
+
+
+async def test_memory_members_expire(mocker, memory):
+    clock = mocker.patch(f"{UUT_PATH}.time.time", return_value=100.0)
+    await memory.add_members([("set", b"1", 160)])
+
+    clock.return_value = 160.0
+
+    assert await memory.is_member("set", b"1") is False
+    await memory.add_members([("other", b"1", 220)])
+    assert "set" not in memory.sets
+
+
+async def test_memory_lock(memory):
+    lock = memory.lock("lock", timeout=5)
+    other = memory.lock("lock", timeout=5)
+
+    assert await lock.acquire() is True
+    assert await other.acquire() is False
+
+    await other.release()
+    assert await other.acquire() is False
+
+    await lock.release()
+    assert await other.acquire() is True
+
+
+async def test_memory_lock_expires(mocker, memory):
+    monotonic = mocker.patch(f"{UUT_PATH}.time.monotonic", return_value=100.0)
+    await memory.lock("lock", timeout=5).acquire()
+    monotonic.return_value = 105.0
+
+    actual = await memory.lock("lock", timeout=5).acquire()
+
+    assert actual is True
+
+
+async def test_memory_incr(memory):
+    assert await memory.get_counter("counter") == 0
+
+    actual = [await memory.incr("counter") for _ in range(2)]
+
+    assert actual == [1, 2]
+    assert await memory.get_counter("counter") == 2
+
+
+async def test_memory_incr_not_evicted(memory):
+    await memory.incr("counter")
+    await memory.set_many({str(index): b"value" for index in range(5)}, ttl=60)
+
+    actual = await memory.get_counter("counter")
+
+    assert actual == 1
+
+
+async def test_memory_log(memory):
+    first = await memory.append_log("log", b"1", max_age=60)
+    await memory.append_log("log", b"2", max_age=60)
+
+    assert await memory.read_log("log", after="0", count=10) == [
+        (first, b"1"),
+        ("2", b"2"),
+    ]
+    assert await memory.read_log("log", after=first, count=10) == [("2", b"2")]
+    assert await memory.read_log("log", after="0", count=1) == [(first, b"1")]
+
+
+async def test_memory_log_trimmed(mocker, memory):
+    now = mocker.patch(f"{UUT_PATH}.time.time", return_value=100.0)
+    await memory.append_log("log", b"1", max_age=60)
+
+    now.return_value = 160.0
+    await memory.append_log("log", b"2", max_age=60)
+
+    actual = await memory.read_log("log", after="0", count=10)
+
+    assert actual == [("2", b"2")]
+
+
+async def test_redis_get_many(redis):
+    backend = uut.RedisBackend(redis, channel="channel")
+    await redis.set("first", b"1")
+
+    actual = await backend.get_many(["first", "missing"])
+
+    assert actual == [b"1", None]
+
+
+async def test_redis_set_many(redis):
+    backend = uut.RedisBackend(redis, channel="channel")
+
+    actual = await backend.set_many({"first": b"1", "second": b"2"}, ttl=60)
+
+    assert actual == [True, True]
+    assert await redis.ttl("second") == 60
+
+
+async def test_redis_set_many_notify(redis):
+    backend = uut.RedisBackend(redis, channel="channel")
+    pubsub = redis.pubsub()
+    await pubsub.subscribe("channel")
+    await pubsub.get_message(timeout=1)
+
+    actual = await backend.set_many({"first": b"1"}, ttl=60, notify=["node|first"])
+    message = await pubsub.get_message(timeout=1)
+
+    assert actual == [True]
+    assert message["data"] == b"node|first"
+
+    await pubsub.aclose()
+
+
+@pytest.mark.parametrize("notify", [[], ["node|first", "node|second"]])
+async def test_redis_delete_many(redis, notify):
+    backend = uut.RedisBackend(redis, channel="channel")
+    await redis.set("first", b"1")
+    await redis.set("second", b"2")
+
+    actual = await backend.delete_many(["first", "second", "missing"], notify=notify)
+
+    assert actual == 2
+
+
+async def test_redis_lock(redis):
+    backend = uut.RedisBackend(redis, channel="channel")
+    lock = backend.lock("lock", timeout=5)
+
+    assert await lock.acquire() is True
+    assert await backend.lock("lock", timeout=5).acquire() is False
+
+    await lock.release()
+
+    assert await redis.exists("lock") == 0
+
+
+async def test_redis_incr(redis):
+    backend = uut.RedisBackend(redis, channel="channel")
+    pubsub = redis.pubsub()
+    await pubsub.subscribe("channel")
+    await pubsub.get_message(timeout=1)
+
+    actual = await backend.incr("counter", notify=["node|counter"])
+    message = await pubsub.get_message(timeout=1)
+
+    assert actual == 1
+    assert await backend.get_counter("counter") == 1
+    assert await backend.get_counter("missing") == 0
+    assert message["data"] == b"node|counter"
+
+    await pubsub.aclose()
+
+
+async def test_redis_log(redis):
+    backend = uut.RedisBackend(redis, channel="channel")
+    first = await backend.append_log("log", b"1", max_age=60)
+    second = await backend.append_log("log", b"2", max_age=60)
+
+    assert await backend.read_log("log", after="0", count=10) == [
+        (first, b"1"),
+        (second, b"2"),
+    ]
+    assert await backend.read_log("log", after=first, count=10) == [(second, b"2")]
+
+
+async def test_redis_add_many(redis):
+    backend = uut.RedisBackend(redis, channel="channel")
+    await redis.set("first", b"1")
+
+    actual = await backend.add_many(
+        {"first": (b"one", 60), "second": (b"2", 30)}, notify=["node|second"]
+    )
+
+    assert actual == [False, True]
+    assert await redis.get("first") == b"1"
+    assert await redis.ttl("second") == 30
+
+
+async def test_redis_members(redis):
+    backend = uut.RedisBackend(redis, channel="channel")
+    expire_at = int(time.time()) + 60
+
+    actual = await backend.add_members(
+        [("set", b"1", expire_at), ("set", b"2", expire_at), ("set", b"1", expire_at)],
+        notify=["node|set"],
+    )
+
+    assert actual == [True, True, False]
+    assert await backend.is_member("set", b"1") is True
+    assert await backend.is_member("set", b"3") is False
+    assert 0 < await redis.ttl("set") <= 60
@@ -0,0 +1,93 @@
+from app.core.db import bloom as uut
+
+UUT_PATH = "app.core.db.bloom"
+
+
+def test_bloom_filter_sizing():
+    bloom = uut.BloomFilter(max_bytes=1024, fp_rate=0.01)
+
+    assert bloom.bit_count == 8192
+    assert bloom.hash_count == 7
+    assert bloom.capacity == 854
+    assert bloom.size_bytes == 1024
+
+
+def test_bloom_filter_contains():
+    bloom = uut.BloomFilter(max_bytes=1024, fp_rate=0.01)
+
+    bloom.add("first")
+
+    assert "first" in bloom
+    assert "second" not in bloom
+    assert len(bloom) == 1
+
+
+def test_bloom_filter_no_false_negatives():
+    bloom = uut.BloomFilter(max_bytes=1024, fp_rate=0.01)
+    items = [f"item-{index}" for index in range(bloom.capacity)]
+
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+
+
+def test_bloom_filter_fp_rate():
+    bloom = uut.BloomFilter(max_bytes=1024, fp_rate=0.01)
+    for index in range(bloom.capacity):
+        bloom.add(f"item-{index}")
+
+    false_positives = sum(f"other-{index}" in bloom for index in range(10000))
+
+    assert false_positives < 200
+
+
+def test_bloom_filter_saturated():
+    bloom = uut.BloomFilter(max_bytes=1, fp_rate=0.01)
+
+    for index in range(bloom.capacity + 1):
+        bloom.add(f"item-{index}")
+
+    assert bloom.saturated is True
+    assert "other" in bloom
+
+
+def test_sliced_bloom_filter_might_contain(mocker):
+    mocker.patch(f"{UUT_PATH}.time.time", return_value=1000.0)
+    sliced = uut.SlicedBloomFilter(
+        slice_seconds=60, slice_count=4, max_bytes=4096, fp_rate=0.01
+    )
+
+    sliced.add("first", expires_at=1030.0)
+
+    assert sliced.might_contain("first", expires_at=1030.0) is True
+    assert sliced.might_contain("second", expires_at=1030.0) is False
+    assert sliced.might_contain("first", expires_at=1100.0) is False
+    assert sliced.slice_bytes == 1024
+    assert sliced.size_bytes == 1024
+
+
+def test_sliced_bloom_filter_slices_age_out(mocker):
+    now = mocker.patch(f"{UUT_PATH}.time.time", return_value=1000.0)
+    sliced = uut.SlicedBloomFilter(
+        slice_seconds=60, slice_count=4, max_bytes=4096, fp_rate=0.01
+    )
+    sliced.add("first", expires_at=1030.0)
+    sliced.add("second", expires_at=1100.0)
+
+    now.return_value = 1080.0
+
+    assert sliced.might_contain("first", expires_at=1030.0) is False
+    assert sliced.might_contain("second", expires_at=1100.0) is True
+    assert len(sliced) == 1
+
+
+def test_sliced_bloom_filter_add_expired(mocker):
+    mocker.patch(f"{UUT_PATH}.time.time", return_value=1000.0)
+    sliced = uut.SlicedBloomFilter(
+        slice_seconds=60, slice_count=4, max_bytes=4096, fp_rate=0.01
+    )
+
+    sliced.add("first", expires_at=1000.0)
+
+    assert len(sliced) == 0
@@ -0,0 +1,99 @@
+import pytest
+
+from app.core.db import breaker as uut
+
+UUT_PATH = "app.core.db.breaker"
+
+
+@pytest.fixture
+def clock(mocker):
+    return mocker.patch(f"{UUT_PATH}.time.monotonic", return_value=100.0)
+
+
+def test_closed():
+    breaker = uut.CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+    assert breaker.state == uut.CLOSED
+    assert breaker.allow() is True
+
+
+def test_opens_after_threshold(clock):
+    breaker = uut.CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+    breaker.record_failure()
+    assert breaker.state == uut.CLOSED
+
+    breaker.record_failure()
+
+    assert breaker.state == uut.OPEN
+    assert breaker.allow() is False
+    assert breaker.opened == 1
+
+
+def test_success_resets_failures():
+    breaker = uut.CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == uut.CLOSED
+    assert breaker.failures == 1
+
+
+def test_half_open_single_trial(clock):
+    breaker = uut.CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.return_value = 110.0
+
+    assert breaker.state == uut.HALF_OPEN
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+
+
+def test_half_open_trial_success_closes(clock):
+    breaker = uut.CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.return_value = 110.0
+    breaker.allow()
+
+    breaker.record_success()
+
+    assert breaker.state == uut.CLOSED
+    assert breaker.allow() is True
+
+
+def test_half_open_trial_failure_reopens(clock):
+    breaker = uut.CircuitBreaker(failure_threshold=3, reset_timeout=10)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.return_value = 110.0
+    breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == uut.OPEN
+    assert breaker.opened == 1
+    clock.return_value = 120.0
+    assert breaker.allow() is True
+
+
+def test_half_open_trial_release(clock):
+    breaker = uut.CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.return_value = 110.0
+    breaker.allow()
+
+    breaker.release()
+
+    assert breaker.state == uut.HALF_OPEN
+    assert breaker.allow() is True
+
+
+def test_stats(clock):
+    breaker = uut.CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+
+    actual = breaker.stats()
+
+    assert actual == uut.BreakerStats(state=uut.OPEN, failures=1, opened=1)
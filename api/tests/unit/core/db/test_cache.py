@@ -1,21 +1,95 @@
+import asyncio
+import time
+from collections import Counter
 from unittest.mock import AsyncMock, Mock
 
+import orjson
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
 from pydantic import BaseModel
+from redis.asyncio import BlockingConnectionPool
 from redis.asyncio.client import Redis
+from redis.exceptions import RedisError
 
 from app.core.db import cache as uut
+from app.core.db.backend import MemoryBackend
+from app.core.db.codec import TOMBSTONE, unwrap
+from app.core.db.lru import MISSING, LruCache
+from app.core.exception import CacheUnavailableException
+
+UUT_PATH = "app.core.db.cache"
 
 
 class CacheData(BaseModel):
     data: str
 
 
-def test__connection():
+@pytest.fixture
+def local(mocker):
+    lru = LruCache(max_entries=10, ttl=5)
+    mocker.patch(f"{UUT_PATH}._local", lru)
+    mocker.patch(f"{UUT_PATH}._subscribed", {0})
+
+    return lru
+
+
+@pytest.fixture
+def _reset_client(mocker):
+    mocker.patch(f"{UUT_PATH}._clients", {})
+    mocker.patch(f"{UUT_PATH}._client_loop", None)
+    mocker.patch(f"{UUT_PATH}._listeners", [])
+    mocker.patch(f"{UUT_PATH}._subscribed", set())
+
+
+def test__create_pool():
+    actual = uut._create_pool("redis://cache:6379")  # pylint: disable=protected-access
+
+    assert isinstance(actual, BlockingConnectionPool)
+    assert actual.max_connections == 50
+    assert actual.timeout == 2.0
+    assert actual.connection_kwargs["socket_timeout"] == 2.0
+    assert actual.connection_kwargs["socket_connect_timeout"] == 2.0
+    assert actual.connection_kwargs["health_check_interval"] == 30
+
+
+async def test_init_cache(_reset_client):
+    actual = await uut.init_cache()
+
+    assert actual is True
+    assert isinstance(uut._clients[0], Redis)  # pylint: disable=protected-access
+
+
+async def test_close_cache(_reset_client):
+    client = uut._connection()  # pylint: disable=protected-access
+    client.aclose = AsyncMock()
+
+    actual = await uut.close_cache()
+
+    assert actual is True
+    assert not uut._clients  # pylint: disable=protected-access
+    client.aclose.assert_awaited_once_with(close_connection_pool=True)
+
+
+async def test_close_cache_not_initialized(_reset_client):
+    actual = await uut.close_cache()
+
+    assert actual is True
+
+
+def test__connection(_reset_client):
     actual = uut._connection()  # pylint: disable=protected-access
 
     assert isinstance(actual, Redis)
 
 
+def test__connection_shared(_reset_client):
+    expected = uut._connection()  # pylint: disable=protected-access
+
+    actual = uut._connection()  # pylint: disable=protected-access
+
+    assert actual is expected
+
+
 def test__build_cache_key():
     expected = "test_prefix-test_key"
 
@@ -26,21 +100,22 @@ def test__build_cache_key():
     assert actual == expected
 
 
-async def test_fetch(mocker):
+def test__build_cache_key_versioned():
+    expected = "test_prefix@2-test_key"
+
+    actual = uut._build_cache_key(  # pylint: disable=protected-access
+        prefix="test_prefix", key="test_key", version=2
+    )
+
+    assert actual == expected
+
+
+async def test_fetch(fake_cache):
     cache_data = CacheData(data="tester")
 
     expected = cache_data
 
-    mocker.patch(
-        "app.core.db.cache.aioredis.from_url",
-        Mock(
-            return_value=AsyncMock(
-                get=AsyncMock(return_value=cache_data.json()),
-                set=AsyncMock(return_value=True),
-                delete=AsyncMock(return_value=1),
-            )
-        ),
-    )
+    await fake_cache.set("test_data-tester", cache_data.json())
 
     actual = await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
 
@@ -53,15 +128,1273 @@ async def test_fetch_not_exists(_setup_cache):
     assert actual is None
 
 
-async def test_put(_setup_cache):
+async def test_fetch_many(fake_cache):
+    first = CacheData(data="first")
+    second = CacheData(data="second")
+
+    expected = [second, None, first]
+
+    await fake_cache.set("test_data-first", first.json())
+    await fake_cache.set("test_data-second", second.json())
+
+    actual = await uut.fetch_many(
+        prefix="test_data", keys=["second", "missing", "first"], doc_model=CacheData
+    )
+
+    assert actual == expected
+
+
+async def test_fetch_many_single_round_trip(mocker, fake_cache):
+    mocker.patch(f"{UUT_PATH}._namespaces", {"test_data": (0, float("inf"))})
+    fake_cache.get = AsyncMock()
+    mget = AsyncMock(return_value=[None, None])
+    fake_cache.mget = mget
+
+    await uut.fetch_many(prefix="test_data", keys=["a", "b"], doc_model=CacheData)
+
+    mget.assert_awaited_once_with(["test_data-a", "test_data-b"])
+    fake_cache.get.assert_not_awaited()
+
+
+async def test_fetch_many_empty(_setup_cache):
+    actual = await uut.fetch_many(prefix="test_data", keys=[], doc_model=CacheData)
+
+    assert actual == []
+
+
+async def test_put(fake_cache):
+    cache_data = CacheData(data="tester")
+
+    actual = await uut.put(prefix="test_data", key="tester", doc=cache_data, ttl=60)
+
+    assert actual is True
+    assert orjson.loads(await fake_cache.get("test_data-tester")) == cache_data.dict()
+    assert await fake_cache.ttl("test_data-tester") == 60
+
+
+async def test_put_many(fake_cache):
+    docs = {"first": CacheData(data="first"), "second": CacheData(data="second")}
+
+    actual = await uut.put_many(prefix="test_data", docs=docs, ttl=60)
+
+    assert actual == [True, True]
+    assert await fake_cache.mget(["test_data-first", "test_data-second"]) == [
+        orjson.dumps(docs["first"].dict()),
+        orjson.dumps(docs["second"].dict()),
+    ]
+    assert await fake_cache.ttl("test_data-second") == 60
+
+
+async def test_delete(fake_cache):
+    await fake_cache.set("test_data-tester", "cached")
+
+    actual = await uut.delete(prefix="test_data", key="tester")
+
+    assert actual is True
+    assert await fake_cache.get("test_data-tester") is None
+
+
+async def test_delete_not_exists(_setup_cache):
+    actual = await uut.delete(prefix="test_data", key="tester")
+
+    assert actual is False
+
+
+async def test_delete_many(fake_cache):
+    await fake_cache.set("test_data-first", "cached")
+    await fake_cache.set("test_data-second", "cached")
+
+    actual = await uut.delete_many(
+        prefix="test_data", keys=["first", "second", "missing"]
+    )
+
+    assert actual == 2
+
+
+async def test_delete_many_empty(_setup_cache):
+    actual = await uut.delete_many(prefix="test_data", keys=[])
+
+    assert actual == 0
+
+
+def test__local_tier_not_subscribed(mocker):
+    mocker.patch(f"{UUT_PATH}._local", LruCache(max_entries=10))
+    mocker.patch(f"{UUT_PATH}._subscribed", set())
+
+    actual = uut._local_tier()  # pylint: disable=protected-access
+
+    assert actual is None
+
+
+def test__local_tier(local):
+    actual = uut._local_tier()  # pylint: disable=protected-access
+
+    assert actual is local
+
+
+def test__handle_invalidation(local):
+    local.set("test_data-tester", "cached")
+
+    uut._handle_invalidation(
+        b"other-node|test_data-tester"
+    )  # pylint: disable=protected-access
+
+    assert local.get("test_data-tester") is MISSING
+
+
+def test__handle_invalidation_namespace(mocker, local):
+    namespaces = mocker.patch(f"{UUT_PATH}._namespaces", {"test_data": (1, 0.0)})
+
+    uut._handle_invalidation(  # pylint: disable=protected-access
+        b"other-node|CACHE_NAMESPACE-test_data"
+    )
+
+    assert not namespaces
+
+
+def test__handle_invalidation_own_node(local):
+    local.set("test_data-tester", "cached")
+    message = uut._invalidation_message(  # pylint: disable=protected-access
+        "test_data-tester"
+    )
+
+    uut._handle_invalidation(message.encode())  # pylint: disable=protected-access
+
+    assert local.get("test_data-tester") == "cached"
+
+
+async def test_init_cache_local(mocker, fake_cache, _reset_client):
+    del fake_cache
+    mocker.patch(f"{UUT_PATH}.config.cache_local_enabled", True)
+
+    await uut.init_cache()
+    await asyncio.sleep(0.05)
+
+    assert isinstance(uut._local, LruCache)  # pylint: disable=protected-access
+    assert uut._local_tier() is uut._local  # pylint: disable=protected-access
+
+    await uut.close_cache()
+
+    assert uut._local is None  # pylint: disable=protected-access
+    assert not uut._subscribed  # pylint: disable=protected-access
+
+
+async def test_invalidation_from_other_node(mocker, fake_cache, _reset_client):
+    mocker.patch(f"{UUT_PATH}.config.cache_local_enabled", True)
+    await uut.init_cache()
+    await asyncio.sleep(0.05)
+    await uut.put(prefix="test_data", key="tester", doc=CacheData(data="a"), ttl=60)
+
+    await fake_cache.publish(uut.INVALIDATION_CHANNEL, "other-node|test_data-tester")
+    await asyncio.sleep(0.05)
+
+    assert (
+        uut._local.get("test_data-tester") is MISSING
+    )  # pylint: disable=protected-access
+
+    await uut.close_cache()
+
+
+async def test_fetch_local_hit(fake_cache, local):
+    cache_data = CacheData(data="tester")
+    await fake_cache.set("test_data-tester", cache_data.json())
+
+    await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+    await fake_cache.delete("test_data-tester")
+
+    actual = await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+
+    assert actual == cache_data
+    assert local.hits == 1
+
+
+async def test_fetch_local_miss_cached(fake_cache, local):
+    await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+    await fake_cache.set("test_data-tester", CacheData(data="tester").json())
+
+    actual = await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+
+    assert actual is None
+    assert local.hits == 1
+
+
+async def test_fetch_local_invalidated_during_fetch(fake_cache, local):
+    cache_data = CacheData(data="tester")
+    await fake_cache.set("test_data-tester", cache_data.json())
+    original_mget = fake_cache.mget
+
+    async def mget_then_invalidate(cache_keys):
+        values = await original_mget(cache_keys)
+        local.delete(cache_keys[0])
+        return values
+
+    fake_cache.mget = mget_then_invalidate
+
+    await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+
+    assert len(local) == 0
+
+
+async def test_put_local(fake_cache, local):
     cache_data = CacheData(data="tester")
+    pubsub = fake_cache.pubsub()
+    await pubsub.subscribe(uut.INVALIDATION_CHANNEL)
+    await pubsub.get_message(timeout=1)
 
     actual = await uut.put(prefix="test_data", key="tester", doc=cache_data, ttl=60)
+    message = await pubsub.get_message(timeout=1)
 
     assert actual is True
+    assert local.get("test_data-tester").entity == cache_data
+    assert orjson.loads(await fake_cache.get("test_data-tester")) == cache_data.dict()
+    assert message["data"].endswith(b"|test_data-tester")
 
 
-async def test_delete(_setup_cache):
+async def test_delete_local(fake_cache, local):
+    await uut.put(prefix="test_data", key="tester", doc=CacheData(data="a"), ttl=60)
+
     actual = await uut.delete(prefix="test_data", key="tester")
 
     assert actual is True
+    assert local.get("test_data-tester") is MISSING
+    assert await fake_cache.get("test_data-tester") is None
+
+
+async def test_stats(mocker, fake_cache, local):
+    mocker.patch(f"{UUT_PATH}._remote_stats", uut.Counter())
+    await fake_cache.set("test_data-tester", CacheData(data="tester").json())
+
+    await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+    await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+    await uut.fetch(prefix="test_data", key="other", doc_model=CacheData)
+
+    actual = uut.stats()
+
+    assert actual.remote == uut.CacheTierStats(hits=1, misses=1)
+    assert actual.local.hits == 1
+    assert actual.local.misses == 2
+    assert actual.local.entries == len(local)
+
+
+def test_stats_no_local(mocker):
+    mocker.patch(f"{UUT_PATH}._local", None)
+
+    actual = uut.stats()
+
+    assert actual.local is None
+
+
+async def test_fetch_many_local(fake_cache, local):
+    first = CacheData(data="first")
+    second = CacheData(data="second")
+    local.set("test_data-first", uut._Entry(entity=first))
+    await fake_cache.set("test_data-second", second.json())
+
+    actual = await uut.fetch_many(
+        prefix="test_data", keys=["first", "second"], doc_model=CacheData
+    )
+
+    assert actual == [first, second]
+    assert local.get("test_data-second").entity == second
+
+
+async def test_put_many_local(fake_cache, local):
+    del fake_cache
+    docs = {"first": CacheData(data="first"), "second": CacheData(data="second")}
+
+    actual = await uut.put_many(prefix="test_data", docs=docs, ttl=60)
+
+    assert actual == [True, True]
+    assert local.get("test_data-first").entity == docs["first"]
+    assert local.get("test_data-second").entity == docs["second"]
+
+
+async def test_delete_many_local(fake_cache, local):
+    await uut.put(prefix="test_data", key="first", doc=CacheData(data="a"), ttl=60)
+    await fake_cache.set("test_data-second", "cached")
+
+    actual = await uut.delete_many(prefix="test_data", keys=["first", "second"])
+
+    assert actual == 2
+    assert local.get("test_data-first") is MISSING
+
+
+async def test_fetch_or_fill_hit(fake_cache):
+    cache_data = CacheData(data="tester")
+    await uut.put(prefix="test_data", key="tester", doc=cache_data, ttl=60)
+    fill = AsyncMock()
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data", key="tester", doc_model=CacheData, fill=fill, ttl=60
+    )
+
+    assert actual == cache_data
+    fill.assert_not_awaited()
+
+
+async def test_fetch_or_fill_miss(fake_cache):
+    cache_data = CacheData(data="tester")
+    fill = AsyncMock(return_value=cache_data)
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data", key="tester", doc_model=CacheData, fill=fill, ttl=60
+    )
+
+    assert actual == cache_data
+    assert await fake_cache.ttl("test_data-tester") == 60
+
+
+async def test_fetch_or_fill_miss_not_found(fake_cache):
+    fill = AsyncMock(return_value=None)
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data", key="tester", doc_model=CacheData, fill=fill, ttl=60
+    )
+
+    assert actual is None
+    assert await fake_cache.exists("test_data-tester") == 0
+
+
+async def test_fetch_or_fill_coalesces(_setup_cache):
+    cache_data = CacheData(data="tester")
+    calls = []
+
+    async def fill():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return cache_data
+
+    actual = await asyncio.gather(
+        *[
+            uut.fetch_or_fill(
+                prefix="test_data", key="tester", doc_model=CacheData, fill=fill, ttl=60
+            )
+            for _ in range(5)
+        ]
+    )
+
+    assert actual == [cache_data] * 5
+    assert len(calls) == 1
+
+
+async def test_fetch_or_fill_lock(mocker, fake_cache):
+    mocker.patch(f"{UUT_PATH}.config.cache_fill_lock_enabled", True)
+    cache_data = CacheData(data="tester")
+    fill = AsyncMock(return_value=cache_data)
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data", key="tester", doc_model=CacheData, fill=fill, ttl=60
+    )
+
+    assert actual == cache_data
+    fill.assert_awaited_once()
+    assert await fake_cache.exists("FILL_LOCK-test_data-tester") == 0
+
+
+async def test_fetch_or_fill_lock_held_elsewhere(mocker, fake_cache):
+    mocker.patch(f"{UUT_PATH}.config.cache_fill_lock_enabled", True)
+    mocker.patch(f"{UUT_PATH}.config.cache_fill_lock_poll_interval", 0.01)
+    cache_data = CacheData(data="tester")
+    fill = AsyncMock()
+    other_node_lock = fake_cache.lock("FILL_LOCK-test_data-tester", timeout=5)
+    await other_node_lock.acquire()
+
+    async def other_node_fill():
+        await asyncio.sleep(0.03)
+        await uut.put(prefix="test_data", key="tester", doc=cache_data, ttl=60)
+        await other_node_lock.release()
+
+    other_node = asyncio.create_task(other_node_fill())
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data", key="tester", doc_model=CacheData, fill=fill, ttl=60
+    )
+    await other_node
+
+    assert actual == cache_data
+    fill.assert_not_awaited()
+
+
+async def test_fetch_or_fill_lock_released_without_value(mocker, fake_cache):
+    mocker.patch(f"{UUT_PATH}.config.cache_fill_lock_enabled", True)
+    mocker.patch(f"{UUT_PATH}.config.cache_fill_lock_poll_interval", 0.01)
+    cache_data = CacheData(data="tester")
+    fill = AsyncMock(return_value=cache_data)
+    other_node_lock = fake_cache.lock("FILL_LOCK-test_data-tester", timeout=5)
+    await other_node_lock.acquire()
+
+    async def other_node_fill():
+        await asyncio.sleep(0.03)
+        await other_node_lock.release()
+
+    other_node = asyncio.create_task(other_node_fill())
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data", key="tester", doc_model=CacheData, fill=fill, ttl=60
+    )
+    await other_node
+
+    assert actual == cache_data
+    fill.assert_awaited_once()
+
+
+async def test_put_soft_ttl(mocker, fake_cache):
+    mocker.patch(f"{UUT_PATH}.time.time", return_value=1000.0)
+    mocker.patch(f"{UUT_PATH}.random.random", return_value=0.5)
+    cache_data = CacheData(data="tester")
+
+    await uut.put(
+        prefix="test_data", key="tester", doc=cache_data, ttl=60, soft_ttl=30, delta=0.2
+    )
+
+    actual = unwrap(await fake_cache.get("test_data-tester"))
+
+    assert actual.refresh_at == 1000.0 + 30 * (1 - 0.1 * 0.5)
+    assert actual.delta == pytest.approx(0.2)
+    assert CacheData.parse_raw(actual.raw) == cache_data
+    assert await fake_cache.ttl("test_data-tester") == 60
+
+
+async def test_fetch_soft_ttl(fake_cache):
+    cache_data = CacheData(data="tester")
+    await uut.put(prefix="test_data", key="tester", doc=cache_data, ttl=60, soft_ttl=30)
+
+    actual = await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+
+    assert actual == cache_data
+
+
+async def test_fetch_or_fill_fresh(mocker, fake_cache):
+    mocker.patch(f"{UUT_PATH}.random.random", return_value=0.0)
+    cache_data = CacheData(data="tester")
+    await uut.put(prefix="test_data", key="tester", doc=cache_data, ttl=60, soft_ttl=30)
+    fill = AsyncMock()
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data",
+        key="tester",
+        doc_model=CacheData,
+        fill=fill,
+        ttl=60,
+        soft_ttl=30,
+    )
+    await asyncio.gather(*uut._background)  # pylint: disable=protected-access
+
+    assert actual == cache_data
+    fill.assert_not_awaited()
+
+
+async def test_fetch_or_fill_stale(mocker, fake_cache):
+    stale = CacheData(data="stale")
+    fresh = CacheData(data="fresh")
+    await uut.put(prefix="test_data", key="tester", doc=stale, ttl=60, soft_ttl=30)
+    mocker.patch(f"{UUT_PATH}.time.time", return_value=uut.time.time() + 31)
+    fill = AsyncMock(return_value=fresh)
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data",
+        key="tester",
+        doc_model=CacheData,
+        fill=fill,
+        ttl=60,
+        soft_ttl=30,
+    )
+    await asyncio.gather(*uut._background)  # pylint: disable=protected-access
+
+    assert actual == stale
+    fill.assert_awaited_once()
+    assert (
+        await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData) == fresh
+    )
+
+
+async def test_fetch_or_fill_stale_refresh_not_found(mocker, fake_cache):
+    await uut.put(
+        prefix="test_data",
+        key="tester",
+        doc=CacheData(data="stale"),
+        ttl=60,
+        soft_ttl=30,
+    )
+    mocker.patch(f"{UUT_PATH}.time.time", return_value=uut.time.time() + 31)
+
+    await uut.fetch_or_fill(
+        prefix="test_data",
+        key="tester",
+        doc_model=CacheData,
+        fill=AsyncMock(return_value=None),
+        ttl=60,
+        soft_ttl=30,
+    )
+    await asyncio.gather(*uut._background)  # pylint: disable=protected-access
+
+    assert await fake_cache.exists("test_data-tester") == 0
+
+
+async def test_fetch_or_fill_stale_lock_held_elsewhere(mocker, fake_cache):
+    mocker.patch(f"{UUT_PATH}.config.cache_fill_lock_enabled", True)
+    stale = CacheData(data="stale")
+    await uut.put(prefix="test_data", key="tester", doc=stale, ttl=60, soft_ttl=30)
+    mocker.patch(f"{UUT_PATH}.time.time", return_value=uut.time.time() + 31)
+    other_node_lock = fake_cache.lock("FILL_LOCK-test_data-tester", timeout=5)
+    await other_node_lock.acquire()
+    fill = AsyncMock()
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data",
+        key="tester",
+        doc_model=CacheData,
+        fill=fill,
+        ttl=60,
+        soft_ttl=30,
+    )
+    await asyncio.gather(*uut._background)  # pylint: disable=protected-access
+
+    assert actual == stale
+    fill.assert_not_awaited()
+
+
+def test__should_refresh_no_soft_ttl():
+    entry = uut._Entry(
+        entity=CacheData(data="tester")
+    )  # pylint: disable=protected-access
+
+    actual = uut._should_refresh(entry)  # pylint: disable=protected-access
+
+    assert actual is False
+
+
+@pytest.mark.parametrize(
+    "random_value, expected",
+    [(0.0, False), (0.5, False), (0.99, True)],
+)
+def test__should_refresh_early(mocker, random_value, expected):
+    mocker.patch(f"{UUT_PATH}.time.time", return_value=1000.0)
+    mocker.patch(f"{UUT_PATH}.random.random", return_value=random_value)
+    # pylint: disable=protected-access
+    entry = uut._Entry(entity=CacheData(data="tester"), refresh_at=1003.0, delta=1.0)
+
+    actual = uut._should_refresh(entry)
+
+    assert actual is expected
+
+
+async def test_close_cache_cancels_background(_reset_client):
+    uut.spawn(asyncio.sleep(10))
+    task = next(iter(uut._background))  # pylint: disable=protected-access
+
+    await uut.close_cache()
+
+    assert task.cancelled()
+    assert not uut._background  # pylint: disable=protected-access
+
+
+async def test_put_missing(fake_cache):
+    actual = await uut.put_missing(prefix="test_data", key="tester", ttl=30)
+
+    assert actual is True
+    assert await fake_cache.get("test_data-tester") == TOMBSTONE
+    assert await fake_cache.ttl("test_data-tester") == 30
+    assert (
+        await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData) is None
+    )
+
+
+async def test_put_missing_local(fake_cache, local):
+    await uut.put_missing(prefix="test_data", key="tester", ttl=30)
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data",
+        key="tester",
+        doc_model=CacheData,
+        fill=AsyncMock(),
+        ttl=60,
+        missing_ttl=30,
+    )
+
+    assert actual is None
+    assert local.get("test_data-tester").cached is True
+
+
+async def test_fetch_or_fill_missing_ttl(fake_cache):
+    fill = AsyncMock(return_value=None)
+
+    for _ in range(2):
+        actual = await uut.fetch_or_fill(
+            prefix="test_data",
+            key="tester",
+            doc_model=CacheData,
+            fill=fill,
+            ttl=60,
+            missing_ttl=30,
+        )
+
+        assert actual is None
+
+    fill.assert_awaited_once()
+    assert await fake_cache.ttl("test_data-tester") == 30
+
+
+async def test_fetch_or_fill_missing_replaced_by_put(fake_cache):
+    cache_data = CacheData(data="tester")
+    await uut.put_missing(prefix="test_data", key="tester", ttl=30)
+    await uut.put(prefix="test_data", key="tester", doc=cache_data, ttl=60)
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data",
+        key="tester",
+        doc_model=CacheData,
+        fill=AsyncMock(),
+        ttl=60,
+        missing_ttl=30,
+    )
+
+    assert actual == cache_data
+
+
+async def test_fetch_or_fill_lock_held_elsewhere_missing(mocker, fake_cache):
+    mocker.patch(f"{UUT_PATH}.config.cache_fill_lock_enabled", True)
+    mocker.patch(f"{UUT_PATH}.config.cache_fill_lock_poll_interval", 0.01)
+    fill = AsyncMock()
+    other_node_lock = fake_cache.lock("FILL_LOCK-test_data-tester", timeout=5)
+    await other_node_lock.acquire()
+
+    async def other_node_fill():
+        await asyncio.sleep(0.03)
+        await uut.put_missing(prefix="test_data", key="tester", ttl=30)
+        await other_node_lock.release()
+
+    other_node = asyncio.create_task(other_node_fill())
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data",
+        key="tester",
+        doc_model=CacheData,
+        fill=fill,
+        ttl=60,
+        missing_ttl=30,
+    )
+    await other_node
+
+    assert actual is None
+    fill.assert_not_awaited()
+
+
+@pytest.fixture
+def slow_cache(mocker, fake_cache):
+    """
+    Fake redis answering every command after 50ms.
+    """
+    execute_command = fake_cache.execute_command
+
+    async def slow_execute_command(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return await execute_command(*args, **kwargs)
+
+    mocker.patch.object(fake_cache, "execute_command", slow_execute_command)
+    mocker.patch(f"{UUT_PATH}.config.cache_read_timeout", 0.01)
+
+    return fake_cache
+
+
+async def test_fetch_timeout(slow_cache):
+    with pytest.raises(CacheUnavailableException):
+        await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+
+    assert uut.stats().breakers[0].failures == 1
+
+
+async def test_fetch_redis_error(mocker, fake_cache):
+    mocker.patch.object(fake_cache, "mget", AsyncMock(side_effect=RedisError()))
+
+    with pytest.raises(CacheUnavailableException):
+        await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+
+
+async def test_fetch_breaker_open(mocker, slow_cache):
+    for _ in range(5):
+        with pytest.raises(CacheUnavailableException):
+            await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+    mget = mocker.spy(slow_cache, "mget")
+
+    with pytest.raises(CacheUnavailableException, match="circuit breaker is open"):
+        await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+
+    mget.assert_not_called()
+    assert uut.stats().breakers[0].state == "open"
+
+
+async def test_fetch_breaker_recovers(mocker, fake_cache):
+    mocker.patch.object(
+        fake_cache, "mget", AsyncMock(side_effect=[RedisError()] * 5 + [[None]])
+    )
+    for _ in range(5):
+        with pytest.raises(CacheUnavailableException):
+            await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+    uut._breaker(0)._opened_at -= 10  # pylint: disable=protected-access
+
+    actual = await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+
+    assert actual is None
+    assert uut.stats().breakers[0].state == "closed"
+
+
+async def test_fetch_breaker_trial_cancelled(mocker, fake_cache):
+    started = asyncio.Event()
+
+    async def hanging_mget(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(10)
+
+    mocker.patch.object(
+        fake_cache, "mget", AsyncMock(side_effect=[RedisError()] * 5 + [None])
+    )
+    for _ in range(5):
+        with pytest.raises(CacheUnavailableException):
+            await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+    uut._breaker(0)._opened_at -= 10  # pylint: disable=protected-access
+    mocker.patch.object(fake_cache, "mget", hanging_mget)
+
+    trial = asyncio.ensure_future(
+        uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+    )
+    await started.wait()
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+    mocker.patch.object(fake_cache, "mget", AsyncMock(return_value=[None]))
+
+    actual = await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+
+    assert actual is None
+    assert uut.stats().breakers[0].state == "closed"
+
+
+async def test_put_timeout(mocker, fake_cache):
+    mocker.patch(f"{UUT_PATH}.config.cache_write_timeout", 0.01)
+
+    async def slow_execute(*args, **kwargs):
+        await asyncio.sleep(0.05)
+
+    mocker.patch("redis.asyncio.client.Pipeline.execute", slow_execute)
+
+    with pytest.raises(CacheUnavailableException):
+        await uut.put(prefix="test_data", key="tester", doc=CacheData(data="a"), ttl=60)
+
+
+async def test_delete_redis_error(mocker, fake_cache):
+    mocker.patch.object(fake_cache, "delete", AsyncMock(side_effect=RedisError()))
+
+    with pytest.raises(CacheUnavailableException):
+        await uut.delete(prefix="test_data", key="tester")
+
+
+async def test_fetch_or_fill_fail_open(slow_cache):
+    cache_data = CacheData(data="tester")
+    fill = AsyncMock(return_value=cache_data)
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data", key="tester", doc_model=CacheData, fill=fill, ttl=60
+    )
+
+    assert actual == cache_data
+    fill.assert_awaited_once()
+
+
+async def test_fetch_or_fill_fail_closed(mocker, slow_cache):
+    mocker.patch(f"{UUT_PATH}.config.cache_fail_open_reads", False)
+    fill = AsyncMock()
+
+    with pytest.raises(CacheUnavailableException):
+        await uut.fetch_or_fill(
+            prefix="test_data", key="tester", doc_model=CacheData, fill=fill, ttl=60
+        )
+
+    fill.assert_not_awaited()
+
+
+async def test_fetch_or_fill_put_fails(mocker, fake_cache):
+    cache_data = CacheData(data="tester")
+    fill = AsyncMock(return_value=cache_data)
+    mocker.patch(
+        "redis.asyncio.client.Pipeline.execute", AsyncMock(side_effect=RedisError())
+    )
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data", key="tester", doc_model=CacheData, fill=fill, ttl=60
+    )
+
+    assert actual == cache_data
+    fill.assert_awaited_once()
+
+
+NODE_URLS = ["redis://cache-1:6379", "redis://cache-2:6379", "redis://cache-3:6379"]
+
+
+@pytest.fixture
+def shards(mocker):
+    """
+    Three independent fake redis nodes.
+    """
+    nodes = [FakeAsyncRedis(server=FakeServer()) for _ in NODE_URLS]
+    mocker.patch(f"{UUT_PATH}.config.cache_urls", ",".join(NODE_URLS))
+    mocker.patch(
+        f"{UUT_PATH}._connection", Mock(side_effect=lambda node=0: nodes[node])
+    )
+    mocker.patch(f"{UUT_PATH}._breakers", {})
+    mocker.patch(f"{UUT_PATH}._namespaces", {})
+
+    return nodes
+
+
+def test__node_urls_single():
+    actual = uut._node_urls()  # pylint: disable=protected-access
+
+    assert actual == ["redis://cache:6379"]
+
+
+def test__node_urls(mocker):
+    mocker.patch(f"{UUT_PATH}.config.cache_urls", " redis://a:6379, redis://b:6379 ")
+
+    actual = uut._node_urls()  # pylint: disable=protected-access
+
+    assert actual == ["redis://a:6379", "redis://b:6379"]
+
+
+def test__node_index_spread(mocker):
+    mocker.patch(f"{UUT_PATH}.config.cache_urls", ",".join(NODE_URLS))
+    keys = [f"test_data-{index}" for index in range(3000)]
+
+    # pylint: disable=protected-access
+    actual = Counter(uut._node_index(key) for key in keys)
+
+    assert set(actual) == {0, 1, 2}
+    assert min(actual.values()) > 800
+
+
+@pytest.mark.parametrize(
+    "before, after",
+    [
+        (NODE_URLS, NODE_URLS + ["redis://cache-4:6379"]),
+        (NODE_URLS, NODE_URLS[1:]),
+    ],
+)
+def test__node_index_minimal_movement(mocker, before, after):
+    keys = [f"test_data-{index}" for index in range(3000)]
+
+    def placement(urls):
+        mocker.patch(f"{UUT_PATH}.config.cache_urls", ",".join(urls))
+        # pylint: disable=protected-access
+        return {key: urls[uut._node_index(key)] for key in keys}
+
+    placed_before = placement(before)
+    placed_after = placement(after)
+
+    moved = [key for key in keys if placed_before[key] != placed_after[key]]
+
+    assert moved
+    for key in moved:
+        assert placed_before[key] not in after or placed_after[key] not in before
+
+
+async def test_put_many_sharded(shards):
+    docs = {f"key-{index}": CacheData(data=str(index)) for index in range(30)}
+
+    actual = await uut.put_many(prefix="test_data", docs=docs, ttl=60)
+
+    assert actual == [True] * 30
+    for key in docs:
+        cache_key = f"test_data-{key}"
+        node = uut._node_index(cache_key)  # pylint: disable=protected-access
+        assert await shards[node].exists(cache_key) == 1
+        for other, redis in enumerate(shards):
+            if other != node:
+                assert await redis.exists(cache_key) == 0
+
+
+async def test_fetch_many_sharded(mocker, shards):
+    docs = {f"key-{index}": CacheData(data=str(index)) for index in range(30)}
+    await uut.put_many(prefix="test_data", docs=docs, ttl=60)
+    mgets = [mocker.spy(redis, "mget") for redis in shards]
+    keys = list(docs) + ["missing"]
+
+    actual = await uut.fetch_many(prefix="test_data", keys=keys, doc_model=CacheData)
+
+    assert actual == list(docs.values()) + [None]
+    for mget in mgets:
+        assert mget.call_count == 1
+
+
+async def test_delete_many_sharded(shards):
+    docs = {f"key-{index}": CacheData(data=str(index)) for index in range(30)}
+    await uut.put_many(prefix="test_data", docs=docs, ttl=60)
+
+    actual = await uut.delete_many(prefix="test_data", keys=list(docs) + ["missing"])
+
+    assert actual == 30
+    for redis in shards:
+        assert await redis.dbsize() == 0
+
+
+async def test_fetch_or_fill_lock_sharded(mocker, shards):
+    mocker.patch(f"{UUT_PATH}.config.cache_fill_lock_enabled", True)
+    node = uut._node_index("test_data-tester")  # pylint: disable=protected-access
+    lock = mocker.spy(shards[node], "lock")
+    cache_data = CacheData(data="tester")
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data",
+        key="tester",
+        doc_model=CacheData,
+        fill=AsyncMock(return_value=cache_data),
+        ttl=60,
+    )
+
+    assert actual == cache_data
+    assert lock.call_args.args[0] == "FILL_LOCK-test_data-tester"
+
+
+async def test_fetch_sharded_node_down(mocker, shards):
+    node = uut._node_index("test_data-tester")  # pylint: disable=protected-access
+    mocker.patch.object(shards[node], "mget", AsyncMock(side_effect=RedisError()))
+
+    with pytest.raises(CacheUnavailableException):
+        await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+
+    actual = uut.stats().breakers
+
+    assert [breaker.failures for breaker in actual] == [
+        int(index == node) for index in range(3)
+    ]
+
+
+def test__local_tier_partially_subscribed(mocker):
+    mocker.patch(f"{UUT_PATH}.config.cache_urls", ",".join(NODE_URLS))
+    mocker.patch(f"{UUT_PATH}._local", LruCache(max_entries=10))
+    mocker.patch(f"{UUT_PATH}._subscribed", {0, 1})
+
+    actual = uut._local_tier()  # pylint: disable=protected-access
+
+    assert actual is None
+
+
+async def test_init_cache_sharded(mocker, _reset_client):
+    mocker.patch(f"{UUT_PATH}.config.cache_urls", ",".join(NODE_URLS))
+
+    await uut.init_cache()
+
+    # pylint: disable=protected-access
+    actual = [
+        uut._clients[node].connection_pool.connection_kwargs["host"]
+        for node in range(3)
+    ]
+
+    assert actual == ["cache-1", "cache-2", "cache-3"]
+
+    await uut.close_cache()
+
+
+@pytest.fixture
+def memory_cache(mocker):
+    mocker.patch(f"{UUT_PATH}.config.cache_backend", "memory")
+    mocker.patch(f"{UUT_PATH}._memory", None)
+    mocker.patch(f"{UUT_PATH}._breakers", {})
+    mocker.patch(f"{UUT_PATH}._namespaces", {})
+    mocker.patch(f"{UUT_PATH}._connection", Mock(side_effect=AssertionError))
+
+
+async def test_init_cache_memory(memory_cache):
+    await uut.init_cache()
+
+    # pylint: disable=protected-access
+    assert isinstance(uut._memory, MemoryBackend)
+    assert uut._backend() is uut._memory
+
+    await uut.close_cache()
+
+    assert uut._memory is None
+
+
+async def test_memory_backend_round_trip(memory_cache):
+    cache_data = CacheData(data="tester")
+
+    await uut.put(prefix="test_data", key="tester", doc=cache_data, ttl=60)
+    fetched = await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+    deleted = await uut.delete(prefix="test_data", key="tester")
+
+    assert fetched == cache_data
+    assert deleted is True
+    assert (
+        await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData) is None
+    )
+
+
+async def test_memory_backend_fetch_or_fill(mocker, memory_cache):
+    mocker.patch(f"{UUT_PATH}.config.cache_fill_lock_enabled", True)
+    cache_data = CacheData(data="tester")
+    fill = AsyncMock(return_value=cache_data)
+
+    actual = [
+        await uut.fetch_or_fill(
+            prefix="test_data", key="tester", doc_model=CacheData, fill=fill, ttl=60
+        )
+        for _ in range(2)
+    ]
+
+    assert actual == [cache_data, cache_data]
+    fill.assert_awaited_once()
+
+
+async def test_memory_backend_ignores_cache_urls(mocker, memory_cache):
+    mocker.patch(f"{UUT_PATH}.config.cache_urls", ",".join(NODE_URLS))
+
+    actual = uut.stats()
+
+    assert len(actual.breakers) == 1
+
+
+async def test_bump_namespace(fake_cache):
+    await uut.put(prefix="test_data", key="tester", doc=CacheData(data="old"), ttl=60)
+
+    actual = await uut.bump_namespace("test_data")
+
+    assert actual == 1
+    assert (
+        await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData) is None
+    )
+    assert await fake_cache.ttl("test_data-tester") > 0
+
+
+async def test_bump_namespace_new_entries(fake_cache):
+    await uut.bump_namespace("test_data")
+    cache_data = CacheData(data="new")
+
+    await uut.put(prefix="test_data", key="tester", doc=cache_data, ttl=60)
+    actual = await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData)
+
+    assert actual == cache_data
+    assert await fake_cache.exists("test_data@1-tester") == 1
+    assert await uut.fetch(prefix="other", key="tester", doc_model=CacheData) is None
+
+
+async def test_bump_namespace_deletes_versioned(fake_cache):
+    await uut.bump_namespace("test_data")
+    await uut.put(prefix="test_data", key="tester", doc=CacheData(data="new"), ttl=60)
+
+    actual = await uut.delete(prefix="test_data", key="tester")
+
+    assert actual is True
+    assert await fake_cache.exists("test_data@1-tester") == 0
+
+
+async def test_namespace_version_remembered(mocker, fake_cache):
+    monotonic = mocker.patch(f"{UUT_PATH}.time.monotonic", return_value=100.0)
+    assert await uut.namespace_version("test_data") == 0
+    await fake_cache.incr("CACHE_NAMESPACE-test_data")
+
+    assert await uut.namespace_version("test_data") == 0
+
+    monotonic.return_value = 105.0
+    actual = await uut.namespace_version("test_data")
+
+    assert actual == 1
+
+
+async def test_namespace_version_single_flight(fake_cache):
+    fake_cache.get = AsyncMock(return_value=b"3")
+
+    actual = await asyncio.gather(
+        *[uut.namespace_version("test_data") for _ in range(5)]
+    )
+
+    assert actual == [3] * 5
+    fake_cache.get.assert_awaited_once_with("CACHE_NAMESPACE-test_data")
+
+
+async def test_namespace_version_counter_reset(mocker, fake_cache):
+    monotonic = mocker.patch(f"{UUT_PATH}.time.monotonic", return_value=100.0)
+    for _ in range(3):
+        await uut.bump_namespace("test_data")
+    await fake_cache.delete("CACHE_NAMESPACE-test_data")
+    monotonic.return_value = 105.0
+
+    actual = await uut.namespace_version("test_data")
+
+    assert actual == 0
+    assert await uut.bump_namespace("test_data") == 1
+
+
+async def test_fetch_or_fill_namespace_unavailable(mocker, fake_cache):
+    mocker.patch.object(fake_cache, "get", AsyncMock(side_effect=RedisError))
+    fill = AsyncMock(return_value=CacheData(data="source"))
+
+    actual = await uut.fetch_or_fill(
+        prefix="test_data", key="tester", doc_model=CacheData, fill=fill, ttl=60
+    )
+
+    assert actual == CacheData(data="source")
+
+
+async def test_add_many(fake_cache):
+    await uut.put(prefix="test_data", key="first", doc=CacheData(data="old"), ttl=60)
+
+    actual = await uut.add_many(
+        prefix="test_data",
+        docs={
+            "first": (CacheData(data="first"), 60),
+            "second": (CacheData(data="second"), 30),
+        },
+    )
+
+    assert actual == [False, True]
+    assert await uut.fetch(
+        prefix="test_data", key="first", doc_model=CacheData
+    ) == CacheData(data="old")
+    assert await fake_cache.ttl("test_data-second") == 30
+
+
+async def test_add_many_local(local, fake_cache):
+    del fake_cache
+    await uut.fetch(prefix="test_data", key="first", doc_model=CacheData)
+
+    await uut.add_many(prefix="test_data", docs={"first": (CacheData(data="a"), 60)})
+    actual = await uut.fetch(prefix="test_data", key="first", doc_model=CacheData)
+
+    assert actual == CacheData(data="a")
+
+
+async def test_add_many_shards(shards):
+    keys = [f"key-{index}" for index in range(10)]
+
+    actual = await uut.add_many(
+        prefix="test_data", docs={key: (CacheData(data=key), 60) for key in keys}
+    )
+
+    assert actual == [True] * 10
+    assert sum([await node.dbsize() for node in shards]) == 10
+
+
+async def test_members(fake_cache):
+    expire_at = int(time.time()) + 60
+
+    actual = await uut.add_members(
+        prefix="test_set",
+        members=[("first", b"1", expire_at), ("first", b"1", expire_at)],
+    )
+
+    assert actual == [True, False]
+    assert await uut.is_member(prefix="test_set", key="first", member=b"1") is True
+    assert await uut.is_member(prefix="test_set", key="first", member=b"2") is False
+    assert await fake_cache.smembers("test_set-first") == {b"1"}
+
+
+async def test_members_survive_bump_namespace(fake_cache):
+    expire_at = int(time.time()) + 60
+    await uut.add_members(prefix="test_set", members=[("first", b"1", expire_at)])
+
+    await uut.bump_namespace("test_set")
+    actual = await uut.is_member(prefix="test_set", key="first", member=b"1")
+
+    assert actual is True
+    assert await fake_cache.smembers("test_set-first") == {b"1"}
+
+
+async def test_add_members_local(local, fake_cache):
+    del fake_cache
+    expire_at = int(time.time()) + 60
+    await uut.is_member(prefix="test_set", key="first", member=b"1")
+
+    await uut.add_members(prefix="test_set", members=[("first", b"1", expire_at)])
+    actual = await uut.is_member(prefix="test_set", key="first", member=b"1")
+
+    assert actual is True
+
+
+async def test_add_members_shards(shards):
+    expire_at = int(time.time()) + 60
+    keys = [f"key-{index}" for index in range(10)]
+
+    actual = await uut.add_members(
+        prefix="test_set", members=[(key, b"1", expire_at) for key in keys]
+    )
+
+    assert actual == [True] * 10
+    assert sum([await node.dbsize() for node in shards]) == 10
+
+
+async def test_incr_counter(fake_cache):
+    assert await uut.fetch_counter(prefix="test_counter", key="tester") == 0
+
+    actual = await uut.incr_counter(prefix="test_counter", key="tester")
+
+    assert actual == 1
+    assert await uut.fetch_counter(prefix="test_counter", key="tester") == 1
+    assert await fake_cache.get("test_counter-tester") == b"1"
+
+
+async def test_fetch_counter_local(local, fake_cache):
+    await fake_cache.set("test_counter-tester", 3)
+    assert await uut.fetch_counter(prefix="test_counter", key="tester") == 3
+    await fake_cache.set("test_counter-tester", 4)
+
+    actual = await uut.fetch_counter(prefix="test_counter", key="tester")
+
+    assert actual == 3
+    assert local.get("test_counter-tester") == 3
+
+
+async def test_incr_counter_local(local, fake_cache):
+    del fake_cache
+    await uut.fetch_counter(prefix="test_counter", key="tester")
+
+    actual = await uut.incr_counter(prefix="test_counter", key="tester")
+
+    assert actual == 1
+    assert local.get("test_counter-tester") is MISSING
+    assert await uut.fetch_counter(prefix="test_counter", key="tester") == 1
+
+
+async def test_counter_not_namespaced(fake_cache):
+    del fake_cache
+    await uut.incr_counter(prefix="test_counter", key="tester")
+
+    await uut.bump_namespace("test_counter")
+
+    assert await uut.fetch_counter(prefix="test_counter", key="tester") == 1
+
+
+async def test_append_log(fake_cache):
+    entry_id = await uut.append_log("test_log", b"value", max_age=60)
+
+    actual = await uut.read_log("test_log")
+
+    assert actual == [(entry_id, b"value")]
+    assert await fake_cache.xlen("test_log") == 1
+
+
+async def test_read_log_after(fake_cache):
+    del fake_cache
+    first = await uut.append_log("test_log", b"first", max_age=60)
+    second = await uut.append_log("test_log", b"second", max_age=60)
+
+    actual = await uut.read_log("test_log", after=first)
+
+    assert actual == [(second, b"second")]
+
+
+async def test_read_log_unavailable(mocker, fake_cache):
+    mocker.patch.object(fake_cache, "xrange", AsyncMock(side_effect=RedisError))
+
+    with pytest.raises(CacheUnavailableException):
+        await uut.read_log("test_log")
+
+
+async def test_bump_namespace_memory(memory_cache):
+    await uut.put(prefix="test_data", key="tester", doc=CacheData(data="old"), ttl=60)
+
+    actual = await uut.bump_namespace("test_data")
+
+    assert actual == 1
+    assert (
+        await uut.fetch(prefix="test_data", key="tester", doc_model=CacheData) is None
+    )
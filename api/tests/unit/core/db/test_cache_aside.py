@@ -0,0 +1,217 @@
+from typing import Optional
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from pydantic import BaseModel
+
+from app.core.db import cache, cache_aside as uut
+from app.core.db.codec import Codec
+from app.core.exception import CacheUnavailableException
+
+UUT_PATH = "app.core.db.cache_aside"
+
+
+class CacheData(BaseModel):
+    data: str
+
+
+class Owner(BaseModel):
+    username: str
+
+
+@pytest.fixture
+def source():
+    return AsyncMock(return_value=CacheData(data="tester"))
+
+
+async def test_cached(fake_cache, source):
+    @uut.cached(prefix="test_data", key="{username}", doc_model=CacheData, ttl=60)
+    async def fetch(username: str) -> Optional[CacheData]:
+        return await source(username)
+
+    expected = CacheData(data="tester")
+
+    actual = [await fetch("tester"), await fetch(username="tester")]
+
+    assert actual == [expected, expected]
+    source.assert_awaited_once_with("tester")
+    assert await fake_cache.ttl("test_data-tester") == 60
+
+
+async def test_cached_key_from_defaults_and_attributes(fake_cache, source):
+    @uut.cached(
+        prefix="test_data",
+        key="{owner.username}-{incomplete_only}",
+        doc_model=CacheData,
+        ttl=60,
+    )
+    async def fetch(owner: Owner, incomplete_only: bool = False) -> CacheData:
+        return await source(owner, incomplete_only)
+
+    await fetch(Owner(username="tester"))
+
+    assert await fake_cache.exists("test_data-tester-False") == 1
+
+
+async def test_cached_list(fake_cache):
+    items = [CacheData(data="first"), CacheData(data="second")]
+    source = AsyncMock(return_value=items)
+
+    @uut.cached(prefix="test_data", key="{username}", doc_model=list[CacheData], ttl=60)
+    async def fetch(username: str) -> list[CacheData]:
+        return await source(username)
+
+    actual = [await fetch("tester"), await fetch("tester")]
+
+    assert actual == [items, items]
+    source.assert_awaited_once()
+
+
+async def test_cached_missing_ttl(fake_cache):
+    source = AsyncMock(return_value=None)
+
+    @uut.cached(
+        prefix="test_data",
+        key="{username}",
+        doc_model=CacheData,
+        ttl=60,
+        missing_ttl=30,
+    )
+    async def fetch(username: str) -> Optional[CacheData]:
+        return await source(username)
+
+    actual = [await fetch("tester"), await fetch("tester")]
+
+    assert actual == [None, None]
+    source.assert_awaited_once()
+    assert await fake_cache.ttl("test_data-tester") == 30
+
+
+def test_cached_registers_codec(mocker):
+    register_codec = mocker.patch(f"{UUT_PATH}.cache.register_codec")
+    codec = Codec(trusted=True)
+
+    uut.cached(
+        prefix="test_data", key="{username}", doc_model=CacheData, ttl=60, codec=codec
+    )
+
+    register_codec.assert_called_once_with("test_data", codec)
+
+
+async def test_invalidates(fake_cache, source):
+    @uut.cached(prefix="test_data", key="{username}", doc_model=CacheData, ttl=60)
+    async def fetch(username: str) -> CacheData:
+        return await source(username)
+
+    @uut.invalidates(prefix="test_data", key="{username}")
+    async def update(username: str, data: str) -> str:
+        return data
+
+    await fetch("tester")
+
+    actual = await update("tester", data="updated")
+
+    assert actual == "updated"
+    assert await fake_cache.exists("test_data-tester") == 0
+
+
+async def test_invalidates_not_on_error(fake_cache):
+    await cache.put(
+        prefix="test_data", key="tester", doc=CacheData(data="tester"), ttl=60
+    )
+
+    @uut.invalidates(prefix="test_data", key="{username}")
+    async def update(username: str):
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        await update("tester")
+
+    assert await fake_cache.exists("test_data-tester") == 1
+
+
+@pytest.fixture
+def deferred(mocker):
+    pending = {}
+    mocker.patch(f"{UUT_PATH}._deferred", pending)
+    mocker.patch(f"{UUT_PATH}._replay", None)
+
+    return pending
+
+
+async def test_invalidates_cache_unavailable(mocker, fake_cache, deferred):
+    spawn = mocker.patch(f"{UUT_PATH}.cache.spawn")
+    mocker.patch(
+        f"{UUT_PATH}.cache.delete",
+        AsyncMock(side_effect=CacheUnavailableException("Cache unavailable")),
+    )
+
+    @uut.invalidates(prefix="test_data", key="{username}")
+    async def update(username: str, data: str) -> str:
+        return data
+
+    actual = await update("tester", data="updated")
+
+    assert actual == "updated"
+    assert deferred == {"test_data": {"tester"}}
+    spawn.assert_called_once()
+    spawn.call_args.args[0].close()
+
+
+async def test_invalidate_many(fake_cache, deferred):
+    await cache.put(prefix="test_data", key="first", doc=CacheData(data="a"), ttl=60)
+    await cache.put(prefix="test_data", key="second", doc=CacheData(data="b"), ttl=60)
+
+    await uut.invalidate_many(prefix="test_data", keys=["first", "second"])
+
+    assert await cache.fetch("test_data", key="first", doc_model=CacheData) is None
+    assert await cache.fetch("test_data", key="second", doc_model=CacheData) is None
+    assert deferred == {}
+
+
+async def test_invalidate_many_cache_unavailable(mocker, fake_cache, deferred):
+    spawn = mocker.patch(
+        f"{UUT_PATH}.cache.spawn",
+        Mock(return_value=Mock(done=Mock(return_value=False))),
+    )
+    mocker.patch(
+        f"{UUT_PATH}.cache.delete_many",
+        AsyncMock(side_effect=CacheUnavailableException("Cache unavailable")),
+    )
+
+    await uut.invalidate_many(prefix="test_data", keys=["first", "second"])
+
+    assert deferred == {"test_data": {"first", "second"}}
+    spawn.assert_called_once()
+    spawn.call_args.args[0].close()
+
+
+async def test_cached_deferred_skips_cache(fake_cache, source, deferred):
+    await cache.put(prefix="test_data", key="tester", doc=CacheData(data="old"), ttl=60)
+    deferred["test_data"] = {"tester"}
+
+    @uut.cached(prefix="test_data", key="{username}", doc_model=CacheData, ttl=60)
+    async def fetch(username: str) -> CacheData:
+        return await source(username)
+
+    actual = await fetch("tester")
+
+    assert actual == CacheData(data="tester")
+    source.assert_awaited_once_with("tester")
+
+
+async def test__replay_deletes(mocker, fake_cache, deferred):
+    mocker.patch(f"{UUT_PATH}.config.cache_breaker_reset_timeout", 0)
+    await cache.put(prefix="test_data", key="tester", doc=CacheData(data="old"), ttl=60)
+    deferred["test_data"] = {"tester"}
+    mocker.patch(
+        f"{UUT_PATH}.cache.delete_many",
+        AsyncMock(
+            side_effect=[CacheUnavailableException("Cache unavailable"), 1],
+        ),
+    )
+
+    await uut._replay_deletes()  # pylint: disable=protected-access
+
+    assert deferred == {}
+    assert uut.cache.delete_many.await_count == 2
@@ -0,0 +1,127 @@
+import orjson
+import pytest
+
+from app.core.db import codec as uut
+from app.core.user.model import UserPrivate
+from tests.factories.user_factory import UserPrivateFactory
+
+
+@pytest.fixture
+def user_private():
+    return UserPrivateFactory.build()
+
+
+def test_encode_json_plain(user_private):
+    codec = uut.Codec()
+
+    actual = codec.encode(user_private)
+
+    assert orjson.loads(actual) == orjson.loads(user_private.json())
+
+
+@pytest.mark.parametrize("serializer", [uut.JSON, uut.MSGPACK])
+@pytest.mark.parametrize("compression", [uut.NO_COMPRESSION, uut.ZSTD, uut.LZ4])
+def test_round_trip(user_private, serializer, compression):
+    codec = uut.Codec(
+        serializer=serializer, compression=compression, compression_threshold=0
+    )
+
+    actual = codec.decode(codec.encode(user_private), UserPrivate)
+
+    assert actual == user_private
+
+
+@pytest.mark.parametrize("compression", [uut.ZSTD, uut.LZ4])
+def test_encode_compressed_header(user_private, compression):
+    codec = uut.Codec(compression=compression, compression_threshold=0)
+
+    actual = codec.encode(user_private)
+
+    assert actual[:1] == uut.HEADER_MARKER
+    assert len(actual) < len(user_private.json())
+
+
+def test_encode_below_compression_threshold(user_private):
+    codec = uut.Codec(compression=uut.ZSTD, compression_threshold=100_000)
+
+    actual = codec.encode(user_private)
+
+    assert actual[:1] == b"{"
+
+
+def test_decode_written_with_other_codec(user_private):
+    writer = uut.Codec(serializer=uut.MSGPACK, compression=uut.LZ4)
+    reader = uut.Codec()
+
+    actual = reader.decode(writer.encode(user_private), UserPrivate)
+
+    assert actual == user_private
+
+
+def test_decode_legacy_json(user_private):
+    codec = uut.Codec()
+
+    actual = codec.decode(user_private.json().encode(), UserPrivate)
+
+    assert actual == user_private
+
+
+def test_decode_validates(user_private):
+    codec = uut.Codec()
+    raw = orjson.dumps({**user_private.dict(), "email": "invalid"})
+
+    with pytest.raises(ValueError):
+        codec.decode(raw, UserPrivate)
+
+
+def test_decode_trusted(user_private):
+    codec = uut.Codec(serializer=uut.MSGPACK, trusted=True)
+
+    actual = codec.decode(codec.encode(user_private), UserPrivate)
+
+    assert actual == user_private
+    assert actual.date_created == user_private.date_created
+
+
+def test_decode_trusted_skips_validation(user_private):
+    codec = uut.Codec(trusted=True)
+    raw = orjson.dumps({**user_private.dict(), "email": "invalid"})
+
+    actual = codec.decode(raw, UserPrivate)
+
+    assert actual.email == "invalid"
+
+
+def test_unknown_serializer():
+    with pytest.raises(ValueError, match="Unknown cache serializer 'invalid'"):
+        uut.Codec(serializer="invalid")
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError, match="Unknown cache compression 'invalid'"):
+        uut.Codec(compression="invalid")
+
+
+def test_missing_package(mocker):
+    mocker.patch("app.core.db.codec.zstandard", None)
+
+    with pytest.raises(
+        ValueError, match="Cache codec 'zstd' requires the 'zstandard' package"
+    ):
+        uut.Codec(compression=uut.ZSTD)
+
+
+def test_wrap_unwrap():
+    raw = b'{"data":"tester"}'
+
+    actual = uut.unwrap(uut.wrap(raw, refresh_at=1000.5, delta=0.25))
+
+    assert actual == uut.Envelope(raw=raw, refresh_at=1000.5, delta=0.25)
+
+
+def test_unwrap_plain(user_private):
+    raw = uut.Codec().encode(user_private)
+
+    actual = uut.unwrap(raw)
+
+    assert actual == uut.Envelope(raw=raw)
@@ -0,0 +1,136 @@
+from unittest.mock import Mock
+
+import pytest
+
+from app.core.db import lru as uut
+
+UUT_PATH = "app.core.db.lru"
+
+
+@pytest.fixture
+def clock(mocker):
+    return mocker.patch(f"{UUT_PATH}.time.monotonic", Mock(return_value=100.0))
+
+
+def test_get_missing():
+    lru = uut.LruCache(max_entries=2)
+
+    actual = lru.get("key")
+
+    assert actual is uut.MISSING
+    assert lru.misses == 1
+
+
+def test_set_get(clock):
+    del clock
+    lru = uut.LruCache(max_entries=2, ttl=10)
+    lru.set("key", "value")
+
+    actual = lru.get("key")
+
+    assert actual == "value"
+    assert lru.hits == 1
+
+
+def test_set_get_none(clock):
+    del clock
+    lru = uut.LruCache(max_entries=2, ttl=10)
+    lru.set("key", None)
+
+    actual = lru.get("key")
+
+    assert actual is None
+
+
+def test_get_expired(clock):
+    lru = uut.LruCache(max_entries=2, ttl=10)
+    lru.set("key", "value", size=5)
+    clock.return_value = 110.0
+
+    actual = lru.get("key")
+
+    assert actual is uut.MISSING
+    assert len(lru) == 0
+    assert lru.size_bytes == 0
+
+
+def test_set_ttl_override(clock):
+    lru = uut.LruCache(max_entries=2, ttl=10)
+    lru.set("key", "value", ttl=1)
+    clock.return_value = 101.0
+
+    actual = lru.get("key")
+
+    assert actual is uut.MISSING
+
+
+def test_set_evicts_least_recently_used(clock):
+    del clock
+    lru = uut.LruCache(max_entries=2, ttl=10)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+
+    assert lru.get("a") == 1
+    assert lru.get("b") is uut.MISSING
+    assert lru.get("c") == 3
+
+
+def test_set_evicts_by_bytes(clock):
+    del clock
+    lru = uut.LruCache(max_entries=10, max_bytes=10, ttl=10)
+    lru.set("a", 1, size=6)
+    lru.set("b", 2, size=6)
+
+    assert lru.get("a") is uut.MISSING
+    assert lru.get("b") == 2
+    assert lru.size_bytes == 6
+
+
+def test_set_too_large():
+    lru = uut.LruCache(max_entries=10, max_bytes=10, ttl=10)
+    lru.set("a", 1, size=11)
+
+    assert len(lru) == 0
+
+
+def test_set_replaces(clock):
+    del clock
+    lru = uut.LruCache(max_entries=10, ttl=10)
+    lru.set("a", 1, size=4)
+    lru.set("a", 2, size=6)
+
+    assert lru.get("a") == 2
+    assert lru.size_bytes == 6
+
+
+def test_delete():
+    lru = uut.LruCache(max_entries=2, ttl=10)
+    lru.set("key", "value")
+
+    actual = lru.delete("key")
+
+    assert actual is True
+    assert lru.get("key") is uut.MISSING
+    assert lru.generation == 1
+
+
+def test_delete_not_exists():
+    lru = uut.LruCache(max_entries=2, ttl=10)
+
+    actual = lru.delete("key")
+
+    assert actual is False
+    assert lru.generation == 1
+
+
+def test_clear():
+    lru = uut.LruCache(max_entries=2, ttl=10)
+    lru.set("key", "value", size=5)
+
+    lru.clear()
+
+    assert len(lru) == 0
+    assert lru.size_bytes == 0
+    assert lru.generation == 1
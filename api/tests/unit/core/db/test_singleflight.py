@@ -0,0 +1,88 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core.db import singleflight as uut
+
+
+async def test_do():
+    single_flight = uut.SingleFlight()
+    func = AsyncMock(return_value="result")
+
+    actual = await single_flight.do("key", func)
+
+    assert actual == "result"
+    assert len(single_flight) == 0
+
+
+async def test_do_coalesces_concurrent_calls():
+    single_flight = uut.SingleFlight()
+    release = asyncio.Event()
+    calls = []
+
+    async def func():
+        calls.append(1)
+        await release.wait()
+        return "result"
+
+    pending = [asyncio.create_task(single_flight.do("key", func)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    actual = await asyncio.gather(*pending)
+
+    assert actual == ["result"] * 5
+    assert len(calls) == 1
+    assert len(single_flight) == 0
+
+
+async def test_do_separate_keys():
+    single_flight = uut.SingleFlight()
+    func = AsyncMock(side_effect=["first", "second"])
+
+    actual = await asyncio.gather(
+        single_flight.do("first", func), single_flight.do("second", func)
+    )
+
+    assert actual == ["first", "second"]
+    assert func.await_count == 2
+
+
+async def test_do_exception_shared():
+    single_flight = uut.SingleFlight()
+    release = asyncio.Event()
+
+    async def func():
+        await release.wait()
+        raise ValueError("failed")
+
+    pending = [asyncio.create_task(single_flight.do("key", func)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    actual = await asyncio.gather(*pending, return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in actual)
+    assert len(single_flight) == 0
+
+
+async def test_do_caller_cancelled():
+    single_flight = uut.SingleFlight()
+    release = asyncio.Event()
+
+    async def func():
+        await release.wait()
+        return "result"
+
+    leader = asyncio.create_task(single_flight.do("key", func))
+    follower = asyncio.create_task(single_flight.do("key", func))
+    await asyncio.sleep(0)
+    leader.cancel()
+    release.set()
+
+    actual = await follower
+
+    assert actual == "result"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
@@ -1,18 +1,21 @@
+import asyncio
 from datetime import datetime, timezone
 from unittest.mock import AsyncMock, Mock
 from uuid import UUID
 
+import jwt
 import pytest
 from freezegun import freeze_time
 from pydantic import SecretStr
 
 from app.core.exception import (
+    CryptUnavailableException,
     InvalidCredentialException,
     ResourceNotFoundException,
     UserDisabedException,
 )
 from app.core.security import auth as uut
-from app.core.user.model import UserPrivate, UserPublic
+from app.core.user.model import UserPublic
 from tests.factories.token_factory import AuthTokenFactory
 from tests.factories.user_factory import UserPrivateFactory, UserPublicFactory
 from tests.unit import util
@@ -44,6 +47,14 @@ def test_REVOKE_LOGOUT():
     assert actual == expected
 
 
+def test_REFRESHED_TOKEN_CACHE_PREFIX():
+    expected = "REFRESHED_TOKEN"
+
+    actual = uut.REFRESHED_TOKEN_CACHE_PREFIX
+
+    assert actual == expected
+
+
 def test_oauth2_scheme():
     actual = uut.oauth2_scheme
 
@@ -83,21 +94,15 @@ def test_AuthToken_defaults():
 
 @freeze_time("2020-01-01 00:00:00")
 async def test_user_login(mocker):
-    user_private = UserPrivateFactory.build(joe=True)
-
-    updated_user_private = UserPrivate(
-        **user_private.dict(exclude={"last_login", "date_modified"}),
-        last_login=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc),
-        date_modified=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc),
+    user_private = UserPrivateFactory.build(
+        joe=True, date_modified=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
     )
 
     expected = AuthTokenFactory.build(jan_01_2020=True)
 
     mocker.patch(f"{UUT_PATH}.user_service.fetch", AsyncMock(return_value=user_private))
-    mocker.patch(
-        f"{UUT_PATH}.user_service.update_private",
-        AsyncMock(return_value=updated_user_private),
-    )
+    record_login = mocker.patch(f"{UUT_PATH}.user_service.record_login", Mock())
+    mocker.patch(f"{UUT_PATH}.token_generation", AsyncMock(return_value=None))
     mocker.patch(
         "app.core.security.token.uuid4",
         Mock(side_effect=[UUID(util.access_token_id()), UUID(util.refresh_token_id())]),
@@ -108,6 +113,25 @@ async def test_user_login(mocker):
     )
 
     assert actual == expected
+    record_login.assert_called_once_with(
+        username="Joe", last_login=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
+    )
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_user_login_generation(mocker):
+    user_private = UserPrivateFactory.build(joe=True)
+
+    mocker.patch(f"{UUT_PATH}.user_service.fetch", AsyncMock(return_value=user_private))
+    mocker.patch(f"{UUT_PATH}.user_service.record_login", Mock())
+    mocker.patch(f"{UUT_PATH}.token_generation", AsyncMock(return_value=3))
+
+    actual = await uut.user_login(
+        username=user_private.username, password=SecretStr("password")
+    )
+
+    for token in (actual.access_token, actual.refresh_token):
+        assert jwt.decode(token, options={"verify_signature": False})["gen"] == 3
 
 
 async def test_user_login_invalid_credentials(mocker):
@@ -143,21 +167,31 @@ async def test_user_logout(mocker):
 
     expected = (True, True)
 
-    mocker.patch(f"{UUT_PATH}.revoke_token", AsyncMock(return_value=True))
+    revoke_tokens = mocker.patch(
+        f"{UUT_PATH}.revoke_tokens", AsyncMock(return_value=[True, True])
+    )
 
     actual = await uut.user_logout(
         access_token=auth_token.access_token, refresh_token=auth_token.refresh_token
     )
 
     assert actual == expected
+    revoke_tokens.assert_awaited_once_with(
+        tokens=[
+            (uut.ACCESS_TOKEN, auth_token.access_token),
+            (uut.REFRESH_TOKEN, auth_token.refresh_token),
+        ],
+        revoke_reason=uut.REVOKE_LOGOUT,
+    )
 
 
 @freeze_time("2020-01-01 00:00:00")
-async def test_refresh_access_token(mocker):
+async def test_refresh_access_token(mocker, _setup_cache):
     auth_token = AuthTokenFactory.build(jan_01_2020=True)
     user_private = UserPrivateFactory.build(joe=True)
 
     token_data = {
+        "token_id": util.refresh_token_id(),
         "exp": 1577847600,
         "sub": "Joe",
     }
@@ -179,11 +213,38 @@ async def test_refresh_access_token(mocker):
 
 
 @freeze_time("2020-01-01 00:00:00")
-async def test_refresh_access_token_disabled(mocker):
+async def test_refresh_access_token_generation(mocker, _setup_cache):
+    auth_token = AuthTokenFactory.build(jan_01_2020=True)
+    user_private = UserPrivateFactory.build(joe=True)
+
+    token_data = {
+        "token_id": util.refresh_token_id(),
+        "exp": 1577847600,
+        "sub": "Joe",
+        "gen": 2,
+    }
+
+    mocker.patch(f"{UUT_PATH}.validate_token", AsyncMock(return_value=token_data))
+    mocker.patch(f"{UUT_PATH}.user_service.fetch", AsyncMock(return_value=user_private))
+    generate_token = mocker.patch(
+        f"{UUT_PATH}.generate_token",
+        Mock(
+            return_value=(auth_token.access_token, auth_token.access_token_expires_at)
+        ),
+    )
+
+    await uut.refresh_access_token(auth_token.refresh_token)
+
+    assert generate_token.call_args.kwargs["generation"] == 2
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_refresh_access_token_disabled(mocker, _setup_cache):
     auth_token = AuthTokenFactory.build(jan_01_2020=True)
     user_private = UserPrivateFactory.build(joe=True, disabled=True)
 
     token_data = {
+        "token_id": util.refresh_token_id(),
         "exp": 1577847600,
         "sub": "Joe",
     }
@@ -197,6 +258,59 @@ async def test_refresh_access_token_disabled(mocker):
         await uut.refresh_access_token(auth_token.refresh_token)
 
 
+@freeze_time("2020-01-01 00:00:00")
+async def test_refresh_access_token_deduplicated(mocker, _setup_cache):
+    auth_token = AuthTokenFactory.build(jan_01_2020=True)
+    user_private = UserPrivateFactory.build(joe=True)
+
+    token_data = {
+        "token_id": util.refresh_token_id(),
+        "exp": 1577847600,
+        "sub": "Joe",
+    }
+
+    validate_token = mocker.patch(
+        f"{UUT_PATH}.validate_token", AsyncMock(return_value=token_data)
+    )
+    fetch = mocker.patch(
+        f"{UUT_PATH}.user_service.fetch", AsyncMock(return_value=user_private)
+    )
+
+    first, *concurrent = await asyncio.gather(
+        *[uut.refresh_access_token(auth_token.refresh_token) for _ in range(3)]
+    )
+    later = await uut.refresh_access_token(auth_token.refresh_token)
+
+    assert concurrent == [first, first]
+    assert later == first
+    assert fetch.await_count == 1
+    assert validate_token.await_count == 4
+    assert await _setup_cache.exists(f"REFRESHED_TOKEN-{util.refresh_token_id()}")
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_refresh_access_token_deduplication_disabled(mocker):
+    mocker.patch(f"{UUT_PATH}.config.cache_ttl_refresh", 0)
+    auth_token = AuthTokenFactory.build(jan_01_2020=True)
+    user_private = UserPrivateFactory.build(joe=True)
+
+    token_data = {
+        "token_id": util.refresh_token_id(),
+        "exp": 1577847600,
+        "sub": "Joe",
+    }
+
+    mocker.patch(f"{UUT_PATH}.validate_token", AsyncMock(return_value=token_data))
+    fetch = mocker.patch(
+        f"{UUT_PATH}.user_service.fetch", AsyncMock(return_value=user_private)
+    )
+
+    await uut.refresh_access_token(auth_token.refresh_token)
+    await uut.refresh_access_token(auth_token.refresh_token)
+
+    assert fetch.await_count == 2
+
+
 async def test_get_user_from_token(mocker):
     auth_token = AuthTokenFactory.build(jan_01_2020=True)
     user_public = UserPublicFactory.build(joe=True)
@@ -212,6 +326,89 @@ async def test_get_user_from_token(mocker):
     assert actual == expected
 
 
+async def test_get_user_from_token_compact(mocker):
+    auth_token = AuthTokenFactory.build(jan_01_2020=True)
+    user_private = UserPrivateFactory.build(joe=True)
+
+    token_data = {"sub": user_private.username, "data": {"r": ["USER"], "d": False}}
+
+    expected = UserPublic(**user_private.dict())
+
+    mocker.patch(f"{UUT_PATH}.validate_token", AsyncMock(return_value=token_data))
+    fetch = mocker.patch(
+        f"{UUT_PATH}.user_service.fetch", AsyncMock(return_value=user_private)
+    )
+
+    actual = await uut.get_user_from_token(auth_token.access_token)
+
+    assert actual == expected
+    fetch.assert_awaited_once_with(user_private.username)
+
+
+async def test_get_token_user(mocker):
+    auth_token = AuthTokenFactory.build(jan_01_2020=True)
+    user_public = UserPublicFactory.build(joe=True)
+
+    token_data = {"sub": user_public.username, "data": user_public.dict()}
+
+    expected = uut.TokenUser(
+        username=user_public.username,
+        roles=user_public.roles,
+        disabled=user_public.disabled,
+    )
+
+    mocker.patch(f"{UUT_PATH}.validate_token", AsyncMock(return_value=token_data))
+
+    actual = await uut.get_token_user(auth_token.access_token)
+
+    assert actual == expected
+
+
+async def test_get_token_user_compact(mocker):
+    auth_token = AuthTokenFactory.build(jan_01_2020=True)
+
+    token_data = {"sub": "Joe", "data": {"r": ["USER"], "d": True}}
+
+    expected = uut.TokenUser(username="Joe", roles=["USER"], disabled=True)
+
+    mocker.patch(f"{UUT_PATH}.validate_token", AsyncMock(return_value=token_data))
+    fetch = mocker.patch(f"{UUT_PATH}.user_service.fetch", AsyncMock())
+
+    actual = await uut.get_token_user(auth_token.access_token)
+
+    assert actual == expected
+    fetch.assert_not_awaited()
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test__generate_access_token_compact(mocker):
+    mocker.patch(f"{UUT_PATH}.config.access_token_compact", True)
+    user_public = UserPublicFactory.build(joe=True)
+
+    expected = {"r": user_public.roles, "d": user_public.disabled}
+
+    access_token, _ = uut._generate_access_token(  # pylint: disable=protected-access
+        user_public
+    )
+    actual = jwt.decode(access_token, options={"verify_signature": False})
+
+    assert actual["data"] == expected
+    assert actual["sub"] == user_public.username
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test__generate_access_token_full(mocker):
+    user_public = UserPublicFactory.build(joe=True)
+
+    access_token, _ = uut._generate_access_token(  # pylint: disable=protected-access
+        user_public
+    )
+    actual = jwt.decode(access_token, options={"verify_signature": False})
+
+    assert actual["data"]["username"] == user_public.username
+    assert actual["data"]["email"] == user_public.email
+
+
 async def test__get_api_user_from_credentials(mocker):
     user_private = UserPrivateFactory.build(joe=True)
 
@@ -327,6 +524,72 @@ async def test__authenticate_user_invalid_credentials(mocker):
     assert actual == expected
 
 
+async def test__authenticate_user_rehash(mocker):
+    user_private = UserPrivateFactory.build(joe=True)
+
+    mocker.patch(f"{UUT_PATH}.user_service.fetch", AsyncMock(return_value=user_private))
+    mocker.patch(f"{UUT_PATH}.crypt.needs_update", Mock(return_value=True))
+    rehash_password = mocker.patch(f"{UUT_PATH}._rehash_password", Mock())
+    spawn = mocker.patch(f"{UUT_PATH}.cache.spawn", Mock())
+
+    await uut._authenticate_user(  # pylint: disable=protected-access
+        username=user_private.username, password=SecretStr("password")
+    )
+
+    rehash_password.assert_called_once_with(
+        username=user_private.username,
+        password=SecretStr("password"),
+        password_hash=user_private.password_hash,
+    )
+    spawn.assert_called_once_with(rehash_password.return_value)
+
+
+async def test__authenticate_user_no_rehash(mocker):
+    user_private = UserPrivateFactory.build(joe=True)
+
+    mocker.patch(f"{UUT_PATH}.user_service.fetch", AsyncMock(return_value=user_private))
+    spawn = mocker.patch(f"{UUT_PATH}.cache.spawn", Mock())
+
+    await uut._authenticate_user(  # pylint: disable=protected-access
+        username=user_private.username, password=SecretStr("password")
+    )
+
+    spawn.assert_not_called()
+
+
+async def test__rehash_password(mocker):
+    mocker.patch(
+        f"{UUT_PATH}.crypt.hash_password_async", AsyncMock(return_value="new_hash")
+    )
+    update_password_hash = mocker.patch(
+        f"{UUT_PATH}.user_service.update_password_hash", AsyncMock(return_value=True)
+    )
+
+    await uut._rehash_password(  # pylint: disable=protected-access
+        username="Joe", password=SecretStr("password"), password_hash="old_hash"
+    )
+
+    update_password_hash.assert_awaited_once_with(
+        username="Joe", password_hash="old_hash", new_password_hash="new_hash"
+    )
+
+
+async def test__rehash_password_crypt_unavailable(mocker):
+    mocker.patch(
+        f"{UUT_PATH}.crypt.hash_password_async",
+        AsyncMock(side_effect=CryptUnavailableException("busy")),
+    )
+    update_password_hash = mocker.patch(
+        f"{UUT_PATH}.user_service.update_password_hash", AsyncMock()
+    )
+
+    await uut._rehash_password(  # pylint: disable=protected-access
+        username="Joe", password=SecretStr("password"), password_hash="old_hash"
+    )
+
+    update_password_hash.assert_not_awaited()
+
+
 def test__check_authorized():
     user_public = UserPublicFactory.build(disabled=False)
 
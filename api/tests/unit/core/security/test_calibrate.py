@@ -0,0 +1,49 @@
+from unittest.mock import Mock
+
+from app.core.security import calibrate as uut
+
+UUT_PATH = "app.core.security.calibrate"
+
+
+def test_hash_time():
+    actual = uut.hash_time(uut.MIN_ROUNDS, samples=2)
+
+    assert 0 < actual < 1
+
+
+def test_suggest_rounds(mocker):
+    mocker.patch(
+        f"{UUT_PATH}.hash_time", Mock(side_effect=lambda rounds, samples: 2**rounds)
+    )
+
+    actual = uut.suggest_rounds(budget=100)
+
+    assert actual == (6, {4: 16, 5: 32, 6: 64, 7: 128})
+
+
+def test_suggest_rounds_over_budget(mocker):
+    mocker.patch(f"{UUT_PATH}.hash_time", Mock(return_value=1.0))
+
+    actual = uut.suggest_rounds(budget=0.1)
+
+    assert actual == (uut.MIN_ROUNDS, {uut.MIN_ROUNDS: 1.0})
+
+
+def test_suggest_rounds_max(mocker):
+    mocker.patch(f"{UUT_PATH}.hash_time", Mock(return_value=0.0))
+
+    suggested, timings = uut.suggest_rounds(budget=0.1)
+
+    assert suggested == uut.MAX_ROUNDS
+    assert list(timings) == list(range(uut.MIN_ROUNDS, uut.MAX_ROUNDS + 1))
+
+
+def test_main(mocker, capsys):
+    suggest_rounds = mocker.patch(
+        f"{UUT_PATH}.suggest_rounds", Mock(return_value=(5, {4: 0.1, 5: 0.2, 6: 0.4}))
+    )
+
+    uut.main(["--budget-ms", "300"])
+
+    assert suggest_rounds.call_args.kwargs == {"budget": 0.3, "samples": 3}
+    assert capsys.readouterr().out.splitlines()[-1] == "CRYPT_BCRYPT_ROUNDS=5"
@@ -1,9 +1,15 @@
+import asyncio
+import threading
+
 import pytest
 from pydantic import SecretStr
 
+from app.core.exception import CryptUnavailableException
 from app.core.security import crypt as uut
 from tests import util
 
+UUT_PATH = "app.core.security.crypt"
+
 
 @pytest.fixture
 def password():
@@ -15,10 +21,50 @@ def password_hash():
     return util.password_hash()
 
 
+@pytest.fixture
+def crypt_pool(mocker):
+    mocker.patch(f"{UUT_PATH}.config.crypt_pool_size", 1)
+    mocker.patch(f"{UUT_PATH}.config.crypt_queue_depth", 1)
+    mocker.patch(f"{UUT_PATH}.config.crypt_queue_timeout", 5.0)
+    mocker.patch(f"{UUT_PATH}._pool", None)
+    mocker.patch(f"{UUT_PATH}._slots", None)
+    mocker.patch(f"{UUT_PATH}._waiting", 0)
+
+    yield
+
+    uut.close_crypt()
+
+
+@pytest.fixture
+def blocked(crypt_pool):
+    """
+    Occupies the single pool thread until set.
+    """
+    del crypt_pool
+    release = threading.Event()
+
+    return release
+
+
 def test_context():
     actual = uut.context
 
     assert actual.schemes() == ("bcrypt",)
+    assert actual.to_dict()["bcrypt__default_rounds"] == 12
+
+
+def test_needs_update(password_hash):
+    actual = uut.needs_update(password_hash)
+
+    assert actual is False
+
+
+def test_needs_update_rounds(password):
+    password_hash = uut.context.hash(password.get_secret_value(), rounds=4)
+
+    actual = uut.needs_update(password_hash)
+
+    assert actual is True
 
 
 def test_verify_password(password, password_hash):
@@ -41,3 +87,74 @@ def test_hash_password(password):
 
     assert isinstance(actual_hash, str)
     assert actual_result is True
+
+
+async def test_verify_password_async(crypt_pool, password, password_hash):
+    del crypt_pool
+
+    actual = await uut.verify_password_async(
+        password=password, password_hash=password_hash
+    )
+
+    assert actual is True
+
+
+async def test_hash_password_async(crypt_pool, password):
+    del crypt_pool
+
+    actual_hash = await uut.hash_password_async(password=password)
+    actual_result = uut.verify_password(password=password, password_hash=actual_hash)
+
+    assert actual_result is True
+
+
+async def test__run_off_loop(crypt_pool):
+    del crypt_pool
+
+    actual = await uut._run(  # pylint: disable=protected-access
+        lambda: threading.current_thread().name
+    )
+
+    assert actual.startswith("crypt")
+
+
+async def test__run_queue_full(blocked):
+    running = asyncio.ensure_future(
+        uut._run(blocked.wait)  # pylint: disable=protected-access
+    )
+    await asyncio.sleep(0)
+    queued = asyncio.ensure_future(
+        uut._run(lambda: "queued")  # pylint: disable=protected-access
+    )
+    await asyncio.sleep(0)
+
+    with pytest.raises(CryptUnavailableException, match="Too many"):
+        await uut._run(lambda: "rejected")  # pylint: disable=protected-access
+
+    blocked.set()
+    assert await running is True
+    assert await queued == "queued"
+
+
+async def test__run_queue_timeout(mocker, blocked):
+    mocker.patch(f"{UUT_PATH}.config.crypt_queue_timeout", 0.01)
+    running = asyncio.ensure_future(
+        uut._run(blocked.wait)  # pylint: disable=protected-access
+    )
+    await asyncio.sleep(0)
+
+    with pytest.raises(CryptUnavailableException, match="Timed out"):
+        await uut._run(lambda: "timed out")  # pylint: disable=protected-access
+
+    blocked.set()
+    assert await running is True
+    assert uut._waiting == 0  # pylint: disable=protected-access
+
+
+def test_close_crypt(crypt_pool):
+    del crypt_pool
+    uut._crypt_pool()  # pylint: disable=protected-access
+
+    uut.close_crypt()
+
+    assert uut._pool is None  # pylint: disable=protected-access
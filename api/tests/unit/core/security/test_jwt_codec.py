@@ -0,0 +1,268 @@
+import random
+import string
+from datetime import datetime, timezone
+
+import jwt
+import orjson
+import pytest
+from freezegun import freeze_time
+from jwt.exceptions import (
+    DecodeError,
+    ExpiredSignatureError,
+    ImmatureSignatureError,
+    InvalidAlgorithmError,
+    InvalidAudienceError,
+    InvalidIssuedAtError,
+    InvalidJTIError,
+    InvalidSignatureError,
+    InvalidSubjectError,
+)
+
+from app.core.security import jwt_codec as uut
+
+SECRET = "changethis"
+FUZZ_ITERATIONS = 500
+ASCII = string.printable + "\x00\x1f\x7f"
+UNICODE = ASCII + "éß漢字😀 "
+REGISTERED_CLAIMS = ["aud", "iss", "sub", "jti"]
+CLAIM_VALUES = [None, "", "tester", [], ["tester"], 0, 1, True, {}]
+
+
+@pytest.fixture
+def codec():
+    return uut.HmacJwtCodec(secret=SECRET, algorithm="HS256")
+
+
+def _random_text(rng: random.Random, alphabet: str) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 24)))
+
+
+def _random_value(rng: random.Random, alphabet: str, depth: int = 0):
+    kind = rng.randrange(7 if depth < 3 else 5)
+
+    if kind == 0:
+        return None
+    if kind == 1:
+        return rng.choice([True, False])
+    if kind == 2:
+        return rng.randint(-(2**53), 2**53)
+    if kind == 3:
+        return round(rng.uniform(-1e6, 1e6), rng.randint(0, 6))
+    if kind == 4:
+        return _random_text(rng, alphabet)
+    if kind == 5:
+        return [
+            _random_value(rng, alphabet, depth + 1) for _ in range(rng.randint(0, 4))
+        ]
+
+    return _random_payload(rng, alphabet, depth + 1)
+
+
+def _random_payload(rng: random.Random, alphabet: str, depth: int = 0) -> dict:
+    return {
+        _random_text(rng, alphabet): _random_value(rng, alphabet, depth)
+        for _ in range(rng.randint(0, 6))
+    }
+
+
+def test_DIGESTS():
+    expected = ["HS256", "HS384", "HS512"]
+
+    actual = list(uut.DIGESTS)
+
+    assert actual == expected
+
+
+@pytest.mark.parametrize("algorithm", ["HS256", "HS384", "HS512"])
+def test_encode_matches_pyjwt_fuzz(algorithm):
+    codec = uut.HmacJwtCodec(secret=SECRET, algorithm=algorithm)
+    rng = random.Random(algorithm)
+
+    for _ in range(FUZZ_ITERATIONS):
+        payload = _random_payload(rng, UNICODE)
+
+        expected = jwt.encode(payload, SECRET, algorithm)
+
+        actual = codec.encode(payload)
+
+        assert actual == expected
+
+
+@pytest.mark.parametrize("algorithm", ["HS256", "HS384", "HS512"])
+def test_decode_matches_pyjwt_fuzz(algorithm):
+    codec = uut.HmacJwtCodec(secret=SECRET, algorithm=algorithm)
+    rng = random.Random(algorithm)
+
+    for _ in range(FUZZ_ITERATIONS):
+        payload = _random_payload(rng, UNICODE)
+
+        assert codec.decode(jwt.encode(payload, SECRET, algorithm)) == payload
+        assert jwt.decode(codec.encode(payload), SECRET, [algorithm]) == payload
+
+
+def test_decode_registered_claims_match_pyjwt_fuzz(codec):
+    rng = random.Random(0)
+
+    for _ in range(FUZZ_ITERATIONS):
+        payload = _random_payload(rng, ASCII)
+        for claim in rng.sample(REGISTERED_CLAIMS, rng.randint(1, 4)):
+            payload[claim] = rng.choice(CLAIM_VALUES)
+        token = jwt.api_jws.encode(orjson.dumps(payload), SECRET, "HS256")
+
+        try:
+            expected = jwt.decode(token, SECRET, ["HS256"])
+        except jwt.InvalidTokenError as error:
+            expected = type(error)
+
+        try:
+            actual = codec.decode(token)
+        except jwt.InvalidTokenError as error:
+            actual = type(error)
+
+        assert actual == expected
+
+
+def test_encode_exponent_float(codec):
+    payload = {"value": 1e-7}
+
+    actual = codec.encode(payload)
+
+    assert jwt.decode(actual, SECRET, ["HS256"]) == payload
+
+
+def test_decode_tampered_fuzz(codec):
+    rng = random.Random(0)
+    token = codec.encode({"sub": "tester", "data": {"roles": ["user"]}})
+
+    for _ in range(FUZZ_ITERATIONS):
+        index = rng.randrange(len(token))
+        tampered = token[:index] + rng.choice(string.printable) + token[index + 1 :]
+
+        try:
+            expected = jwt.decode(tampered, SECRET, ["HS256"])
+        except jwt.InvalidTokenError:
+            expected = None
+
+        try:
+            actual = codec.decode(tampered)
+        except jwt.InvalidTokenError:
+            actual = None
+
+        assert actual == expected
+
+
+@freeze_time("2020-01-01 00:00:00")
+def test_encode_datetime_claims(codec):
+    payload = {
+        "exp": datetime(2020, 1, 1, 1, tzinfo=timezone.utc),
+        "iat": datetime(2020, 1, 1, tzinfo=timezone.utc),
+    }
+
+    expected = jwt.encode(payload, SECRET, "HS256")
+
+    actual = codec.encode(payload)
+
+    assert actual == expected
+    assert codec.decode(actual) == {"exp": 1577840400, "iat": 1577836800}
+
+
+def test_decode_invalid_signature(codec):
+    token = jwt.encode({"sub": "tester"}, "other", "HS256")
+
+    with pytest.raises(InvalidSignatureError):
+        codec.decode(token)
+
+
+def test_decode_other_algorithm(codec):
+    token = jwt.encode({"sub": "tester"}, SECRET, "HS512")
+
+    with pytest.raises(InvalidAlgorithmError):
+        codec.decode(token)
+
+
+def test_decode_reordered_header(codec):
+    token = jwt.encode(
+        {"sub": "tester"}, SECRET, "HS256", headers={"kid": "a"}, sort_headers=False
+    )
+
+    actual = codec.decode(token)
+
+    assert actual == {"sub": "tester"}
+
+
+@pytest.mark.parametrize("token", ["", "a.b", "a.b.c", "!!!.@@@.###"])
+def test_decode_malformed(codec, token):
+    with pytest.raises(DecodeError):
+        codec.decode(token)
+
+
+def test_decode_not_object(codec):
+    token = jwt.api_jws.encode(b"[1]", SECRET, "HS256")
+
+    with pytest.raises(DecodeError):
+        codec.decode(token)
+
+
+@freeze_time("2020-01-01 00:00:00")
+def test_decode_expired(codec):
+    token = codec.encode({"exp": 1577836800})
+
+    with pytest.raises(ExpiredSignatureError):
+        codec.decode(token)
+
+
+@freeze_time("2020-01-01 00:00:00")
+@pytest.mark.parametrize("claim", ["iat", "nbf"])
+def test_decode_immature(codec, claim):
+    token = codec.encode({claim: 1577836801})
+
+    with pytest.raises(ImmatureSignatureError):
+        codec.decode(token)
+
+
+@pytest.mark.parametrize(
+    "claim, error",
+    [("exp", DecodeError), ("nbf", DecodeError), ("iat", InvalidIssuedAtError)],
+)
+def test_decode_time_claim_not_int(codec, claim, error):
+    token = codec.encode({claim: "soon"})
+
+    with pytest.raises(error):
+        codec.decode(token)
+
+
+@pytest.mark.parametrize(
+    "claims, error",
+    [
+        ({"aud": "tester"}, InvalidAudienceError),
+        ({"aud": ["tester"]}, InvalidAudienceError),
+        ({"sub": 1}, InvalidSubjectError),
+        ({"jti": None}, InvalidJTIError),
+    ],
+)
+def test_decode_invalid_registered_claim(codec, claims, error):
+    token = jwt.api_jws.encode(orjson.dumps(claims), SECRET, "HS256")
+
+    with pytest.raises(error):
+        codec.decode(token)
+
+
+def test_decode_empty_audience(codec):
+    token = codec.encode({"aud": None, "iss": "tester"})
+
+    actual = codec.decode(token)
+
+    assert actual == {"aud": None, "iss": "tester"}
+
+
+def test_codec_for():
+    actual = uut.codec_for(secret=SECRET, algorithm="HS384")
+
+    assert isinstance(actual, uut.HmacJwtCodec)
+    assert actual.algorithm == "HS384"
+
+
+def test_codec_for_unsupported():
+    actual = uut.codec_for(secret=SECRET, algorithm="RS256")
+
+    assert actual is None
@@ -0,0 +1,151 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core.db.bloom import SlicedBloomFilter
+from app.core.exception import CacheUnavailableException
+from app.core.security import revocation as uut
+
+UUT_PATH = "app.core.security.revocation"
+
+EXP = 4102444800
+
+
+@pytest.fixture
+def revocation_filter(mocker):
+    mocker.patch(f"{UUT_PATH}.config.revocation_filter_enabled", True)
+    mocker.patch(f"{UUT_PATH}._filter", None)
+    mocker.patch(f"{UUT_PATH}._cursor", "0")
+    mocker.patch(f"{UUT_PATH}._synced_at", None)
+    mocker.patch(f"{UUT_PATH}._log_started", 0.0)
+
+
+def test__revocation_filter(revocation_filter):
+    actual = uut._revocation_filter()  # pylint: disable=protected-access
+
+    assert isinstance(actual, SlicedBloomFilter)
+    assert actual.slice_seconds == 3600
+    assert actual.slice_count == 4
+    assert actual.fp_rate == 0.001
+    assert actual.slice_bytes == 262144
+
+
+def test_might_be_revoked_disabled(mocker):
+    mocker.patch(f"{UUT_PATH}.config.revocation_filter_enabled", False)
+
+    actual = uut.might_be_revoked("token_id", exp=EXP)
+
+    assert actual is True
+
+
+def test_might_be_revoked_not_synced(revocation_filter):
+    actual = uut.might_be_revoked("token_id", exp=EXP)
+
+    assert actual is True
+
+
+async def test_might_be_revoked_synced(revocation_filter, _setup_cache):
+    await uut.sync()
+
+    assert uut.might_be_revoked("token_id", exp=EXP) is False
+
+
+async def test_might_be_revoked_log_incomplete(mocker, revocation_filter, _setup_cache):
+    mocker.patch(f"{UUT_PATH}._log_started", None)
+    now = mocker.patch(f"{UUT_PATH}.time.time", return_value=1000.0)
+    await uut.sync()
+    max_age = uut._max_token_age() * 60  # pylint: disable=protected-access
+
+    now.return_value = 1000.0 + max_age - 1
+    assert uut.might_be_revoked("token_id", exp=EXP) is True
+    now.return_value = 1000.0 + max_age
+    assert uut.might_be_revoked("token_id", exp=EXP) is False
+
+
+async def test__load_log_start(mocker, _setup_cache):
+    now = mocker.patch(f"{UUT_PATH}.time.time", return_value=1000.0)
+    first = await uut._load_log_start()  # pylint: disable=protected-access
+
+    now.return_value = 2000.0
+    second = await uut._load_log_start()  # pylint: disable=protected-access
+
+    assert first == 1000.0
+    assert second == 1000.0
+
+
+async def test_might_be_revoked_stale(mocker, revocation_filter, _setup_cache):
+    monotonic = mocker.patch(f"{UUT_PATH}.time.monotonic", return_value=100.0)
+    await uut.sync()
+
+    monotonic.return_value = 106.0
+    actual = uut.might_be_revoked("token_id", exp=EXP)
+
+    assert actual is True
+
+
+async def test_record(revocation_filter, _setup_cache):
+    await uut.record("token_id", exp=EXP)
+    await uut.sync()
+
+    assert uut.might_be_revoked("token_id", exp=EXP) is True
+    assert uut.might_be_revoked("other", exp=EXP) is False
+
+
+async def test_record_disabled(mocker, _setup_cache):
+    mocker.patch(f"{UUT_PATH}.config.revocation_filter_enabled", False)
+    append_log = mocker.patch(f"{UUT_PATH}.cache.append_log", AsyncMock())
+
+    mocker.patch(f"{UUT_PATH}._filter", None)
+
+    await uut.record("token_id", exp=EXP)
+
+    append_log.assert_awaited_once()
+    assert uut._filter is None  # pylint: disable=protected-access
+
+
+async def test_sync(mocker, revocation_filter, _setup_cache):
+    await uut.record("first", exp=EXP)
+    await uut.record("second", exp=EXP)
+    mocker.patch(f"{UUT_PATH}._filter", None)
+
+    assert await uut.sync() == 2
+    assert await uut.sync() == 0
+    assert uut.might_be_revoked("first", exp=EXP) is True
+    assert uut.might_be_revoked("second", exp=EXP) is True
+
+
+async def test_sync_batches(mocker, revocation_filter, _setup_cache):
+    mocker.patch(f"{UUT_PATH}.SYNC_BATCH_SIZE", 2)
+    for index in range(5):
+        await uut.record(f"token-{index}", exp=EXP)
+
+    actual = await uut.sync()
+
+    assert actual == 5
+
+
+async def test_sync_cache_unavailable(mocker, revocation_filter):
+    mocker.patch(
+        f"{UUT_PATH}.cache.read_log",
+        AsyncMock(side_effect=CacheUnavailableException("Cache unavailable")),
+    )
+
+    with pytest.raises(CacheUnavailableException):
+        await uut.sync()
+
+    assert uut.might_be_revoked("token_id", exp=EXP) is True
+
+
+async def test_watch(mocker, revocation_filter):
+    sync = mocker.patch(
+        f"{UUT_PATH}.sync",
+        AsyncMock(side_effect=[1, CacheUnavailableException("Cache unavailable")]),
+    )
+    mocker.patch(
+        f"{UUT_PATH}.asyncio.sleep", AsyncMock(side_effect=[None, RuntimeError])
+    )
+
+    with pytest.raises(RuntimeError):
+        await uut.watch()
+
+    assert sync.await_count == 2
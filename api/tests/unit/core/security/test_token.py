@@ -1,12 +1,16 @@
+import math
 from datetime import datetime, timezone
 from unittest.mock import AsyncMock, Mock
 from uuid import UUID
 
+import jwt
 import pytest
 from freezegun import freeze_time
+from jwt.exceptions import ExpiredSignatureError, InvalidSignatureError
 from pydantic import BaseModel
 
-from app.core.exception import InvalidTokenException
+from app.core.db.lru import MISSING, LruCache
+from app.core.exception import CacheUnavailableException, InvalidTokenException
 from app.core.security import token as uut
 from tests.factories.token_factory import RevokedTokenFactory
 
@@ -44,6 +48,14 @@ def token_no_data(mocker, token_id):
     )
 
 
+@pytest.fixture
+def verified(mocker):
+    lru = LruCache(max_entries=10)
+    mocker.patch(f"{UUT_PATH}._verified", lru)
+
+    return lru
+
+
 def test_REVOKED_TOKEN_CACHE_PREFIX():
     expected = "REVOKED_TOKEN"
 
@@ -52,6 +64,14 @@ def test_REVOKED_TOKEN_CACHE_PREFIX():
     assert actual == expected
 
 
+def test_REVOCATION_BUCKET_SECONDS():
+    expected = 3600
+
+    actual = uut.REVOCATION_BUCKET_SECONDS
+
+    assert actual == expected
+
+
 def test_RevokedToken():
     revoked_token = RevokedTokenFactory.build()
 
@@ -117,10 +137,8 @@ async def test_validate_token(_setup_cache, token_no_data, token_id):
 
 
 @freeze_time("2020-01-01 00:00:00")
-async def test_validate_token_revoked(mocker, token_no_data, token_id):
-    revoked_token = RevokedTokenFactory.build()
-
-    mocker.patch(f"{UUT_PATH}.cache.fetch", AsyncMock(return_value=revoked_token))
+async def test_validate_token_revoked(mocker, _setup_cache, token_no_data, token_id):
+    mocker.patch(f"{UUT_PATH}.cache.is_member", AsyncMock(return_value=True))
 
     with pytest.raises(
         InvalidTokenException,
@@ -153,10 +171,8 @@ async def test_revoke_token(_setup_cache, token_no_data):
 
 
 @freeze_time("2020-01-01 00:00:00")
-async def test_revoke_token_already_revoked(mocker, token_no_data):
-    revoked_token = RevokedTokenFactory.build()
-
-    mocker.patch(f"{UUT_PATH}.cache.fetch", AsyncMock(return_value=revoked_token))
+async def test_revoke_token_already_revoked(_setup_cache, token_no_data):
+    await uut.revoke_token(claim="TEST", token=token_no_data, revoke_reason="testing")
 
     actual = await uut.revoke_token(
         claim="TEST", token=token_no_data, revoke_reason="testing"
@@ -173,17 +189,446 @@ async def test_revoke_token_expired(_setup_cache, token_no_data):
     assert actual is False
 
 
-async def test__is_token_revoked_true(mocker, token_id):
-    revoked_token = RevokedTokenFactory.build()
+async def test__is_token_revoked_true(mocker, _setup_cache, token_id):
+    mocker.patch(f"{UUT_PATH}.cache.is_member", AsyncMock(return_value=True))
 
-    mocker.patch(f"{UUT_PATH}.cache.fetch", AsyncMock(return_value=revoked_token))
-
-    actual = await uut._is_token_revoked(token_id)  # pylint: disable=protected-access
+    actual = await uut._is_token_revoked(  # pylint: disable=protected-access
+        token_id, exp=1577840400
+    )
 
     assert actual is True
 
 
 async def test__is_token_revoked_false(_setup_cache, token_id):
-    actual = await uut._is_token_revoked(token_id)  # pylint: disable=protected-access
+    actual = await uut._is_token_revoked(  # pylint: disable=protected-access
+        token_id, exp=1577840400
+    )
+
+    assert actual is False
+
+
+async def test__is_token_revoked_legacy(_setup_cache, token_id):
+    revoked_token = uut.RevokedToken(
+        token_id=token_id,
+        claim="TEST",
+        exp=1577840400,
+        sub="tester",
+        revoke_reason="testing",
+    )
+    await uut.cache.put(
+        prefix=uut.REVOKED_TOKEN_CACHE_PREFIX,
+        key=token_id,
+        doc=revoked_token,
+        ttl=60,
+    )
+
+    actual = await uut._is_token_revoked(  # pylint: disable=protected-access
+        token_id, exp=1577840400
+    )
+
+    assert actual is True
+
+
+async def test__is_token_revoked_legacy_disabled(mocker, token_id):
+    mocker.patch(f"{UUT_PATH}.config.revocation_legacy_check", False)
+    mocker.patch(f"{UUT_PATH}.cache.is_member", AsyncMock(return_value=False))
+    fetch = mocker.patch(f"{UUT_PATH}.cache.fetch", AsyncMock())
+
+    actual = await uut._is_token_revoked(  # pylint: disable=protected-access
+        token_id, exp=1577840400
+    )
+
+    assert actual is False
+    fetch.assert_not_awaited()
+
+
+async def test__is_token_revoked_cache_unavailable(mocker, token_id):
+    mocker.patch(
+        f"{UUT_PATH}.cache.is_member",
+        AsyncMock(side_effect=CacheUnavailableException("Cache unavailable")),
+    )
+
+    with pytest.raises(CacheUnavailableException):
+        await uut._is_token_revoked(  # pylint: disable=protected-access
+            token_id, exp=1577840400
+        )
+
+
+async def test__is_token_revoked_cache_unavailable_fail_open(mocker, token_id):
+    mocker.patch(f"{UUT_PATH}.config.cache_revocation_fail_open", True)
+    mocker.patch(
+        f"{UUT_PATH}.cache.is_member",
+        AsyncMock(side_effect=CacheUnavailableException("Cache unavailable")),
+    )
+
+    actual = await uut._is_token_revoked(  # pylint: disable=protected-access
+        token_id, exp=1577840400
+    )
+
+    assert actual is False
+
+
+async def test__is_token_revoked_filter_miss(mocker, token_id):
+    mocker.patch(f"{UUT_PATH}.revocation.might_be_revoked", Mock(return_value=False))
+    is_member = mocker.patch(f"{UUT_PATH}.cache.is_member", AsyncMock())
+
+    actual = await uut._is_token_revoked(  # pylint: disable=protected-access
+        token_id, exp=1577840400
+    )
+
+    assert actual is False
+    is_member.assert_not_awaited()
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_revoke_token_recorded(mocker, _setup_cache, token_no_data, token_id):
+    record = mocker.patch(f"{UUT_PATH}.revocation.record", AsyncMock())
+
+    await uut.revoke_token(claim="TEST", token=token_no_data, revoke_reason="testing")
+
+    record.assert_awaited_once_with(token_id, exp=1577840400)
+
+
+@freeze_time("2020-01-01 00:00:00")
+def test__decode_cached(mocker, verified, token_no_data):
+    decode = mocker.spy(uut._codec, "decode")  # pylint: disable=protected-access
+
+    expected = uut._decode(token_no_data)  # pylint: disable=protected-access
+
+    actual = uut._decode(token_no_data)  # pylint: disable=protected-access
+
+    assert actual is expected
+    assert decode.call_count == 1
+    assert len(verified) == 1
+
+
+def test__decode_cached_expired(verified, token_no_data):
+    with freeze_time("2020-01-01 00:00:00"):
+        uut._decode(token_no_data)  # pylint: disable=protected-access
+
+    with pytest.raises(ExpiredSignatureError):
+        uut._decode(token_no_data)  # pylint: disable=protected-access
+
+
+@freeze_time("2020-01-01 00:00:00")
+def test__decode_cache_disabled(mocker, verified, token_no_data):
+    mocker.patch(f"{UUT_PATH}.config.token_cache_max_entries", 0)
+    decode = mocker.spy(uut._codec, "decode")  # pylint: disable=protected-access
+
+    uut._decode(token_no_data)  # pylint: disable=protected-access
+    uut._decode(token_no_data)  # pylint: disable=protected-access
+
+    assert decode.call_count == 2
+    assert len(verified) == 0
+
+
+@freeze_time("2020-01-01 00:00:00")
+def test__decode_invalid_not_cached(verified, token_no_data):
+    with pytest.raises(InvalidSignatureError):
+        uut._decode(token_no_data[:-1] + "A")  # pylint: disable=protected-access
+
+    assert len(verified) == 0
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_validate_token_cached_revoked(
+    mocker, _setup_cache, verified, token_no_data
+):
+    mocker.patch(f"{UUT_PATH}.cache.is_member", AsyncMock(return_value=False))
+    await uut.validate_token(claim="TEST", token=token_no_data)
+    mocker.patch(f"{UUT_PATH}.cache.is_member", AsyncMock(return_value=True))
+
+    with pytest.raises(InvalidTokenException, match="has been revoked"):
+        await uut.validate_token(claim="TEST", token=token_no_data)
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_revoke_token_drops_verified(verified, _setup_cache, token_no_data):
+    await uut.revoke_token(claim="TEST", token=token_no_data, revoke_reason="testing")
+
+    actual = verified.get(
+        uut._token_key(token_no_data)
+    )  # pylint: disable=protected-access
+
+    assert actual is MISSING
+
+
+@freeze_time("2020-01-01 00:00:00")
+def test_generate_token_generation():
+    token, _ = uut.generate_token(
+        claim="TEST", expire_min=60.0, sub="tester", generation=2
+    )
+
+    actual = jwt.decode(token, options={"verify_signature": False})
+
+    assert actual["gen"] == 2
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_validate_token_old_generation(_setup_cache, verified):
+    token, _ = uut.generate_token(
+        claim="TEST", expire_min=60.0, sub="tester", generation=0
+    )
+    await uut.revoke_all_tokens("tester")
+
+    with pytest.raises(InvalidTokenException, match="has been revoked"):
+        await uut.validate_token(claim="TEST", token=token)
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_validate_token_current_generation(_setup_cache, verified):
+    await uut.revoke_all_tokens("tester")
+    generation = await uut.token_generation("tester")
+    token, _ = uut.generate_token(
+        claim="TEST", expire_min=60.0, sub="tester", generation=generation
+    )
+
+    actual = await uut.validate_token(claim="TEST", token=token)
+
+    assert actual["gen"] == 1
+
+
+async def test_token_generation(_setup_cache):
+    assert await uut.token_generation("tester") == 0
+
+    await uut.revoke_all_tokens("tester")
+
+    assert await uut.token_generation("tester") == 1
+    assert await uut.token_generation("other") == 0
+
+
+async def test_token_generation_disabled(mocker, _setup_cache):
+    mocker.patch(f"{UUT_PATH}.config.token_generation_enabled", False)
+
+    assert await uut.revoke_all_tokens("tester") is None
+    assert await uut.token_generation("tester") is None
+
+
+async def test__is_current_generation_no_generation(mocker):
+    fetch_counter = mocker.patch(f"{UUT_PATH}.cache.fetch_counter", AsyncMock())
+
+    actual = await uut._is_current_generation(  # pylint: disable=protected-access
+        {"sub": "tester"}
+    )
+
+    assert actual is True
+    fetch_counter.assert_not_awaited()
+
+
+async def test__is_current_generation_remembered(mocker, _setup_cache):
+    fetch_counter = mocker.spy(uut.cache, "fetch_counter")
+
+    for _ in range(3):
+        assert await uut._is_current_generation(  # pylint: disable=protected-access
+            {"sub": "tester", "gen": 0}
+        )
+
+    fetch_counter.assert_awaited_once()
+
+
+async def test__is_current_generation_mismatch_rechecked(_setup_cache):
+    await uut._is_current_generation(  # pylint: disable=protected-access
+        {"sub": "tester", "gen": 0}
+    )
+    await _setup_cache.incr("TOKEN_GENERATION-tester")
+
+    actual = await uut._is_current_generation(  # pylint: disable=protected-access
+        {"sub": "tester", "gen": 1}
+    )
+
+    assert actual is True
+
+
+async def test__is_current_generation_revoked_here(_setup_cache):
+    await uut._is_current_generation(  # pylint: disable=protected-access
+        {"sub": "tester", "gen": 0}
+    )
+
+    await uut.revoke_all_tokens("tester")
+    actual = await uut._is_current_generation(  # pylint: disable=protected-access
+        {"sub": "tester", "gen": 0}
+    )
 
     assert actual is False
+
+
+async def test__is_current_generation_not_remembered(mocker, _setup_cache):
+    mocker.patch(f"{UUT_PATH}.config.token_generation_ttl", 0)
+    fetch_counter = mocker.spy(uut.cache, "fetch_counter")
+
+    for _ in range(2):
+        await uut._is_current_generation(  # pylint: disable=protected-access
+            {"sub": "tester", "gen": 0}
+        )
+
+    assert fetch_counter.await_count == 2
+
+
+async def test__is_current_generation_cache_unavailable(mocker):
+    mocker.patch(
+        f"{UUT_PATH}.cache.fetch_counter",
+        AsyncMock(side_effect=CacheUnavailableException("Cache unavailable")),
+    )
+
+    with pytest.raises(CacheUnavailableException):
+        await uut._is_current_generation(  # pylint: disable=protected-access
+            {"sub": "tester", "gen": 0}
+        )
+
+
+async def test__is_current_generation_cache_unavailable_fail_open(mocker):
+    mocker.patch(f"{UUT_PATH}.config.cache_revocation_fail_open", True)
+    mocker.patch(
+        f"{UUT_PATH}.cache.fetch_counter",
+        AsyncMock(side_effect=CacheUnavailableException("Cache unavailable")),
+    )
+
+    actual = await uut._is_current_generation(  # pylint: disable=protected-access
+        {"sub": "tester", "gen": 0}
+    )
+
+    assert actual is True
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_revoke_tokens(_setup_cache, token_no_data):
+    refresh_token, _ = uut.generate_token(
+        claim="REFRESH", expire_min=180.0, sub="tester"
+    )
+
+    actual = await uut.revoke_tokens(
+        tokens=[("TEST", token_no_data), ("REFRESH", refresh_token)],
+        revoke_reason="testing",
+    )
+
+    assert actual == [True, True]
+    with pytest.raises(InvalidTokenException, match="has been revoked"):
+        await uut.validate_token(claim="REFRESH", token=refresh_token)
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_revoke_tokens_ttl(_setup_cache, token_no_data):
+    refresh_token, _ = uut.generate_token(
+        claim="REFRESH", expire_min=180.0, sub="tester"
+    )
+    refresh_token_id = jwt.decode(refresh_token, options={"verify_signature": False})[
+        "token_id"
+    ]
+
+    await uut.revoke_tokens(
+        tokens=[("TEST", token_no_data), ("REFRESH", refresh_token)],
+        revoke_reason="testing",
+    )
+
+    assert (
+        await _setup_cache.ttl(f"REVOKED_TOKEN-438291:{refresh_token_id[0]}") == 14400
+    )
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_revoke_tokens_single_round_trip(mocker, _setup_cache, token_no_data):
+    refresh_token, _ = uut.generate_token(
+        claim="REFRESH", expire_min=180.0, sub="tester"
+    )
+    mocker.patch("app.core.db.cache._namespaces", {"REVOKED_TOKEN": (0, math.inf)})
+    # the revocation log is appended to separately, see test_revocation
+    mocker.patch(f"{UUT_PATH}.revocation.record", AsyncMock())
+    execute = mocker.spy(type(_setup_cache.pipeline()), "execute")
+    execute_command = mocker.spy(_setup_cache, "execute_command")
+
+    await uut.revoke_tokens(
+        tokens=[("TEST", token_no_data), ("REFRESH", refresh_token)],
+        revoke_reason="testing",
+    )
+
+    assert execute.call_count == 1
+    execute_command.assert_not_called()
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_revoke_tokens_invalid(_setup_cache, token_no_data):
+    actual = await uut.revoke_tokens(
+        tokens=[("TEST", token_no_data), ("REFRESH", "invalid")],
+        revoke_reason="testing",
+    )
+
+    assert actual == [True, False]
+
+
+async def test_revoke_tokens_none_valid(mocker):
+    add_members = mocker.patch(f"{UUT_PATH}.cache.add_members", AsyncMock())
+
+    actual = await uut.revoke_tokens(
+        tokens=[("TEST", "invalid"), ("REFRESH", "invalid")], revoke_reason="testing"
+    )
+
+    assert actual == [False, False]
+    add_members.assert_not_awaited()
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_revoke_tokens_old_generation(_setup_cache):
+    token, _ = uut.generate_token(
+        claim="TEST", expire_min=60.0, sub="tester", generation=0
+    )
+    await uut.revoke_all_tokens("tester")
+
+    actual = await uut.revoke_tokens(tokens=[("TEST", token)], revoke_reason="testing")
+
+    assert actual == [False]
+
+
+def test__revocation_entry(token_id):
+    expected = (
+        "438289:e",
+        UUID(token_id).bytes,
+        1577844000,
+    )
+
+    actual = uut._revocation_entry(  # pylint: disable=protected-access
+        token_id, exp=1577840400
+    )
+
+    assert actual == expected
+
+
+def test__revocation_entry_not_uuid():
+    expected = ("438289:t", b"token", 1577844000)
+
+    actual = uut._revocation_entry(  # pylint: disable=protected-access
+        "token", exp=1577840400
+    )
+
+    assert actual == expected
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_revoke_token_bucketed(_setup_cache, token_no_data, token_id):
+    await uut.revoke_token(claim="TEST", token=token_no_data, revoke_reason="testing")
+
+    actual = await _setup_cache.smembers("REVOKED_TOKEN-438289:e")
+
+    assert actual == {UUID(token_id).bytes}
+
+
+@freeze_time("2020-01-01 00:00:00")
+def test__encode_jwt_pyjwt(mocker, token_no_data, token_id):
+    mocker.patch(f"{UUT_PATH}._codec", None)
+    jwt_data = {
+        "token_id": token_id,
+        "claim": "TEST",
+        "exp": 1577840400,
+        "sub": "tester",
+        "data": None,
+    }
+
+    actual = uut._encode_jwt(jwt_data)  # pylint: disable=protected-access
+
+    assert actual == token_no_data
+    assert uut._decode_jwt(actual) == jwt_data  # pylint: disable=protected-access
+
+
+def test__codec():
+    actual = uut._codec  # pylint: disable=protected-access
+
+    assert actual.algorithm == "HS256"
@@ -32,6 +32,16 @@ def test_UserDisabedException():
         raise uut.UserDisabedException("test exception")
 
 
+def test_CacheUnavailableException():
+    with pytest.raises(uut.CacheUnavailableException, match="test exception"):
+        raise uut.CacheUnavailableException("test exception")
+
+
+def test_CryptUnavailableException():
+    with pytest.raises(uut.CryptUnavailableException, match="test exception"):
+        raise uut.CryptUnavailableException("test exception")
+
+
 def test__exception_mapping():
     expected = {
         uut.DataConflictException: 409,
@@ -39,6 +49,8 @@ def test__exception_mapping():
         uut.UserDisabedException: 403,
         uut.InvalidCredentialException: 401,
         uut.InvalidTokenException: 401,
+        uut.CacheUnavailableException: 503,
+        uut.CryptUnavailableException: 503,
     }
 
     actual = uut._exception_mapping()  # pylint: disable=protected-access
@@ -65,7 +77,7 @@ def test__http_exception_handler():
 
 
 def test_register_exceptions():
-    expected = 6
+    expected = 8
 
     mock_app = Mock(exception_handler=Mock())
 
@@ -1,7 +1,9 @@
 import os
 from datetime import datetime, timezone
 from unittest.mock import Mock
+from uuid import UUID, uuid4
 
+import orjson
 import pytest
 from freezegun import freeze_time
 from pydantic import BaseModel, SecretStr
@@ -146,3 +148,103 @@ def test_populate_from_env(_some_class_env, some_class_dict):
     actual = uut.populate_from_env(SomeClass)
 
     assert actual == expected
+
+
+class ConstructNested(BaseModel):
+    date_created: datetime
+
+
+class ConstructData(BaseModel):
+    entity_id: UUID
+    name: str
+    date_created: datetime
+    date_modified: datetime | None = None
+    nested: ConstructNested
+    tags: list[str] = []
+
+
+def test_construct_model():
+    entity_id = uuid4()
+    date_created = datetime(2020, 1, 1, 0, 0, 0, 123000, tzinfo=timezone.utc)
+    expected = ConstructData(
+        entity_id=entity_id,
+        name="tester",
+        date_created=date_created,
+        nested=ConstructNested(date_created=date_created),
+    )
+    data = orjson.loads(orjson.dumps(expected.dict()))
+
+    actual = uut.construct_model(ConstructData, data)
+
+    assert actual == expected
+    assert isinstance(actual.entity_id, UUID)
+    assert isinstance(actual.date_created, datetime)
+    assert isinstance(actual.nested, ConstructNested)
+    assert actual.date_modified is None
+    assert actual.tags == []
+
+
+def test_construct_model_skips_validation():
+    actual = uut.construct_model(ConstructNested, {"date_created": 42})
+
+    assert actual.date_created == 42
+
+
+class ConstructList(BaseModel):
+    items: list[ConstructNested]
+
+
+def test_construct_model_list():
+    date_created = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    expected = ConstructList(items=[ConstructNested(date_created=date_created)] * 2)
+    data = orjson.loads(orjson.dumps(expected.dict()))
+
+    actual = uut.construct_model(ConstructList, data)
+
+    assert actual == expected
+    assert isinstance(actual.items[0], ConstructNested)
+
+
+def test_construct_model_drops_unknown_keys():
+    date_created = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+    actual = uut.construct_model(
+        ConstructNested, {"date_created": date_created.isoformat(), "extra": 1}
+    )
+
+    assert actual.dict() == {"date_created": date_created}
+
+
+class ConstructPublic(BaseModel):
+    name: str
+    date_created: datetime
+    tags: list[str] = []
+
+
+class ConstructPrivate(ConstructPublic):
+    secret: str
+
+
+def test_convert_model():
+    construct_private = ConstructPrivate(
+        name="tester",
+        date_created=datetime(2020, 1, 1, tzinfo=timezone.utc),
+        tags=["tag"],
+        secret="secret",
+    )
+
+    expected = ConstructPublic(**construct_private.dict())
+
+    actual = uut.convert_model(ConstructPublic, construct_private)
+
+    assert actual == expected
+    assert actual.dict() == expected.dict()
+    assert actual.__fields_set__ == expected.__fields_set__
+
+
+def test_convert_model_skips_validation():
+    construct_nested = ConstructNested.construct(date_created=42)
+
+    actual = uut.convert_model(ConstructNested, construct_nested)
+
+    assert actual.date_created == 42
@@ -61,7 +61,7 @@ def test_TodoDb_defaults(_setup_db):
 
 
 @freeze_time("2020-01-01 00:00:00")
-async def test_create_todo_list(_setup_db):
+async def test_create_todo_list(_setup_db, _setup_cache):
     todo_list_create = TodoListCreateFactory.build()
     todo_list = TodoListFactory.build(
         **todo_list_create.dict(),
@@ -94,7 +94,7 @@ async def test_create_todo_list_already_exists(_setup_db):
         )
 
 
-async def test_fetch_todo_lists(_setup_db):
+async def test_fetch_todo_lists(_setup_db, _setup_cache):
     todo_list_db = await TodoListDbFactory.create(
         created=True, date_created=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
     )
@@ -106,7 +106,7 @@ async def test_fetch_todo_lists(_setup_db):
     assert actual == expected
 
 
-async def test_fetch_todo_lists_not_exists(_setup_db):
+async def test_fetch_todo_lists_not_exists(_setup_db, _setup_cache):
     expected = []
 
     actual = await uut.fetch_todo_lists(username="tester")
@@ -114,8 +114,38 @@ async def test_fetch_todo_lists_not_exists(_setup_db):
     assert actual == expected
 
 
+async def test_fetch_todo_lists_cached(_setup_db, _setup_cache):
+    todo_list_db = await TodoListDbFactory.create(
+        created=True, date_created=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
+    )
+
+    expected = [TodoList(**todo_list_db.dict())]
+
+    await uut.fetch_todo_lists(username=todo_list_db.username)
+    await todo_list_db.delete()
+
+    actual = await uut.fetch_todo_lists(username=todo_list_db.username)
+
+    assert actual == expected
+    assert await _setup_cache.ttl(f"TODO_LISTS-{todo_list_db.username}") == 300
+
+
+@freeze_time("2020-01-01 00:00:00")
+async def test_create_todo_list_invalidates_cache(_setup_db, _setup_cache):
+    todo_list_create = TodoListCreateFactory.build()
+
+    await uut.fetch_todo_lists(username="tester")
+    todo_list = await uut.create_todo_list(
+        username="tester", todo_list_create=todo_list_create
+    )
+
+    actual = await uut.fetch_todo_lists(username="tester")
+
+    assert actual == [todo_list]
+
+
 @freeze_time("2020-01-01 00:00:00")
-async def test_update_todo_list_all(_setup_db):
+async def test_update_todo_list_all(_setup_db, _setup_cache):
     todo_list_db = await TodoListDbFactory.create(
         created=True, date_created=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
     )
@@ -136,7 +166,7 @@ async def test_update_todo_list_all(_setup_db):
 
 
 @freeze_time("2020-01-01 00:00:00")
-async def test_update_todo_list_none(_setup_db):
+async def test_update_todo_list_none(_setup_db, _setup_cache):
     todo_list_db = await TodoListDbFactory.create(
         created=True, date_created=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
     )
@@ -171,7 +201,7 @@ async def test_update_todo_list_not_exists(_setup_db):
         )
 
 
-async def test_delete_todo_list(_setup_db):
+async def test_delete_todo_list(_setup_db, _setup_cache):
     todo_list_db = await TodoListDbFactory.create(
         created=True, date_created=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
     )
@@ -185,7 +215,7 @@ async def test_delete_todo_list(_setup_db):
     assert actual == expected
 
 
-async def test_delete_todo_list_deletes_todos(_setup_db):
+async def test_delete_todo_list_deletes_todos(_setup_db, _setup_cache):
     todo_list_db = await TodoListDbFactory.create(
         created=True, date_created=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
     )
@@ -1,10 +1,17 @@
+import asyncio
 from datetime import datetime, timezone
 from unittest.mock import AsyncMock, Mock
 
 import pytest
 from freezegun import freeze_time
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
 
-from app.core.exception import DataConflictException, ResourceNotFoundException
+from app.core.exception import (
+    CacheUnavailableException,
+    DataConflictException,
+    ResourceNotFoundException,
+)
 from app.core.user import repo as uut
 from app.core.user.model import UserCreate, UserPrivate, UserUpdate, UserUpdatePrivate
 from tests.factories.user_factory import (
@@ -43,7 +50,7 @@ def test_UserDb_defaults(_setup_db):
 
 
 @freeze_time("2020-01-01 00:00:00")
-async def test_create(_setup_db, mocker):
+async def test_create(_setup_db, _setup_cache, mocker):
     user_private = UserPrivateFactory.build(
         created=True, date_created=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
     )
@@ -54,7 +61,8 @@ async def test_create(_setup_db, mocker):
     expected = user_private
 
     mocker.patch(
-        f"{UUT_PATH}.crypt.hash_password", Mock(return_value=user_private.password_hash)
+        f"{UUT_PATH}.crypt.hash_password_async",
+        AsyncMock(return_value=user_private.password_hash),
     )
 
     actual = await uut.create(user_create=user_create, roles=user_private.roles)
@@ -63,7 +71,7 @@ async def test_create(_setup_db, mocker):
 
 
 @freeze_time("2020-01-01 00:00:00")
-async def test_create_default_roles(_setup_db, mocker):
+async def test_create_default_roles(_setup_db, _setup_cache, mocker):
     user_private = UserPrivateFactory.build(
         created=True, date_created=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
     )
@@ -75,7 +83,8 @@ async def test_create_default_roles(_setup_db, mocker):
     expected.roles = []
 
     mocker.patch(
-        f"{UUT_PATH}.crypt.hash_password", Mock(return_value=user_private.password_hash)
+        f"{UUT_PATH}.crypt.hash_password_async",
+        AsyncMock(return_value=user_private.password_hash),
     )
 
     actual = await uut.create(user_create=user_create, roles=None)
@@ -93,7 +102,8 @@ async def test_create_already_exists(_setup_db, mocker):
     )
 
     mocker.patch(
-        f"{UUT_PATH}.crypt.hash_password", Mock(return_value=user_db.password_hash)
+        f"{UUT_PATH}.crypt.hash_password_async",
+        AsyncMock(return_value=user_db.password_hash),
     )
 
     with pytest.raises(DataConflictException, match="Email or username already exists"):
@@ -105,7 +115,25 @@ async def test_fetch_cache_hit(_setup_db, mocker):
 
     expected = user_private
 
-    mocker.patch(f"{UUT_PATH}.cache.fetch", AsyncMock(return_value=user_private))
+    mocker.patch(
+        f"{UUT_PATH}.cache.fetch_or_fill", AsyncMock(return_value=user_private)
+    )
+
+    actual = await uut.fetch(user_private.username)
+
+    assert actual == expected
+
+
+async def test_fetch_pending_login(_setup_db, mocker, pending_logins):
+    user_private = UserPrivateFactory.build(last_login=None)
+    last_login = datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
+    pending_logins[user_private.username] = last_login
+
+    expected = user_private.copy(update={"last_login": last_login})
+
+    mocker.patch(
+        f"{UUT_PATH}.cache.fetch_or_fill", AsyncMock(return_value=user_private)
+    )
 
     actual = await uut.fetch(user_private.username)
 
@@ -122,6 +150,18 @@ async def test_fetch_cache_miss(_setup_db, _setup_cache):
     assert actual == expected
 
 
+async def test_fetch_cache_miss_coalesced(_setup_db, _setup_cache, mocker):
+    user_db = await UserDbFactory.create()
+    find_one = mocker.spy(uut.UserDb, "find_one")
+
+    expected = [UserPrivate(**user_db.dict())] * 5
+
+    actual = await asyncio.gather(*[uut.fetch(user_db.username) for _ in range(5)])
+
+    assert actual == expected
+    assert find_one.call_count == 1
+
+
 async def test_fetch_not_exists(_setup_db, _setup_cache):
     user_db = UserDbFactory.build()
 
@@ -132,6 +172,34 @@ async def test_fetch_not_exists(_setup_db, _setup_cache):
         await uut.fetch(user_db.username)
 
 
+async def test_fetch_not_exists_cached(_setup_db, _setup_cache, mocker):
+    user_db = UserDbFactory.build()
+    find_one = mocker.spy(uut.UserDb, "find_one")
+
+    for _ in range(2):
+        with pytest.raises(ResourceNotFoundException):
+            await uut.fetch(user_db.username)
+
+    assert find_one.call_count == 1
+    assert await _setup_cache.ttl(f"USER-{user_db.username}") == 30
+
+
+async def test_create_invalidates_not_exists(_setup_db, _setup_cache):
+    user_private = UserPrivateFactory.build()
+    user_create = UserCreate(
+        **user_private.dict(), password="password", password_match="password"
+    )
+
+    with pytest.raises(ResourceNotFoundException):
+        await uut.fetch(user_private.username)
+
+    await uut.create(user_create=user_create, roles=user_private.roles)
+
+    actual = await uut.fetch(user_private.username)
+
+    assert actual.username == user_private.username
+
+
 @freeze_time("2020-01-01 00:00:00")
 async def test_update_all(_setup_db, _setup_cache, mocker):
     user_db = await UserDbFactory.create(
@@ -146,7 +214,9 @@ async def test_update_all(_setup_db, _setup_cache, mocker):
     expected.date_modified = datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
     expected.password_hash = "password_hash"
 
-    mocker.patch(f"{UUT_PATH}.crypt.hash_password", Mock(return_value="password_hash"))
+    mocker.patch(
+        f"{UUT_PATH}.crypt.hash_password_async", AsyncMock(return_value="password_hash")
+    )
 
     actual = await uut.update(username=user_db.username, user_update=user_update)
 
@@ -168,6 +238,64 @@ async def test_update_none(_setup_db, _setup_cache):
     assert actual == expected
 
 
+async def test_update_password_revokes_tokens(_setup_db, _setup_cache, mocker):
+    user_db = await UserDbFactory.create(created=True)
+    revoke_all_tokens = mocker.patch(f"{UUT_PATH}.revoke_all_tokens", AsyncMock())
+
+    await uut.update(username=user_db.username, user_update=UserUpdateFactory.build())
+
+    revoke_all_tokens.assert_awaited_once_with(user_db.username)
+
+
+async def test_update_password_revoke_failed(_setup_db, _setup_cache, mocker):
+    user_db = await UserDbFactory.create(created=True)
+    mocker.patch(
+        f"{UUT_PATH}.revoke_all_tokens",
+        AsyncMock(side_effect=CacheUnavailableException("Cache unavailable")),
+    )
+
+    with pytest.raises(CacheUnavailableException):
+        await uut.update(
+            username=user_db.username, user_update=UserUpdateFactory.build()
+        )
+
+    actual = await uut.UserDb.find_one(uut.UserDb.username == user_db.username)
+    assert actual.password_hash == user_db.password_hash
+
+
+async def test_update_no_password_keeps_tokens(_setup_db, _setup_cache, mocker):
+    user_db = await UserDbFactory.create(created=True)
+    revoke_all_tokens = mocker.patch(f"{UUT_PATH}.revoke_all_tokens", AsyncMock())
+
+    await uut.update(username=user_db.username, user_update=UserUpdate(first_name="a"))
+
+    revoke_all_tokens.assert_not_awaited()
+
+
+async def test_update_cache_outage(_setup_db, _setup_cache, mocker):
+    mocker.patch("app.core.db.cache_aside._deferred", {})
+    mocker.patch("app.core.db.cache_aside._replay", None)
+    mocker.patch("app.core.db.cache_aside._replay_deletes", Mock())
+    mocker.patch("app.core.db.cache_aside.cache.spawn")
+    user_db = await UserDbFactory.create(created=True)
+    await uut.fetch(user_db.username)
+    breaker = uut.cache._breaker(0)  # pylint: disable=protected-access
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    with pytest.raises(CacheUnavailableException):
+        await uut.update(
+            username=user_db.username, user_update=UserUpdateFactory.build()
+        )
+    await uut.update(username=user_db.username, user_update=UserUpdate(first_name="a"))
+    breaker.record_success()
+
+    actual = await uut.fetch(user_db.username)
+
+    assert actual.first_name == "a"
+    assert actual.password_hash == user_db.password_hash
+
+
 async def test_update_not_exists(_setup_db):
     user_db = UserDbFactory.build(
         created=True, date_created=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
@@ -218,6 +346,47 @@ async def test_update_private_none(_setup_db, _setup_cache):
     assert actual == expected
 
 
+async def test_update_private_disabled_revokes_tokens(_setup_db, _setup_cache, mocker):
+    user_db = await UserDbFactory.create(created=True)
+    revoke_all_tokens = mocker.patch(f"{UUT_PATH}.revoke_all_tokens", AsyncMock())
+
+    await uut.update_private(
+        username=user_db.username,
+        user_update_private=UserUpdatePrivate(disabled=True),
+    )
+
+    revoke_all_tokens.assert_awaited_once_with(user_db.username)
+
+
+async def test_update_private_disabled_revoke_failed(_setup_db, _setup_cache, mocker):
+    user_db = await UserDbFactory.create(created=True)
+    mocker.patch(
+        f"{UUT_PATH}.revoke_all_tokens",
+        AsyncMock(side_effect=CacheUnavailableException("Cache unavailable")),
+    )
+
+    with pytest.raises(CacheUnavailableException):
+        await uut.update_private(
+            username=user_db.username,
+            user_update_private=UserUpdatePrivate(disabled=True),
+        )
+
+    actual = await uut.UserDb.find_one(uut.UserDb.username == user_db.username)
+    assert actual.disabled is False
+
+
+async def test_update_private_enabled_keeps_tokens(_setup_db, _setup_cache, mocker):
+    user_db = await UserDbFactory.create(created=True)
+    revoke_all_tokens = mocker.patch(f"{UUT_PATH}.revoke_all_tokens", AsyncMock())
+
+    await uut.update_private(
+        username=user_db.username,
+        user_update_private=UserUpdatePrivate(disabled=False),
+    )
+
+    revoke_all_tokens.assert_not_awaited()
+
+
 async def test_update_private_not_exists(_setup_db):
     user_db = UserDbFactory.build(
         created=True, date_created=datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
@@ -231,3 +400,206 @@ async def test_update_private_not_exists(_setup_db):
         await uut.update_private(
             username=user_db.username, user_update_private=user_update_private
         )
+
+
+async def test_update_password_hash(_setup_db, _setup_cache):
+    user_db = await UserDbFactory.create(created=True)
+
+    actual = await uut.update_password_hash(
+        username=user_db.username,
+        password_hash=user_db.password_hash,
+        new_password_hash="new_password_hash",
+    )
+
+    assert actual is True
+    assert (await uut.fetch(user_db.username)).password_hash == "new_password_hash"
+    assert (await uut.fetch(user_db.username)).date_modified is None
+
+
+async def test_update_password_hash_changed(_setup_db, _setup_cache):
+    user_db = await UserDbFactory.create(created=True)
+
+    actual = await uut.update_password_hash(
+        username=user_db.username,
+        password_hash="old_password_hash",
+        new_password_hash="new_password_hash",
+    )
+
+    assert actual is False
+    assert (await uut.fetch(user_db.username)).password_hash == user_db.password_hash
+
+
+@pytest.fixture
+def pending_logins(mocker):
+    pending = {}
+    mocker.patch(f"{UUT_PATH}._pending_logins", pending)
+
+    return pending
+
+
+def test_record_login(pending_logins):
+    first = datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
+    second = datetime(2020, 1, 1, 0, 1, tzinfo=timezone.utc)
+
+    uut.record_login(username="tester", last_login=first)
+    uut.record_login(username="tester", last_login=second)
+
+    assert pending_logins == {"tester": second}
+
+
+async def test_flush_logins(mocker, pending_logins):
+    last_login = datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
+    bulk_write = AsyncMock()
+    mocker.patch(
+        f"{UUT_PATH}.UserDb.get_motor_collection",
+        Mock(return_value=Mock(bulk_write=bulk_write)),
+    )
+    uut.record_login(username="first", last_login=last_login)
+    uut.record_login(username="second", last_login=last_login)
+
+    expected = [
+        UpdateOne({"username": "first"}, {"$set": {"last_login": last_login}}),
+        UpdateOne({"username": "second"}, {"$set": {"last_login": last_login}}),
+    ]
+
+    actual = await uut.flush_logins()
+
+    assert actual == 2
+    assert pending_logins == {}
+    bulk_write.assert_awaited_once_with(expected, ordered=False)
+
+
+async def test_flush_logins_invalidates_cache(_setup_db, _setup_cache, mocker):
+    user_db = await UserDbFactory.create(created=True)
+    await uut.fetch(user_db.username)
+    mocker.patch(
+        f"{UUT_PATH}.UserDb.get_motor_collection",
+        Mock(return_value=Mock(bulk_write=AsyncMock())),
+    )
+
+    uut.record_login(username=user_db.username, last_login=datetime.now(timezone.utc))
+    assert await _setup_cache.exists(f"USER-{user_db.username}")
+    await uut.flush_logins()
+
+    assert not await _setup_cache.exists(f"USER-{user_db.username}")
+
+
+async def test_flush_logins_cancelled(mocker, pending_logins):
+    last_login = datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
+    mocker.patch(
+        f"{UUT_PATH}.UserDb.get_motor_collection",
+        Mock(
+            return_value=Mock(
+                bulk_write=AsyncMock(side_effect=asyncio.CancelledError())
+            )
+        ),
+    )
+    uut.record_login(username="tester", last_login=last_login)
+
+    with pytest.raises(asyncio.CancelledError):
+        await uut.flush_logins()
+
+    assert pending_logins == {"tester": last_login}
+
+
+async def test_flush_logins_empty(mocker, pending_logins):
+    del pending_logins
+    get_motor_collection = mocker.patch(f"{UUT_PATH}.UserDb.get_motor_collection")
+
+    actual = await uut.flush_logins()
+
+    assert actual == 0
+    get_motor_collection.assert_not_called()
+
+
+async def test_flush_logins_failure(mocker, pending_logins):
+    failed = datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
+    newer = datetime(2020, 1, 1, 0, 1, tzinfo=timezone.utc)
+
+    async def bulk_write(*_args, **_kwargs):
+        uut.record_login(username="second", last_login=newer)
+        raise PyMongoError("unavailable")
+
+    mocker.patch(
+        f"{UUT_PATH}.UserDb.get_motor_collection",
+        Mock(return_value=Mock(bulk_write=bulk_write)),
+    )
+    uut.record_login(username="first", last_login=failed)
+    uut.record_login(username="second", last_login=failed)
+
+    actual = await uut.flush_logins()
+
+    assert actual == 0
+    assert pending_logins == {"first": failed, "second": newer}
+
+
+async def test_watch_logins(mocker):
+    mocker.patch(f"{UUT_PATH}.asyncio.sleep", AsyncMock())
+    flush_logins = mocker.patch(
+        f"{UUT_PATH}.flush_logins",
+        AsyncMock(side_effect=[1, 0, asyncio.CancelledError()]),
+    )
+
+    with pytest.raises(asyncio.CancelledError):
+        await uut.watch_logins()
+
+    assert flush_logins.await_count == 3
+
+
+async def test_warm_cache(_setup_db, _setup_cache, mocker):
+    mocker.patch(f"{UUT_PATH}.config.cache_warm_users", 3)
+    mocker.patch(f"{UUT_PATH}.config.cache_warm_batch_size", 2)
+    sleep = mocker.patch(f"{UUT_PATH}.asyncio.sleep", AsyncMock())
+    user_dbs = [
+        await UserDbFactory.create(
+            last_login=datetime(2020, 1, day, tzinfo=timezone.utc)
+        )
+        for day in range(1, 5)
+    ]
+    never_logged_in = await UserDbFactory.create(created=True)
+
+    actual = await uut.warm_cache()
+
+    assert actual == 3
+    for user_db in user_dbs[1:]:
+        assert await _setup_cache.exists(f"USER-{user_db.username}") == 1
+    assert await _setup_cache.exists(f"USER-{user_dbs[0].username}") == 0
+    assert await _setup_cache.exists(f"USER-{never_logged_in.username}") == 0
+    assert [call.args[0] for call in sleep.await_args_list] == [2 / 1000, 1 / 1000]
+
+
+async def test_warm_cache_keeps_cached(_setup_db, _setup_cache, mocker):
+    mocker.patch(f"{UUT_PATH}.asyncio.sleep", AsyncMock())
+    user_db = await UserDbFactory.create()
+    cached = await uut.fetch(user_db.username)
+    user_db.first_name = "changed"
+    await user_db.save()
+
+    actual = await uut.warm_cache()
+
+    assert actual == 0
+    assert await uut.fetch(user_db.username) == cached
+
+
+async def test_warm_cache_fetch(_setup_db, _setup_cache, mocker):
+    mocker.patch(f"{UUT_PATH}.asyncio.sleep", AsyncMock())
+    user_db = await UserDbFactory.create()
+    await uut.warm_cache()
+    find_one = mocker.spy(uut.UserDb, "find_one")
+
+    actual = await uut.fetch(user_db.username)
+
+    assert actual == UserPrivate(**user_db.dict())
+    find_one.assert_not_called()
+
+
+async def test_warm_cache_unavailable(_setup_db, mocker):
+    mocker.patch(
+        f"{UUT_PATH}.cache.add_many",
+        AsyncMock(side_effect=CacheUnavailableException("Cache unavailable")),
+    )
+    await UserDbFactory.create()
+
+    actual = await uut.warm_cache()
+
+    assert actual == 0
@@ -1,4 +1,5 @@
-from unittest.mock import AsyncMock
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, Mock
 
 from app.core.user import service as uut
 from tests.factories.user_factory import (
@@ -65,3 +66,27 @@ async def test_update_private(mocker):
     )
 
     assert actual == expected
+
+
+async def test_update_password_hash(mocker):
+    update_password_hash = mocker.patch(
+        f"{UUT_PATH}.user_repo.update_password_hash", AsyncMock(return_value=True)
+    )
+
+    actual = await uut.update_password_hash(
+        username="tester", password_hash="old", new_password_hash="new"
+    )
+
+    assert actual is True
+    update_password_hash.assert_awaited_once_with(
+        username="tester", password_hash="old", new_password_hash="new"
+    )
+
+
+def test_record_login(mocker):
+    last_login = datetime(2020, 1, 1, 0, 0, tzinfo=timezone.utc)
+    record_login = mocker.patch(f"{UUT_PATH}.user_repo.record_login", Mock())
+
+    uut.record_login(username="tester", last_login=last_login)
+
+    record_login.assert_called_once_with(username="tester", last_login=last_login)
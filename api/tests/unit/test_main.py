@@ -1,4 +1,5 @@
-from unittest.mock import AsyncMock, patch
+import asyncio
+from unittest.mock import AsyncMock, Mock, call, patch
 
 from fastapi import FastAPI
 
@@ -13,10 +14,80 @@ def test_app_setup():
     assert isinstance(actual, FastAPI)
 
 
+@patch("app.main.init_cache", AsyncMock(return_value=True))
 @patch("app.main.init_db", AsyncMock(return_value=True))
-async def test_app_init():
+async def test_app_init(mocker):
     """Verify initialization is successful."""
 
+    watch_logins = mocker.patch(
+        "app.main.watch_logins", Mock(return_value="watch_logins")
+    )
+    spawn = mocker.patch("app.main.spawn")
+
+    actual = await uut.app_init()
+
+    assert actual is True
+    watch_logins.assert_called_once_with()
+    spawn.assert_called_once_with("watch_logins")
+
+
+@patch("app.main.init_cache", AsyncMock(return_value=True))
+@patch("app.main.init_db", AsyncMock(return_value=True))
+async def test_app_init_warm_cache(mocker):
+    """Verify cache warm-up is started in the background when enabled."""
+
+    mocker.patch("app.main.config.cache_warm_enabled", True)
+    warm_cache = mocker.patch("app.main.warm_cache", Mock(return_value="warm_cache"))
+    mocker.patch("app.main.watch_logins", Mock(return_value="watch_logins"))
+    spawn = mocker.patch("app.main.spawn")
+
+    actual = await uut.app_init()
+
+    assert actual is True
+    warm_cache.assert_called_once_with()
+    spawn.assert_any_call("warm_cache")
+
+
+@patch("app.main.init_cache", AsyncMock(return_value=True))
+@patch("app.main.init_db", AsyncMock(return_value=True))
+async def test_app_init_revocation_filter(mocker):
+    """Verify revocation filter sync is started in the background when enabled."""
+
+    mocker.patch("app.main.config.revocation_filter_enabled", True)
+    watch = mocker.patch("app.main.revocation.watch", Mock(return_value="watch"))
+    mocker.patch("app.main.watch_logins", Mock(return_value="watch_logins"))
+    spawn = mocker.patch("app.main.spawn")
+
     actual = await uut.app_init()
 
     assert actual is True
+    watch.assert_called_once_with()
+    spawn.assert_any_call("watch")
+
+
+@patch("app.main.close_cache", AsyncMock(return_value=True))
+async def test_app_shutdown(mocker):
+    """Verify shutdown is successful."""
+
+    manager = Mock()
+
+    async def flush_logins():
+        manager.flush_logins()
+        return 0
+
+    async def watch_logins():
+        try:
+            await asyncio.Event().wait()
+        finally:
+            manager.stopped()
+
+    mocker.patch("app.main.flush_logins", flush_logins)
+    mocker.patch.object(
+        uut.app.state, "login_watcher", asyncio.create_task(watch_logins()), create=True
+    )
+    await asyncio.sleep(0)
+
+    actual = await uut.app_shutdown()
+
+    assert actual is True
+    assert manager.mock_calls == [call.stopped(), call.flush_logins()]